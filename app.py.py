@@ -1,64 +1,827 @@
-from flask import Flask, render_template, send_from_directory
+from flask import Flask, Response, render_template, request, abort
+from werkzeug.exceptions import NotFound
+from werkzeug.http import http_date, is_resource_modified
+from werkzeug.utils import get_content_type
+from werkzeug.wsgi import ClosingIterator, wrap_file
+from werkzeug.security import safe_join
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import bisect
+import gzip
+import mimetypes
 import os
+import re
+import select
+import signal
+import socket
+import threading
+import time
+
+from fouad_file_digest import file_digest
+
+# brotli اختياري: بدونه نكتفي بنسخ gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# معالج الصور اختياري: بدون Pillow تُرسل الصور الأصلية فقط
+try:
+    from fouad_image_processor import ImageProcessor
+    from fouad_derivative_store import CACHE_DIR_NAME, DERIVATIVES_DIR_NAME, DerivativeStore
+except ImportError:
+    ImageProcessor = None
+    DerivativeStore = None
 
 app = Flask(__name__)
 
+# المجلد الأساسي للموقع (مجلد هذا الملف)
+BASE_DIR = app.root_path
+
+# مجلدات الصور المحتملة بترتيب الأولوية (بدون تكرار)
+IMAGE_DIRS = ['صور', 'images', 'Images']
+
+
+class ImageIndex:
+    """فهرس الصور - يربط اسم الملف بمجلده في الذاكرة بدلاً من فحص القرص في كل طلب"""
+
+    def __init__(self, base_dir, dirs, check_interval=2.0, negative_cache_size=512):
+        self.base_dir = base_dir
+        self.dirs = dirs
+        self.check_interval = check_interval
+        self.negative_cache_size = negative_cache_size
+        self._index = {}
+        self._dir_mtimes = {}
+        self._missing = OrderedDict()
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self.rebuild()
+
+    def _dir_path(self, directory):
+        return os.path.join(self.base_dir, directory)
+
+    def _dir_mtime(self, directory):
+        try:
+            return os.stat(self._dir_path(directory)).st_mtime_ns
+        except OSError:
+            return None
+
+    def rebuild(self):
+        """بناء الفهرس بالكامل من محتويات مجلدات الصور"""
+        index = {}
+        mtimes = {}
+        for directory in self.dirs:
+            mtimes[directory] = self._dir_mtime(directory)
+            if mtimes[directory] is None:
+                continue
+            try:
+                with os.scandir(self._dir_path(directory)) as entries:
+                    for entry in entries:
+                        # المجلد الأول في القائمة له الأولوية عند تكرار الاسم
+                        if entry.is_file():
+                            index.setdefault(entry.name, directory)
+            except OSError:
+                continue
+
+        with self._lock:
+            self._index = index
+            self._dir_mtimes = mtimes
+            self._missing.clear()
+            self._last_check = time.monotonic()
+
+    def _refresh_if_changed(self):
+        """فحص رخيص لتاريخ تعديل المجلدات (مرة كل check_interval ثانية على الأكثر)"""
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+
+        for directory, old_mtime in self._dir_mtimes.items():
+            if self._dir_mtime(directory) != old_mtime:
+                self.rebuild()
+                return
+
+    def _remember_missing(self, filename):
+        with self._lock:
+            self._missing[filename] = True
+            self._missing.move_to_end(filename)
+            while len(self._missing) > self.negative_cache_size:
+                self._missing.popitem(last=False)
+
+    def lookup(self, filename):
+        """إرجاع المجلد الذي يحتوي على الصورة أو None"""
+        self._refresh_if_changed()
+
+        directory = self._index.get(filename)
+        if directory is not None:
+            return directory
+
+        if filename in self._missing:
+            return None
+
+        # ملف أضيف قبل انتهاء فترة الفحص: نتحقق مرة واحدة فقط ثم نتذكر النتيجة
+        for directory in self.dirs:
+            if os.path.isfile(os.path.join(self._dir_path(directory), filename)):
+                with self._lock:
+                    self._index[filename] = directory
+                return directory
+
+        self._remember_missing(filename)
+        return None
+
+
+# يبنى الفهرس مرة واحدة عند بدء التشغيل
+image_index = ImageIndex(
+    BASE_DIR,
+    IMAGE_DIRS,
+    check_interval=float(os.environ.get('IMAGE_INDEX_CHECK_INTERVAL', 2.0)),
+)
+
+
+# سياسة Cache-Control لكل نوع من المسارات (قابلة للتعديل عبر متغيرات البيئة)
+app.config['CACHE_CONTROL'] = {
+    'html': os.environ.get('CACHE_CONTROL_HTML', 'public, max-age=60'),
+    'css': os.environ.get('CACHE_CONTROL_CSS', 'public, max-age=3600'),
+    'images': os.environ.get('CACHE_CONTROL_IMAGES', 'public, max-age=86400'),
+    # للملفات التي تحمل بصمة المحتوى في الاسم أو في ?v=
+    'immutable': os.environ.get('CACHE_CONTROL_IMMUTABLE', 'public, max-age=31536000, immutable'),
+}
+
+# اسم ملف يحمل بصمة المحتوى مثل style.3f2a9c1b.css
+FINGERPRINT_RE = re.compile(r'\.[0-9a-f]{8,}\.[^.]+$')
+# أقل طول لبصمة ?v= (مثل البصمة في الاسم)؛ القيم الأقصر قد تطابق بداية ETag صدفة
+VERSION_MIN_LENGTH = 8
+
+
+class FileVersionCache:
+    """ذاكرة بصمات الملفات - تحسب ETag من المحتوى مرة واحدة لكل نسخة من الملف"""
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, path, stat_result):
+        """إرجاع بصمة الملف، وإعادة حسابها فقط إذا تغير وقت التعديل أو الحجم"""
+        key = (stat_result.st_mtime_ns, stat_result.st_size)
+        cached = self._versions.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        etag = file_digest(path)
+        with self._lock:
+            self._versions[path] = (key, etag)
+        return etag
+
+
+file_versions = FileVersionCache()
+
+
+def cache_policy_for(filename, policy, etag):
+    """اختيار قيمة Cache-Control حسب نوع المسار وبصمة الملف"""
+    policies = app.config['CACHE_CONTROL']
+    version = request.args.get('v')
+    if FINGERPRINT_RE.search(filename) or (
+            version and len(version) >= VERSION_MIN_LENGTH and etag.startswith(version)):
+        return policies['immutable']
+    return policies[policy]
+
+
+# الملفات النصية التي تُضغط مسبقاً، والترميزات بترتيب الأفضلية
+COMPRESSIBLE_EXTENSIONS = {'.html', '.css', '.js', '.svg'}
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def is_compressible(filename):
+    return os.path.splitext(filename)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+
+def precompress_assets(base_dir=BASE_DIR):
+    """كتابة نسخ .gz و .br بجانب كل ملف نصي (فقط عند تغير الأصل)"""
+    written = 0
+    for entry in os.scandir(base_dir):
+        if not entry.is_file() or not is_compressible(entry.name):
+            continue
+
+        source_stat = entry.stat()
+        data = None
+        for encoding, suffix in ENCODING_SUFFIXES.items():
+            if encoding == 'br' and brotli is None:
+                continue
+
+            variant_path = entry.path + suffix
+            try:
+                # النسخة تحمل نفس وقت تعديل الأصل، فأي اختلاف يعني أنها قديمة
+                if os.stat(variant_path).st_mtime_ns == source_stat.st_mtime_ns:
+                    continue
+            except OSError:
+                pass
+
+            if data is None:
+                with open(entry.path, 'rb') as f:
+                    data = f.read()
+
+            if encoding == 'br':
+                compressed = brotli.compress(data, quality=11)
+            else:
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+
+            tmp_path = variant_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(compressed)
+            os.utime(tmp_path, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+            os.replace(tmp_path, variant_path)
+            written += 1
+
+    return written
+
+
+def guess_mimetype(filename):
+    mimetype, _ = mimetypes.guess_type(filename)
+    return mimetype or 'application/octet-stream'
+
+
+def pick_encoded_variant(path, stat_result):
+    """اختيار أفضل نسخة مضغوطة يقبلها العميل (بدون أي ضغط أثناء الطلب)"""
+    available = []
+    for encoding, suffix in ENCODING_SUFFIXES.items():
+        try:
+            variant_stat = os.stat(path + suffix)
+        except OSError:
+            continue
+        if variant_stat.st_mtime_ns == stat_result.st_mtime_ns:
+            available.append((encoding, path + suffix, variant_stat))
+
+    if not available:
+        return None
+
+    encoding = request.accept_encodings.best_match([enc for enc, _, _ in available])
+    for candidate in available:
+        if candidate[0] == encoding:
+            return candidate
+    return None
+
+
+class HotAssetCache:
+    """ذاكرة داخلية لمحتوى الملفات الساخنة مع ترويساتها - محدودة بميزانية بايتات (LRU)"""
+
+    def __init__(self, max_bytes, max_file_bytes):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self._entries = OrderedDict()  # المسار -> (مفتاح النسخة، البيانات، الترويسات)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def accepts(self, stat_result):
+        """الملفات الأكبر من الحد (مثل الصور الضخمة) لا تدخل الذاكرة"""
+        return self.enabled and stat_result.st_size <= min(self.max_file_bytes, self.max_bytes)
+
+    def get(self, path, stat_result):
+        version = (stat_result.st_mtime_ns, stat_result.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1], entry[2]
+            self.misses += 1
+            return None
+
+    def put(self, path, stat_result, data, headers):
+        version = (stat_result.st_mtime_ns, stat_result.st_size)
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self._total_bytes -= len(old[1])
+            self._entries[path] = (version, data, headers)
+            self._total_bytes += len(data)
+            while self._total_bytes > self.max_bytes:
+                _, (_, evicted_data, _) = self._entries.popitem(last=False)
+                self._total_bytes -= len(evicted_data)
+                self.evictions += 1
+
+    def stats(self):
+        """عدادات للمراقبة"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+# ذاكرة اختيارية: HOT_CACHE_MAX_BYTES=0 لتعطيلها
+hot_cache = HotAssetCache(
+    int(os.environ.get('HOT_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+    int(os.environ.get('HOT_CACHE_MAX_FILE_BYTES', 512 * 1024)),
+)
+
+
+def file_headers(stat_result, mimetype, etag):
+    """الترويسات الثابتة لنسخة معينة من الملف"""
+    return {
+        'Content-Type': get_content_type(mimetype, 'utf-8'),
+        'ETag': f'"{etag}"',
+        'Last-Modified': http_date(stat_result.st_mtime),
+        'Accept-Ranges': 'bytes',
+    }
+
+
+def load_hot_asset(path, stat_result, mimetype, etag):
+    """قراءة الملف من الذاكرة الساخنة، وتحميله إليها عند أول طلب"""
+    cached = hot_cache.get(path, stat_result)
+    if cached is not None:
+        return cached
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    headers = file_headers(stat_result, mimetype, etag)
+    hot_cache.put(path, stat_result, data, headers)
+    return data, headers
+
+
+# الحد الأقصى لعدد المقاطع في طلب Range واحد (ما زاد عنه يُرسل الملف كاملاً)
+MAX_RANGES = 16
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def requested_ranges(size, etag, last_modified):
+    """تحويل ترويسة Range إلى مقاطع [start, stop) مرتبة ومدمجة، أو None للملف كاملاً"""
+    byte_range = request.range
+    if request.method != 'GET' or byte_range is None or byte_range.units != 'bytes':
+        return None
+    if len(byte_range.ranges) > MAX_RANGES:
+        return None
+
+    # If-Range: نرسل المقاطع فقط إذا كانت نسخة العميل هي النسخة الحالية
+    if 'If-Range' in request.headers:
+        if_range = request.if_range
+        if if_range.etag is not None and if_range.etag != etag:
+            return None
+        if if_range.date is not None and http_date(if_range.date) != last_modified:
+            return None
+        if if_range.etag is None and if_range.date is None:
+            return None
+
+    ranges = []
+    for start, stop in byte_range.ranges:
+        if start < 0:
+            start, stop = max(0, size + start), size
+        else:
+            stop = size if stop is None else min(stop, size)
+        if start < stop:
+            ranges.append((start, stop))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, stop in ranges[1:]:
+        if start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def iter_file_range(f, start, length, chunk_size=64 * 1024):
+    f.seek(start)
+    while length > 0:
+        chunk = f.read(min(chunk_size, length))
+        if not chunk:
+            break
+        length -= len(chunk)
+        yield chunk
+
+
+def iter_multipart(source, ranges, size, content_type, boundary):
+    """جسم multipart/byteranges لعدة مقاطع"""
+    for start, stop in ranges:
+        yield (
+            f"\r\n--{boundary}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n"
+        ).encode('latin-1')
+        if isinstance(source, bytes):
+            yield source[start:stop]
+        else:
+            yield from iter_file_range(source, start, stop - start)
+    yield f"\r\n--{boundary}--\r\n".encode('latin-1')
+
+
+def multipart_length(ranges, size, content_type, boundary):
+    length = len(f"\r\n--{boundary}--\r\n")
+    for start, stop in ranges:
+        length += len(
+            f"\r\n--{boundary}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n"
+        ) + (stop - start)
+    return length
+
+
+def file_response(path, size, headers, etag, data=None):
+    """بناء الاستجابة: 304 أو 200 أو 206 (مقطع أو عدة مقاطع) أو 416"""
+    last_modified = headers['Last-Modified']
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return Response(status=304, headers={
+            key: value for key, value in headers.items() if key != 'Content-Type'
+        })
+
+    try:
+        ranges = requested_ranges(size, etag, last_modified)
+    except RangeNotSatisfiable:
+        response = Response(status=416, headers={'Content-Range': f"bytes */{size}"})
+        response.headers['Accept-Ranges'] = 'bytes'
+        return response
+
+    source = data if data is not None else open(path, 'rb')
+    status = 200
+    response_headers = dict(headers)
+
+    if ranges is None:
+        start, length = 0, size
+    elif len(ranges) == 1:
+        start, stop = ranges[0]
+        length = stop - start
+        status = 206
+        response_headers['Content-Range'] = f"bytes {start}-{stop - 1}/{size}"
+    else:
+        boundary = os.urandom(12).hex()
+        body = iter_multipart(source, ranges, size, headers['Content-Type'], boundary)
+        response_headers['Content-Type'] = f"multipart/byteranges; boundary={boundary}"
+        response_headers['Content-Length'] = str(
+            multipart_length(ranges, size, headers['Content-Type'], boundary)
+        )
+        response = Response(body, status=206, headers=response_headers, direct_passthrough=True)
+        if data is None:
+            response.call_on_close(source.close)
+        return response
+
+    response_headers['Content-Length'] = str(length)
+    if data is not None:
+        body = [data[start:start + length]]
+    elif start + length == size:
+        # حتى نهاية الملف: wsgi.file_wrapper (إن وفره الخادم) يرسله عبر sendfile
+        # من النواة مباشرة دون نسخه داخل Python
+        source.seek(start)
+        body = wrap_file(request.environ, source)
+    else:
+        body = iter_file_range(source, start, length)
+
+    response = Response(body, status=status, headers=response_headers, direct_passthrough=True)
+    if data is None:
+        response.call_on_close(source.close)
+    return response
+
+
+def serve_file(directory, filename, policy):
+    """إرسال ملف ثابت مع ETag قوي و Last-Modified ودعم طلبات 304 و Range"""
+    path = safe_join(os.path.join(BASE_DIR, directory), filename)
+    if path is None:
+        abort(404)
+
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        abort(404)
+
+    etag = file_versions.get(path, stat_result)
+    body_path = path
+    body_stat = stat_result
+    body_etag = etag
+    encoding = None
+
+    compressible = is_compressible(filename)
+    if compressible:
+        variant = pick_encoded_variant(path, stat_result)
+        if variant is not None:
+            encoding, body_path, body_stat = variant
+            body_etag = f"{etag}-{encoding}"
+
+    mimetype = guess_mimetype(filename)
+    if hot_cache.accepts(body_stat):
+        data, headers = load_hot_asset(body_path, body_stat, mimetype, body_etag)
+    else:
+        data, headers = None, file_headers(body_stat, mimetype, body_etag)
+    response = file_response(body_path, body_stat.st_size, headers, body_etag, data)
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    if compressible:
+        response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = cache_policy_for(filename, policy, etag)
+    response.headers.pop('Expires', None)
+    return response
+
+
+# إعدادات نسخ الصور المصغرة (العرض يقرب لأقرب قيمة مسموحة لمنع تضخم الذاكرة)
+VARIANT_WIDTHS = (160, 320, 400, 640, 800, 1024, 1280, 1600, 1920)
+VARIANT_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG', 'jpg': 'JPEG', 'png': 'PNG'}
+
+
+# مخزن النسخ المشتقة نفسه الذي يستخدمه مدير الصور (.fouad_cache/derivatives)
+variant_cache = DerivativeStore(
+    os.environ.get('VARIANT_CACHE_DIR', os.path.join(BASE_DIR, CACHE_DIR_NAME, DERIVATIVES_DIR_NAME)),
+    int(os.environ.get('VARIANT_CACHE_MAX_BYTES', 256 * 1024 * 1024)),
+) if DerivativeStore is not None else None
+
+
+def parse_variant_args(args):
+    """قراءة w و fmt و q من الرابط، أو None إذا طُلبت الصورة الأصلية"""
+    if not any(key in args for key in ('w', 'fmt', 'q')):
+        return None
+
+    try:
+        requested_width = int(args.get('w', VARIANT_WIDTHS[-1]))
+        quality = int(args.get('q', 80))
+    except ValueError:
+        abort(400)
+
+    output_format = args.get('fmt')
+    if output_format is not None:
+        output_format = VARIANT_FORMATS.get(output_format.lower())
+        if output_format is None:
+            abort(400)
+
+    width = next((w for w in VARIANT_WIDTHS if w >= requested_width), VARIANT_WIDTHS[-1])
+    quality = min(95, max(30, round(quality / 5) * 5))
+    return width, output_format, quality
+
+
+def serve_variant(directory, filename, width, output_format, quality):
+    """إرسال نسخة مصغرة من الصورة، وإنشاؤها عند أول طلب"""
+    source_path = os.path.join(BASE_DIR, directory, filename)
+    try:
+        source_etag = file_versions.get(source_path, os.stat(source_path))
+    except OSError:
+        abort(404)
+
+    if output_format is None:
+        output_format = VARIANT_FORMATS.get(os.path.splitext(filename)[1].lstrip('.').lower(), 'PNG')
+
+    # بصمة المصدر هي نفسها ETag الملف، فلا يُقرأ الملف مرة أخرى
+    for _ in range(3):
+        path = variant_cache.get_or_create(
+            source_path, [('fit', {'width': width})], output_format,
+            ImageProcessor.web_save_options(output_format, quality),
+            source_digest=source_etag,
+        )
+        try:
+            return serve_file(variant_cache.cache_dir, os.path.basename(path), 'images')
+        except (NotFound, FileNotFoundError):
+            # أخرجه خيط أو عملية أخرى قبل فتحه: الطلب التالي يعيد إنشاءه
+            continue
+    abort(503)
+
+
+# ===== المراقبة: مقاييس الطلبات بصيغة Prometheus =====
+
+# حدود فئات زمن الاستجابة بالثواني
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics:
+    """عدادات الطلبات لكل مسار: توزيع زمن الاستجابة، رموز الحالة، البايتات المرسلة"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.in_flight = 0
+        self._routes = {}  # المسار -> [عدادات الفئات، المجموع، العدد، البايتات]
+        self._statuses = {}  # (المسار، الحالة) -> العدد
+        self._lock = threading.Lock()
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(self, route, status, duration, sent_bytes):
+        index = bisect.bisect_left(self.buckets, duration)
+        with self._lock:
+            self.in_flight -= 1
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = [[0] * (len(self.buckets) + 1), 0.0, 0, 0]
+            stats[0][index] += 1
+            stats[1] += duration
+            stats[2] += 1
+            stats[3] += sent_bytes
+            key = (route, status)
+            self._statuses[key] = self._statuses.get(key, 0) + 1
+
+    def quantile(self, bucket_counts, total, q):
+        """تقدير النسبة المئوية من الفئات بالاستيفاء الخطي (كما في histogram_quantile)"""
+        if total == 0:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        lower = 0.0
+        for upper, count in zip(self.buckets, bucket_counts):
+            if cumulative + count >= rank and count:
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = upper
+        return self.buckets[-1]
+
+    def render(self):
+        """النص بصيغة Prometheus"""
+        with self._lock:
+            routes = {route: (list(stats[0]), stats[1], stats[2], stats[3])
+                      for route, stats in self._routes.items()}
+            statuses = dict(self._statuses)
+            in_flight = self.in_flight
+
+        lines = [
+            '# HELP http_request_duration_seconds Request latency per route.',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        for route, (counts, total_time, count, _) in sorted(routes.items()):
+            cumulative = 0
+            for upper, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'http_request_duration_seconds_bucket{{route="{route}",le="{upper}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_bucket{{route="{route}",le="+Inf"}} {count}')
+            lines.append(f'http_request_duration_seconds_sum{{route="{route}"}} {total_time:.6f}')
+            lines.append(f'http_request_duration_seconds_count{{route="{route}"}} {count}')
+
+        lines += [
+            '# HELP http_request_duration_quantile_seconds Estimated latency percentiles per route.',
+            '# TYPE http_request_duration_quantile_seconds gauge',
+        ]
+        for route, (counts, _, count, _) in sorted(routes.items()):
+            for q in (0.5, 0.95, 0.99):
+                value = self.quantile(counts, count, q)
+                lines.append(f'http_request_duration_quantile_seconds{{route="{route}",quantile="{q}"}} {value:.6f}')
+
+        lines += [
+            '# HELP http_requests_total Requests per route and status code.',
+            '# TYPE http_requests_total counter',
+        ]
+        for (route, status), count in sorted(statuses.items()):
+            lines.append(f'http_requests_total{{route="{route}",status="{status}"}} {count}')
+
+        lines += [
+            '# HELP http_response_bytes_total Response body bytes served per route.',
+            '# TYPE http_response_bytes_total counter',
+        ]
+        for route, (_, _, _, sent_bytes) in sorted(routes.items()):
+            lines.append(f'http_response_bytes_total{{route="{route}"}} {sent_bytes}')
+
+        lines += [
+            '# HELP http_requests_in_flight Requests currently being served.',
+            '# TYPE http_requests_in_flight gauge',
+            f'http_requests_in_flight {in_flight}',
+        ]
+
+        caches = [('hot_assets', hot_cache.stats())]
+        if variant_cache is not None:
+            caches.append(('image_variants', variant_cache.stats()))
+        for cache_name, stats in caches:
+            lookups = stats['hits'] + stats['misses']
+            ratio = stats['hits'] / lookups if lookups else 0.0
+            lines += [
+                f'# TYPE cache_{cache_name}_hits_total counter',
+                f'cache_{cache_name}_hits_total {stats["hits"]}',
+                f'# TYPE cache_{cache_name}_misses_total counter',
+                f'cache_{cache_name}_misses_total {stats["misses"]}',
+                f'# TYPE cache_{cache_name}_evictions_total counter',
+                f'cache_{cache_name}_evictions_total {stats["evictions"]}',
+                f'# TYPE cache_{cache_name}_bytes gauge',
+                f'cache_{cache_name}_bytes {stats["bytes"]}',
+                f'# TYPE cache_{cache_name}_hit_ratio gauge',
+                f'cache_{cache_name}_hit_ratio {ratio:.4f}',
+            ]
+
+        # في وضع الإنتاج لكل عملية عاملة عداداتها الخاصة
+        lines += [
+            '# TYPE process_worker_pid gauge',
+            f'process_worker_pid {os.getpid()}',
+        ]
+        return '\n'.join(lines) + '\n'
+
+
+request_metrics = RequestMetrics()
+
+
+class MetricsMiddleware:
+    """وسيط WSGI يقيس كل طلب حتى إرسال آخر بايت (يشمل sendfile)"""
+
+    def __init__(self, wsgi_app, metrics):
+        self.wsgi_app = wsgi_app
+        self.metrics = metrics
+
+    def __call__(self, environ, start_response):
+        started = time.perf_counter()
+        self.metrics.started()
+        response_info = {'status': 500, 'length': 0}
+
+        def capture_start_response(status, headers, exc_info=None):
+            response_info['status'] = int(status.split(None, 1)[0])
+            for key, value in headers:
+                if key.lower() == 'content-length':
+                    response_info['length'] = int(value)
+            return start_response(status, headers, exc_info)
+
+        try:
+            app_iter = self.wsgi_app(environ, capture_start_response)
+        except BaseException:
+            self._finish(environ, response_info, started)
+            raise
+        return ClosingIterator(app_iter, lambda: self._finish(environ, response_info, started))
+
+    def _finish(self, environ, response_info, started):
+        length = 0 if environ['REQUEST_METHOD'] == 'HEAD' else response_info['length']
+        self.metrics.finished(
+            environ.get('fouad.route', 'unmatched'),
+            response_info['status'],
+            time.perf_counter() - started,
+            length,
+        )
+
+
+app.wsgi_app = MetricsMiddleware(app.wsgi_app, request_metrics)
+
+
+@app.before_request
+def tag_route():
+    # اسم الدالة بدلاً من الرابط حتى لا تتضخم التسميات بأسماء الملفات
+    request.environ['fouad.route'] = request.endpoint or 'unmatched'
+
+
+@app.route('/metrics')
+def metrics():
+    return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 # الصفحة الرئيسية
 @app.route('/')
 def index():
-    return send_from_directory('.', 'index.html')
+    return serve_file('.', 'index.html', 'html')
 
 # صفحة الشراء
 @app.route('/checkout')
 @app.route('/checkout.html')
 def checkout():
-    return send_from_directory('.', 'checkout.html')
+    return serve_file('.', 'checkout.html', 'html')
 
 # صفحة التواصل
 @app.route('/contact')
 @app.route('/contact.html') 
 def contact():
-    return send_from_directory('.', 'contact.html')
+    return serve_file('.', 'contact.html', 'html')
 
 # صفحة البداية
 @app.route('/splash')
 @app.route('/splash.html')
 def splash():
-    return send_from_directory('.', 'splash.html')
+    return serve_file('.', 'splash.html', 'html')
 
 # الواجهة الرئيسية
 @app.route('/main')
 @app.route('/main.html')
 def main():
-    return send_from_directory('.', 'main.html')
+    return serve_file('.', 'main.html', 'html')
 
 # ملف CSS
 @app.route('/style.css')
 def style():
-    return send_from_directory('.', 'style.css')
+    return serve_file('.', 'style.css', 'css')
 
-# مجلد الصور - تجربة عدة مسارات
+# مجلد الصور - البحث في الفهرس المبني عند التشغيل
 @app.route('/images/<filename>')
 def images(filename):
-    import os
+    directory = image_index.lookup(filename)
+    if directory is not None:
+        # نسخة مصغرة عند الطلب: /images/<filename>?w=400&fmt=webp&q=80
+        variant = parse_variant_args(request.args)
+        if variant is not None and variant_cache is not None:
+            return serve_variant(directory, filename, *variant)
+        return serve_file(directory, filename, 'images')
     
-    # جرب المسارات المحتملة
-    possible_paths = ['صور', 'images', 'Images', 'صور', './صور', './images']
-    
-    for path in possible_paths:
-        if os.path.exists(path) and os.path.isdir(path):
-            file_path = os.path.join(path, filename)
-            if os.path.exists(file_path):
-                return send_from_directory(path, filename)
-    
-    # إذا لم توجد، أرجع خطأ مع تفاصيل
-    current_dir = os.getcwd()
-    dirs = [d for d in os.listdir('.') if os.path.isdir(d)]
-    return f"Image not found! Current dir: {current_dir}, Available dirs: {dirs}", 404
+    # إذا لم توجد، أرجع خطأ (بدون فحص إضافي للقرص)
+    return "Image not found!", 404
 
 # route للتشخيص
 @app.route('/debug')
 def debug():
+    # يكشف بنية الملفات، لذا يعمل في وضع التطوير فقط
+    if not app.debug:
+        abort(404)
+
     import os
     current_dir = os.getcwd()
     all_items = os.listdir('.')
@@ -82,7 +845,294 @@ def debug():
     
     return html
 
+# ===== وضع الإنتاج: عدة عمليات (pre-fork) وعدد ثابت من الخيوط لكل عملية =====
+
+class SendfileFileWrapper:
+    """wsgi.file_wrapper يرسل الملف من موضعه الحالي إلى المقبس عبر sendfile"""
+
+    def __init__(self, file, block_size=64 * 1024, connection=None):
+        self.file = file
+        self.block_size = block_size
+        self.connection = connection
+
+    def __iter__(self):
+        # كتابة فارغة تجبر Werkzeug على إرسال الترويسات قبل جسم الاستجابة
+        yield b''
+        offset = self.file.tell()
+        count = os.fstat(self.file.fileno()).st_size - offset
+        if count > 0:
+            # socket.sendfile يستخدم os.sendfile ويعود للإرسال العادي إن لم يتوفر
+            self.connection.sendfile(self.file, offset, count)
+
+    def close(self):
+        self.file.close()
+
+
+# WEB_SENDFILE=0 لتعطيل sendfile (للمقارنة في اختبارات الأداء)
+USE_SENDFILE = os.environ.get('WEB_SENDFILE', '1') != '0'
+
+
+# اتصالات مقبولة تنتظر خيطاً فارغاً؛ ما زاد يُرد عليه بـ 503 فوراً بدل طابور بلا حد
+MAX_PENDING_CONNECTIONS = int(os.environ.get('WEB_MAX_PENDING', 64))
+# فترة فحص الاتصال الخامل: يُغلق عند أول فحص تكون فيه اتصالات أخرى تنتظر خيطاً (ثوانٍ)
+IDLE_POLL_INTERVAL = 0.25
+
+SERVICE_UNAVAILABLE = (b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\n"
+                       b"Retry-After: 1\r\nConnection: close\r\n\r\n")
+
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    """معالج طلبات يغلق الاتصالات الخاملة حتى لا تحجز خيوط العامل"""
+
+    timeout = 15
+
+    def handle_one_request(self):
+        # الاتصال الخامل (اتصال مسبق من المتصفح لم يرسل طلبه، أو keep-alive بين طلبين)
+        # يحجز خيطاً؛ انتظار الطلب على فترات قصيرة ليُغلق فور انتظار اتصالات أخرى خيطاً
+        # بدل حجزه 15 ثانية
+        deadline = time.monotonic() + self.timeout
+        while not select.select([self.connection], [], [], IDLE_POLL_INTERVAL)[0]:
+            if self.server.saturated or time.monotonic() >= deadline:
+                self.close_connection = True
+                return
+        super().handle_one_request()
+
+    def make_environ(self):
+        environ = super().make_environ()
+        if USE_SENDFILE and self.server.ssl_context is None:
+            connection = self.connection
+            environ['wsgi.file_wrapper'] = (
+                lambda file, block_size=64 * 1024:
+                SendfileFileWrapper(file, block_size, connection)
+            )
+        return environ
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """خادم WSGI لعملية عاملة واحدة - يوزع الاتصالات على مجموعة خيوط محدودة"""
+
+    multithread = True
+
+    def __init__(self, host, port, wsgi_app, threads, fd, max_pending=MAX_PENDING_CONNECTIONS):
+        super().__init__(host, port, wsgi_app, handler=KeepAliveRequestHandler, fd=fd)
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self._pending_lock = threading.Lock()
+
+    @property
+    def saturated(self):
+        """هل توجد اتصالات مقبولة تنتظر خيطاً؟"""
+        return self.pending > 0
+
+    def process_request(self, request, client_address):
+        with self._pending_lock:
+            accepted = self.pending < self.max_pending
+            if accepted:
+                self.pending += 1
+            else:
+                self.rejected += 1
+        if not accepted:
+            # الطابور ممتلئ: رد سريع بدل تراكم المقابس في الذاكرة
+            try:
+                request.sendall(SERVICE_UNAVAILABLE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        self.executor.submit(self._process_request_thread, request, client_address)
+
+    def _process_request_thread(self, request, client_address):
+        with self._pending_lock:
+            self.pending -= 1
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def create_listen_socket(host, port, reuse_port=False):
+    """إنشاء مقبس استماع (مع SO_REUSEPORT عند طلبه ليحصل كل عامل على مقبسه)"""
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(host, port, threads, sock, reuse_port):
+    """حلقة العملية العاملة: تخدم الطلبات حتى تصلها SIGTERM ثم تنهي الطلبات الجارية"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    if reuse_port:
+        sock = create_listen_socket(host, port, reuse_port=True)
+    server = PooledWSGIServer(host, port, app, threads, fd=sock.fileno())
+    sock.close()
+
+    def graceful_stop(signum, frame):
+        # shutdown() ينتظر انتهاء serve_forever لذا يستدعى من خيط آخر
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, graceful_stop)
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        server.executor.shutdown(wait=True)
+
+
+# العامل الذي يتوقف قبل هذه المدة (ثوانٍ) يُعد متعطلاً عند البدء
+WORKER_MIN_UPTIME = 2.0
+# أقصى مهلة بين محاولات إعادة تشغيل عامل متعطل
+WORKER_MAX_BACKOFF = 30.0
+
+
+def run_production(host, port, workers, threads, reuse_port=False, graceful_timeout=30):
+    """المشغل الرئيسي: ينشئ العمليات العاملة ويعيد تشغيلها عند التعطل أو عند SIGHUP
+
+    SIGHUP يستبدل العمال فقط (إعادة فتح الملفات وبناء الفهارس والذاكرة المؤقتة)؛ الكود
+    نفسه لا يُعاد تحميله لأن العمال يُنسخون من المشغل الذي استورد التطبيق مسبقاً،
+    فتحديث الكود يحتاج إعادة تشغيل المشغل. العامل الذي يتعطل فور بدئه يُعاد تشغيله
+    بمهلة تتضاعف حتى WORKER_MAX_BACKOFF ثانية.
+    """
+    if not hasattr(os, 'fork'):
+        # Windows: لا يوجد fork، نكتفي بعملية واحدة متعددة الخيوط
+        print("⚠️ النظام لا يدعم fork - التشغيل بعملية واحدة")
+        server = PooledWSGIServer(host, port, app, threads, fd=None)
+        server.serve_forever()
+        return
+
+    reuse_port = reuse_port and hasattr(socket, 'SO_REUSEPORT')
+    if reuse_port:
+        # التأكد من توفر المنفذ مبكراً، ثم يفتح كل عامل مقبسه الخاص
+        create_listen_socket(host, port, reuse_port=True).close()
+        shared_sock = None
+    else:
+        # بدون SO_REUSEPORT يتشارك كل العمال مقبساً واحداً يفتحه المشغل
+        shared_sock = create_listen_socket(host, port)
+
+    children = {}
+    state = {'running': True, 'reload': False, 'failures': 0, 'next_spawn': 0.0}
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 1
+            try:
+                run_worker(host, port, threads, shared_sock, reuse_port)
+                exit_code = 0
+            finally:
+                # العامل لا يعود أبداً إلى حلقة المشغل
+                os._exit(exit_code)
+        children[pid] = time.monotonic()
+        return pid
+
+    def stop_children(pids, timeout):
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and any(pid in children for pid in pids):
+            reap()
+            time.sleep(0.1)
+        for pid in pids:
+            if pid in children:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def reap():
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            started = children.pop(pid, None)
+            if started is None or not state['running']:
+                continue
+            if time.monotonic() - started < WORKER_MIN_UPTIME:
+                # تعطل عند البدء (خطأ في الإعداد مثلاً): إبطاء إعادة المحاولة بدل حلقة سريعة
+                state['failures'] += 1
+                delay = min(WORKER_MAX_BACKOFF, 0.5 * 2 ** state['failures'])
+                state['next_spawn'] = time.monotonic() + delay
+                print(f"⚠️ العامل {pid} توقف فور بدئه - إعادة المحاولة بعد {delay:.0f} ثانية")
+            else:
+                state['failures'] = 0
+
+    def on_stop(signum, frame):
+        state['running'] = False
+
+    def on_reload(signum, frame):
+        state['reload'] = True
+
+    signal.signal(signal.SIGTERM, on_stop)
+    signal.signal(signal.SIGINT, on_stop)
+    signal.signal(signal.SIGHUP, on_reload)
+
+    for _ in range(workers):
+        spawn()
+    print(f"⚙️ وضع الإنتاج: {workers} عملية × {threads} خيط (المشغل {os.getpid()})")
+
+    while state['running']:
+        reap()
+        if state['reload']:
+            # استبدال متدرج: عمال جدد أولاً ثم إيقاف القدامى بهدوء
+            state['reload'] = False
+            old_pids = list(children)
+            for _ in range(workers):
+                spawn()
+            stop_children(old_pids, graceful_timeout)
+            print("🔄 تم استبدال العمال")
+        while state['running'] and len(children) < workers \
+                and time.monotonic() >= state['next_spawn']:
+            spawn()
+        time.sleep(0.5)
+
+    print("⏹️ إيقاف العمال...")
+    stop_children(list(children), graceful_timeout)
+    if shared_sock is not None:
+        shared_sock.close()
+
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="سيرفر فؤاد للأمن السيبراني")
+    parser.add_argument('--precompress', action='store_true',
+                        help="كتابة نسخ .gz/.br للملفات النصية ثم الخروج")
+    parser.add_argument('--production', action='store_true',
+                        default=os.environ.get('SERVER_MODE') == 'production',
+                        help="تشغيل وضع الإنتاج متعدد العمليات (أو SERVER_MODE=production)")
+    parser.add_argument('--workers', type=int,
+                        default=int(os.environ.get('WEB_WORKERS', os.cpu_count() or 1)),
+                        help="عدد العمليات العاملة (WEB_WORKERS)")
+    parser.add_argument('--threads', type=int,
+                        default=int(os.environ.get('WEB_THREADS', 8)),
+                        help="عدد الخيوط لكل عملية (WEB_THREADS)")
+    parser.add_argument('--reuse-port', action='store_true',
+                        default=os.environ.get('WEB_REUSE_PORT') == '1',
+                        help="مقبس مستقل لكل عامل عبر SO_REUSEPORT (WEB_REUSE_PORT=1)")
+    args = parser.parse_args()
+
+    # تجهيز النسخ المضغوطة مسبقاً حتى لا يدفع أي طلب ثمن الضغط
+    written = precompress_assets()
+    if args.precompress:
+        print(f"🗜️ تم إنشاء {written} نسخة مضغوطة")
+        raise SystemExit(0)
+
     # للنشر على منصات الاستضافة
     import os
     port = int(os.environ.get('PORT', 5000))
@@ -91,6 +1141,10 @@ if __name__ == '__main__':
     print(f"📱 الموقع متاح على المنفذ: {port}")
     print("⏹️  اضغط Ctrl+C لإيقاف السيرفر")
     
+    if args.production:
+        run_production('0.0.0.0', port, max(1, args.workers), max(1, args.threads), args.reuse_port)
+        raise SystemExit(0)
+
     # تشغيل محلي أم على منصة استضافة
     debug_mode = os.environ.get('FLASK_ENV') != 'production'
     app.run(debug=debug_mode, host='0.0.0.0', port=port)
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+أدوات مشتركة لسكربتات قياس الأداء
+Shared helpers for the benchmark scripts
+"""
+
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGE_DIRS = ['صور', 'images', 'Images']
+
+
+def site_images():
+    """أسماء الصور المتوفرة في مجلدات الموقع مع أحجامها"""
+    images = {}
+    for directory in IMAGE_DIRS:
+        path = os.path.join(PROJECT_DIR, directory)
+        if os.path.isdir(path):
+            for entry in os.scandir(path):
+                if entry.is_file():
+                    images.setdefault(entry.name, entry.stat().st_size)
+    return images
+
+
+def start_server(port, extra_args=(), env=None):
+    """تشغيل app.py.py في عملية منفصلة"""
+    server_env = dict(os.environ, PORT=str(port), FLASK_ENV='production')
+    server_env.update(env or {})
+    return subprocess.Popen(
+        [sys.executable, 'app.py.py', *extra_args],
+        cwd=PROJECT_DIR, env=server_env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_until_ready(url, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    sys.exit("❌ الخادم لم يبدأ")
+
+
+def stop_server(server):
+    server.terminate()
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياس التصغير السريع مقابل فك الترميز الكامل
+Fast downscale (JPEG draft + reduce) vs. full decode + LANCZOS
+
+ينشئ صور JPEG اصطناعية بعدة أحجام ثم يصغرها إلى عرض الهدف بالطريقتين،
+ويقيس الزمن وحجم البكسلات المفكوكة في الذاكرة والفرق في الجودة (PSNR).
+
+    python benchmarks/downscale.py --target 400
+"""
+
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageChops, ImageFilter, ImageStat
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fouad_image_processor import ImageProcessor  # noqa: E402
+
+SOURCE_WIDTHS = (1024, 2048, 4096, 6000)
+
+
+def make_source(path, width):
+    """صورة JPEG بتفاصيل حقيقية (تدرج + ضوضاء) بنسبة 3:2"""
+    height = width * 2 // 3
+    noise = Image.effect_noise((width, height), 64).filter(ImageFilter.GaussianBlur(1))
+    gradient = Image.linear_gradient('L').resize((width, height))
+    Image.merge('RGB', (noise, gradient, noise.transpose(Image.Transpose.FLIP_LEFT_RIGHT))) \
+        .save(path, quality=90)
+
+
+def downscale(path, target_width, fast):
+    """التصغير وإرجاع (الصورة، بايتات البكسلات المفكوكة)"""
+    with Image.open(path) as img:
+        target_height = max(1, round(img.height * target_width / img.width))
+        if fast:
+            img.draft(img.mode, (int(target_width * 2), int(target_height * 2)))
+        decoded_bytes = img.width * img.height * len(img.getbands())
+        result = ImageProcessor.resize(img, target_width, target_height, fast)
+    return result, decoded_bytes
+
+
+def best_time(path, target_width, fast, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result, decoded_bytes = downscale(path, target_width, fast)
+        timings.append(time.perf_counter() - started)
+    return min(timings), decoded_bytes, result
+
+
+def psnr(first, second):
+    diff = ImageChops.difference(first, second)
+    mse = sum(value ** 2 for value in ImageStat.Stat(diff).rms) / 3
+    return float('inf') if mse == 0 else 10 * math.log10(255 ** 2 / mse)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', type=int, default=400, help="عرض الصورة الناتجة")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'source':>11} {'full ms':>9} {'fast ms':>9} {'speedup':>8} "
+          f"{'full MB':>8} {'fast MB':>8} {'PSNR dB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for width in SOURCE_WIDTHS:
+            path = os.path.join(tmp, f'source_{width}.jpg')
+            make_source(path, width)
+            full_time, full_bytes, full_result = best_time(path, args.target, False, args.repeat)
+            fast_time, fast_bytes, fast_result = best_time(path, args.target, True, args.repeat)
+            print(f"{width:>5}x{width * 2 // 3:<5} {full_time * 1000:>9.1f} {fast_time * 1000:>9.1f} "
+                  f"{full_time / fast_time:>7.1f}x {full_bytes / 2 ** 20:>8.1f} "
+                  f"{fast_bytes / 2 ** 20:>8.1f} {psnr(full_result, fast_result):>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
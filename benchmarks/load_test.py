@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار حمل قابل للتكرار لمسارات الموقع
+Reproducible HTTP load test for the site routes
+
+يشغل app.py.py محلياً ويرسل طلبات إلى /، /main، /style.css وكل صورة
+بعدة مستويات من التزامن، ثم يحفظ النتائج بصيغة JSON ويقارنها بخط أساس
+محفوظ. أي تراجع يتجاوز الحدود المسموحة يجعل السكربت يخرج برمز 1.
+
+    python benchmarks/load_test.py                    # قياس ومقارنة
+    python benchmarks/load_test.py --update-baseline  # حفظ خط أساس جديد
+    python benchmarks/load_test.py --keep-alive --idle-connections 16
+                                                      # اتصالات دائمة مع عملاء خاملين
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import urllib.parse
+
+from common import PROJECT_DIR, site_images, start_server, stop_server, wait_until_ready
+
+DEFAULT_BASELINE = os.path.join(PROJECT_DIR, 'benchmarks', 'baseline.json')
+DEFAULT_RESULTS_DIR = os.path.join(PROJECT_DIR, 'benchmarks', 'results')
+
+
+def site_paths():
+    """المسارات المختبرة: الصفحات وملف CSS وكل صورة"""
+    paths = ['/', '/main', '/style.css']
+    paths += [f"/images/{urllib.parse.quote(name)}" for name in sorted(site_images())]
+    return paths
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def open_idle_connections(port, count):
+    """اتصالات مفتوحة لا ترسل شيئاً (مثل الاتصالات المسبقة للمتصفحات) وتحجز خيوط الخادم
+
+    خادم Werkzeug يغلق الاتصال بعد كل استجابة، فالاتصال لا يبقى خاملاً إلا قبل طلبه الأول.
+    """
+    connections = []
+    for _ in range(count):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        try:
+            connection.connect()
+        except OSError:
+            connection.close()
+            continue
+        connections.append(connection)
+    return connections
+
+
+def run_level(port, path, concurrency, duration, keep_alive=False, idle_connections=0):
+    """إرسال الطلبات إلى مسار واحد بعدد ثابت من العملاء المتزامنين لمدة محددة
+
+    keep_alive: كل عميل يعيد استخدام اتصاله ما لم يغلقه الخادم.
+    idle_connections: اتصالات خاملة مفتوحة طوال القياس تحجز خيوط الخادم.
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    idle = open_idle_connections(port, idle_connections)
+    deadline = time.perf_counter() + duration
+
+    def client():
+        local_latencies = []
+        local_errors = 0
+        connection = None
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                if connection is None:
+                    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+                connection.request('GET', path, headers={'Accept-Encoding': 'gzip, br'})
+                response = connection.getresponse()
+                response.read()
+                if not keep_alive or response.will_close:
+                    connection.close()
+                    connection = None
+                if response.status >= 400:
+                    local_errors += 1
+                    continue
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                if connection is not None:
+                    connection.close()
+                    connection = None
+                continue
+            local_latencies.append(time.perf_counter() - started)
+        if connection is not None:
+            connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    for connection in idle:
+        connection.close()
+
+    latencies.sort()
+    total = len(latencies) + errors[0]
+    return {
+        'requests': total,
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'error_rate': round(errors[0] / total, 4) if total else 0.0,
+    }
+
+
+def compare(results, baseline, max_rps_drop, max_latency_increase):
+    """مقارنة النتائج بخط الأساس وإرجاع قائمة التراجعات"""
+    regressions = []
+    for key, current in results['levels'].items():
+        previous = baseline.get('levels', {}).get(key)
+        if previous is None:
+            continue
+        if previous['rps'] and current['rps'] < previous['rps'] * (1 - max_rps_drop):
+            regressions.append(f"{key}: RPS {previous['rps']} → {current['rps']}")
+        if previous['p95_ms'] and current['p95_ms'] > previous['p95_ms'] * (1 + max_latency_increase):
+            regressions.append(f"{key}: p95 {previous['p95_ms']}ms → {current['p95_ms']}ms")
+        if current['error_rate'] > previous['error_rate']:
+            regressions.append(f"{key}: errors {previous['error_rate']} → {current['error_rate']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=5091)
+    parser.add_argument('--concurrency', default='1,8,32', help="مستويات التزامن مفصولة بفواصل")
+    parser.add_argument('--duration', type=float, default=3.0, help="ثوانٍ لكل مسار ومستوى")
+    parser.add_argument('--server-args', default='--production',
+                        help="وسائط تشغيل app.py.py (فارغ = خادم التطوير)")
+    parser.add_argument('--keep-alive', action='store_true', help="إعادة استخدام الاتصال لكل عميل")
+    parser.add_argument('--idle-connections', type=int, default=0,
+                        help="اتصالات keep-alive خاملة مفتوحة أثناء كل قياس")
+    parser.add_argument('--output', help="ملف JSON للنتائج (افتراضياً benchmarks/results/<الوقت>.json)")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help="حفظ النتائج كخط أساس جديد")
+    parser.add_argument('--max-rps-drop', type=float, default=0.15, help="أقصى انخفاض مسموح في RPS")
+    parser.add_argument('--max-latency-increase', type=float, default=0.25, help="أقصى زيادة مسموحة في p95")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(',') if level]
+    server = start_server(args.port, args.server_args.split())
+    try:
+        wait_until_ready(f'http://127.0.0.1:{args.port}/style.css')
+        results = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'server_args': args.server_args,
+            'duration': args.duration,
+            'keep_alive': args.keep_alive,
+            'idle_connections': args.idle_connections,
+            'levels': {},
+        }
+        for path in site_paths():
+            for concurrency in levels:
+                # مفتاح مختلف لكل وضع حتى لا يُقارن بقياس اتصال جديد لكل طلب
+                key = f"{urllib.parse.unquote(path)} @{concurrency}"
+                if args.keep_alive:
+                    key += " keep-alive"
+                if args.idle_connections:
+                    key += f" +{args.idle_connections} idle"
+                level = run_level(args.port, path, concurrency, args.duration,
+                                  args.keep_alive, args.idle_connections)
+                results['levels'][key] = level
+                print(f"{key:<40} {level['rps']:>9.1f} rps  p50 {level['p50_ms']:>8.2f}ms  "
+                      f"p95 {level['p95_ms']:>8.2f}ms  p99 {level['p99_ms']:>8.2f}ms  "
+                      f"errors {level['error_rate']:.2%}")
+    finally:
+        stop_server(server)
+
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"load_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"💾 النتائج: {output}")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"📌 تم حفظ خط الأساس: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("ℹ️ لا يوجد خط أساس للمقارنة (استخدم --update-baseline)")
+        return
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.max_rps_drop, args.max_latency_increase)
+    if regressions:
+        print("❌ تراجع في الأداء:")
+        for regression in regressions:
+            print(f"   - {regression}")
+        sys.exit(1)
+    print("✅ لا يوجد تراجع مقارنة بخط الأساس")
+
+
+if __name__ == '__main__':
+    main()
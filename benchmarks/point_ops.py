@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياس العمليات النقطية المدمجة مقابل ImageEnhance
+Fused point-operation LUT vs. chained ImageEnhance passes
+
+يقارن لكل حجم صورة:
+  - enhance: سلسلة ImageEnhance (تمريرة وصورة وسيطة كاملة لكل عملية)
+  - fused:   apply_point_operations (جدول بحث واحد لكل قناة، تمريرة واحدة في Pillow)
+  - numpy:   نفس الجدول مطبقاً على مصفوفة NumPy (إن كانت NumPy مثبتة)
+
+    python benchmarks/point_ops.py
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from PIL import Image, ImageChops, ImageEnhance
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fouad_image_processor import _color_luts, _luminance_mean, _point_curve, apply_point_operations  # noqa: E402
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SIZES = ((1024, 768), (2048, 1536), (4000, 3000))
+CHAIN = [('brightness', {'factor': 1.2}), ('contrast', {'factor': 1.3})]
+
+
+def make_image(size):
+    noise = Image.effect_noise(size, 64)
+    return Image.merge('RGB', (noise, noise.transpose(Image.Transpose.FLIP_LEFT_RIGHT),
+                               noise.transpose(Image.Transpose.FLIP_TOP_BOTTOM)))
+
+
+def enhance_chain(img):
+    img = ImageEnhance.Brightness(img).enhance(CHAIN[0][1]['factor'])
+    return ImageEnhance.Contrast(img).enhance(CHAIN[1][1]['factor'])
+
+
+def numpy_chain(img):
+    """بناء الجدول بنفس الطريقة ثم تطبيقه بالفهرسة في NumPy"""
+    luts = _color_luts(img, _point_curve(*CHAIN[0]))
+    curve = _point_curve(CHAIN[1][0], CHAIN[1][1], _luminance_mean(img, luts))
+    table = np.array([[curve[value] for value in lut] for lut in luts], dtype=np.uint8)
+    pixels = np.asarray(img)
+    return Image.fromarray(table[np.arange(table.shape[0]), pixels])
+
+
+def best_time(function, img, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(img)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def max_difference(first, second):
+    return max(high for _, high in ImageChops.difference(first, second).getextrema())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    variants = [('fused', lambda img: apply_point_operations(img, CHAIN))]
+    if np is not None:
+        variants.append(('numpy', numpy_chain))
+    else:
+        print("ℹ️ NumPy غير مثبتة - تخطي قياس numpy")
+
+    print(f"{'size':>11} {'enhance ms':>11} " + ' '.join(
+        f"{name + ' ms':>10} {'speedup':>8} {'max diff':>8}" for name, _ in variants))
+    for size in SIZES:
+        img = make_image(size)
+        enhance_time, reference = best_time(enhance_chain, img, args.repeat)
+        row = f"{size[0]:>5}x{size[1]:<5} {enhance_time * 1000:>11.1f} "
+        for _, function in variants:
+            elapsed, result = best_time(function, img, args.repeat)
+            row += (f"{elapsed * 1000:>10.1f} {enhance_time / elapsed:>7.1f}x "
+                    f"{max_difference(reference, result):>8} ")
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياس استهلاك المعالج لكل ميجابايت عند إرسال الصور الكبيرة
+CPU per megabyte served: sendfile (wsgi.file_wrapper) vs. Python buffers
+
+يشغل app.py.py في وضع الإنتاج بعامل واحد مرتين (WEB_SENDFILE=1 ثم 0)
+ويقرأ زمن المعالج للخادم من /proc (Linux فقط).
+"""
+
+import argparse
+import os
+import sys
+import time
+import urllib.parse
+import urllib.request
+
+from common import site_images, start_server, stop_server, wait_until_ready
+
+
+def largest_image():
+    """أكبر صورة في مجلدات الموقع"""
+    images = site_images()
+    if not images:
+        sys.exit("❌ لا توجد صور للاختبار")
+    return max((size, name) for name, size in images.items())
+
+
+def process_tree_cpu(pid):
+    """زمن المعالج (user + system) بالثواني للعملية وأبنائها المباشرين"""
+    ticks = os.sysconf('SC_CLK_TCK')
+    pids = [pid]
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            pids += [int(child) for child in f.read().split()]
+    except OSError:
+        pass
+
+    total = 0
+    for child in pids:
+        try:
+            with open(f'/proc/{child}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            total += int(fields[11]) + int(fields[12])
+        except OSError:
+            continue
+    return total / ticks
+
+
+def measure(port, image_name, requests_count, use_sendfile):
+    server = start_server(
+        port,
+        ['--production', '--workers', '1', '--threads', '4'],
+        env={'WEB_SENDFILE': '1' if use_sendfile else '0', 'HOT_CACHE_MAX_BYTES': '0'},
+    )
+    try:
+        base = f'http://127.0.0.1:{port}'
+        url = f'{base}/images/{urllib.parse.quote(image_name)}'
+        wait_until_ready(f'{base}/style.css')
+
+        cpu_before = process_tree_cpu(server.pid)
+        started = time.perf_counter()
+        served = 0
+        for _ in range(requests_count):
+            with urllib.request.urlopen(url) as response:
+                while True:
+                    chunk = response.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    served += len(chunk)
+        elapsed = time.perf_counter() - started
+        cpu = process_tree_cpu(server.pid) - cpu_before
+    finally:
+        stop_server(server)
+
+    megabytes = served / (1024 * 1024)
+    return {
+        'mode': 'sendfile' if use_sendfile else 'python',
+        'megabytes': round(megabytes, 1),
+        'seconds': round(elapsed, 2),
+        'cpu_ms_per_mb': round(cpu * 1000 / megabytes, 3),
+        'mb_per_second': round(megabytes / elapsed, 1),
+    }
+
+
+def main():
+    if not sys.platform.startswith('linux'):
+        sys.exit("❌ هذا القياس يقرأ /proc ويعمل على Linux فقط")
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200, help="عدد مرات تحميل الصورة لكل وضع")
+    parser.add_argument('--port', type=int, default=5090)
+    args = parser.parse_args()
+
+    size, image_name = largest_image()
+    print(f"🖼️ {image_name} ({size / (1024 * 1024):.2f} MB) × {args.requests}")
+
+    results = [measure(args.port, image_name, args.requests, use_sendfile)
+               for use_sendfile in (True, False)]
+    for result in results:
+        print(f"{result['mode']:>8}: {result['cpu_ms_per_mb']:8.3f} ms CPU/MB  "
+              f"{result['mb_per_second']:8.1f} MB/s  ({result['megabytes']} MB)")
+
+    sendfile_cpu, python_cpu = results[0]['cpu_ms_per_mb'], results[1]['cpu_ms_per_mb']
+    if sendfile_cpu > 0:
+        print(f"⚡ sendfile يوفر {python_cpu / sendfile_cpu:.1f}× من زمن المعالج لكل ميجابايت")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+بناء نسخة ثابتة من موقع فؤاد للأمن السيبراني
+Static site build/export for Fouad Cyber Security Store
+ينتج مجلد dist/ جاهزاً للرفع: ملفات مصغرة، أسماء تحمل بصمة المحتوى، ونسخ ويب للصور
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import urllib.parse
+from typing import Dict, Any, List, Optional
+
+# معالج الصور اختياري: بدون Pillow تُنسخ الصور الأصلية فقط
+try:
+    from fouad_image_processor import ImageProcessor
+except ImportError:
+    ImageProcessor = None
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGE_DIRS = ['صور', 'images', 'Images']
+STYLESHEETS = ['style.css']
+VARIANT_WIDTHS = (400, 800)
+VARIANT_QUALITY = 80
+# سجل البناء التزايدي خارج مجلد الإخراج حتى لا يُرفع مع الموقع، في مجلد ذاكرة
+# المشروع (.fouad_cache) وبملف لكل مجلد إخراج
+MANIFEST_DIR = os.path.join('.fouad_cache', 'build')
+# الاسم القديم داخل مجلد الإخراج، يُحذف عند أول بناء
+LEGACY_MANIFEST_NAME = '.build-manifest.json'
+
+# ملف _headers لـ Netlify: الملفات ذات البصمة لا تتغير أبداً فتُخزن لمدة سنة
+NETLIFY_HEADERS = """/images/*
+  Cache-Control: public, max-age=31536000, immutable
+/style.*.css
+  Cache-Control: public, max-age=31536000, immutable
+"""
+
+# وسوم يجب عدم المساس بمحتواها عند تصغير HTML
+RAW_TAGS_RE = re.compile(r'(<(script|style|pre|textarea)\b[^>]*>)(.*?)(</\2\s*>)', re.S | re.I)
+IMG_SRC_RE = re.compile(r'<img\b([^>]*?)\bsrc="/images/([^"]+)"([^>]*)>', re.I)
+STYLESHEET_HREF_RE = re.compile(r'href="/?(%s)"' % '|'.join(re.escape(name) for name in STYLESHEETS))
+CSS_IMAGE_URL_RE = re.compile(r'url\((["\']?)/images/([^)"\']+)\1\)')
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprinted_name(filename: str, digest: str, suffix: str = '') -> str:
+    """style.css -> style.3f2a9c1b.css"""
+    name, ext = os.path.splitext(filename)
+    return f"{name}.{digest[:8]}{suffix}{ext}"
+
+
+def minify_css(css: str) -> str:
+    """تصغير CSS بشكل آمن: حذف التعليقات والمسافات الزائدة دون المساس بالسلاسل النصية"""
+    # الأجزاء ذات الفهارس الفردية سلاسل نصية لا تُمس
+    parts = re.split(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')', css)
+    for i in range(0, len(parts), 2):
+        part = re.sub(r'/\*.*?\*/', '', parts[i], flags=re.S)
+        part = re.sub(r'\s+', ' ', part)
+        part = re.sub(r'\s*([{};,>])\s*', r'\1', part)
+        part = re.sub(r':\s+', ':', part)
+        part = part.replace(';}', '}')
+        parts[i] = part
+    return ''.join(parts).strip()
+
+
+def minify_js(js: str) -> str:
+    """تصغير JavaScript محافظ: حذف المسافات البادئة والأسطر الفارغة وأسطر التعليقات الكاملة"""
+    lines = []
+    for line in js.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith('//'):
+            continue
+        lines.append(stripped)
+    return '\n'.join(lines)
+
+
+def minify_html(html: str) -> str:
+    """تصغير HTML: حذف التعليقات والمسافات بين الوسوم، مع تصغير محتوى script و style"""
+    raw_blocks = []
+
+    def protect(match):
+        opening, tag, content, closing = match.groups()
+        tag = tag.lower()
+        if tag == 'style':
+            content = minify_css(content)
+        elif tag == 'script':
+            content = minify_js(content)
+        raw_blocks.append(opening + content + closing)
+        return f"\x00{len(raw_blocks) - 1}\x00"
+
+    html = RAW_TAGS_RE.sub(protect, html)
+    html = re.sub(r'<!--(?!\[if).*?-->', '', html, flags=re.S)
+    # المسافات بين الوسوم على أسطر منفصلة فقط، حتى لا تلتصق العناصر السطرية
+    html = re.sub(r'>\s*\n\s*<', '><', html)
+    html = re.sub(r'\s+', ' ', html)
+    html = re.sub(r'\x00(\d+)\x00', lambda m: raw_blocks[int(m.group(1))], html)
+    return html.strip()
+
+
+def manifest_path_for(project_dir: str, output_dir: str) -> str:
+    """مسار سجل البناء الخاص بمجلد الإخراج"""
+    key = hashlib.sha256(os.path.abspath(output_dir).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(project_dir, MANIFEST_DIR, f"manifest-{key}.json")
+
+
+class SiteBuilder:
+    """باني الموقع الثابت - يعيد بناء ما تغير مصدره فقط"""
+
+    def __init__(self, project_dir: str, output_dir: str, widths=VARIANT_WIDTHS):
+        self.project_dir = project_dir
+        self.output_dir = output_dir
+        self.widths = tuple(widths)
+        self.manifest_path = manifest_path_for(project_dir, output_dir)
+        self.manifest = self._load_manifest()
+        self.assets: Dict[str, Dict[str, Any]] = {}
+        self.rebuilt: List[str] = []
+        self.skipped: List[str] = []
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {'sources': {}}
+        # تغيير إعدادات النسخ يعني إعادة بناء الصور
+        if manifest.get('widths') != list(self.widths):
+            manifest['sources'] = {
+                key: value for key, value in manifest.get('sources', {}).items()
+                if value.get('kind') != 'image'
+            }
+        return manifest
+
+    def _save_manifest(self):
+        self.manifest['widths'] = list(self.widths)
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+
+    def _source_state(self, path: str) -> Dict[str, int]:
+        stat_result = os.stat(path)
+        return {'mtime_ns': stat_result.st_mtime_ns, 'size': stat_result.st_size}
+
+    def _is_fresh(self, key: str, state: Dict[str, int], extra: Optional[str] = None) -> bool:
+        """المصدر لم يتغير ومخرجاته السابقة ما زالت موجودة"""
+        entry = self.manifest['sources'].get(key)
+        if not entry or entry.get('mtime_ns') != state['mtime_ns'] or entry.get('size') != state['size']:
+            return False
+        if extra is not None and entry.get('extra') != extra:
+            return False
+        return all(os.path.exists(os.path.join(self.output_dir, output)) for output in entry['outputs'])
+
+    def _record(self, key: str, kind: str, state: Dict[str, int], outputs: List[str],
+                info: Dict[str, Any], extra: Optional[str] = None):
+        # حذف المخرجات القديمة التي لم تعد مستخدمة (بصمة قديمة)
+        old = self.manifest['sources'].get(key, {})
+        for output in set(old.get('outputs', [])) - set(outputs):
+            try:
+                os.remove(os.path.join(self.output_dir, output))
+            except OSError:
+                pass
+        self.manifest['sources'][key] = dict(
+            state, kind=kind, outputs=outputs, info=info, extra=extra
+        )
+
+    def _write(self, relative_path: str, data: bytes):
+        path = os.path.join(self.output_dir, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def find_images(self) -> Dict[str, str]:
+        """اسم الصورة -> مسارها (المجلد الأول له الأولوية كما في الخادم)"""
+        images = {}
+        for directory in IMAGE_DIRS:
+            path = os.path.join(self.project_dir, directory)
+            if not os.path.isdir(path):
+                continue
+            for entry in os.scandir(path):
+                if entry.is_file():
+                    images.setdefault(entry.name, entry.path)
+        return images
+
+    def build_image(self, filename: str, source_path: str):
+        """نسخ الصورة باسم يحمل البصمة وإنشاء نسخ ويب مصغرة منها"""
+        key = f"images/{filename}"
+        state = self._source_state(source_path)
+        if self._is_fresh(key, state):
+            self.assets[key] = self.manifest['sources'][key]['info']
+            self.skipped.append(key)
+            return
+
+        digest = file_digest(source_path)
+        output = f"images/{fingerprinted_name(filename, digest)}"
+        destination = os.path.join(self.output_dir, output)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.copy2(source_path, destination)
+        outputs = [output]
+        info: Dict[str, Any] = {'url': '/' + output, 'variants': []}
+
+        if ImageProcessor is not None:
+            processor = ImageProcessor(os.path.dirname(source_path))
+            for width in self.widths:
+                variant = f"images/{fingerprinted_name(filename, digest, f'.w{width}')}"
+                variant = os.path.splitext(variant)[0] + '.webp'
+                try:
+                    processor.create_web_variant(
+                        filename, os.path.join(self.output_dir, variant), width, 'WEBP', VARIANT_QUALITY
+                    )
+                except Exception as e:
+                    print(f"⚠️ {filename}: {e}")
+                    continue
+                outputs.append(variant)
+                info['variants'].append({'url': '/' + variant, 'width': width})
+
+        self._record(key, 'image', state, outputs, info)
+        self.assets[key] = info
+        self.rebuilt.append(key)
+
+    def rewrite_image_urls(self, text: str, css: bool = False) -> str:
+        def asset_url(filename):
+            info = self.assets.get(f"images/{urllib.parse.unquote(filename)}")
+            return None if info is None else urllib.parse.quote(info['url'])
+
+        if css:
+            def replace_css(match):
+                url = asset_url(match.group(2))
+                return match.group(0) if url is None else f"url({match.group(1)}{url}{match.group(1)})"
+            return CSS_IMAGE_URL_RE.sub(replace_css, text)
+
+        def replace_img(match):
+            before, filename, after = match.groups()
+            info = self.assets.get(f"images/{urllib.parse.unquote(filename)}")
+            if info is None:
+                return match.group(0)
+            attributes = f' src="{urllib.parse.quote(info["url"])}"'
+            if info['variants'] and 'srcset=' not in before + after:
+                srcset = ', '.join(
+                    f"{urllib.parse.quote(variant['url'])} {variant['width']}w"
+                    for variant in info['variants']
+                )
+                attributes += f' srcset="{srcset}" sizes="(max-width: 768px) 100vw, 400px" loading="lazy"'
+            return f"<img{before}{attributes}{after}>"
+
+        return IMG_SRC_RE.sub(replace_img, text)
+
+    def build_stylesheet(self, filename: str):
+        source_path = os.path.join(self.project_dir, filename)
+        if not os.path.exists(source_path):
+            return
+        key = filename
+        state = self._source_state(source_path)
+        # ملف CSS يعاد بناؤه أيضاً إذا تغيرت روابط الصور التي يشير إليها
+        extra = self.assets_fingerprint()
+        if self._is_fresh(key, state, extra):
+            self.assets[key] = self.manifest['sources'][key]['info']
+            self.skipped.append(key)
+            return
+
+        with open(source_path, encoding='utf-8') as f:
+            css = minify_css(self.rewrite_image_urls(f.read(), css=True))
+        data = css.encode('utf-8')
+        output = fingerprinted_name(filename, hashlib.sha256(data).hexdigest())
+        self._write(output, data)
+        info = {'url': output}
+        self._record(key, 'stylesheet', state, [output], info, extra)
+        self.assets[key] = info
+        self.rebuilt.append(key)
+
+    def assets_fingerprint(self) -> str:
+        """بصمة جدول الروابط: أي تغيير فيه يستلزم إعادة كتابة الصفحات"""
+        mapping = json.dumps(self.assets, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(mapping.encode('utf-8')).hexdigest()
+
+    def build_page(self, filename: str):
+        source_path = os.path.join(self.project_dir, filename)
+        key = filename
+        state = self._source_state(source_path)
+        extra = self.assets_fingerprint()
+        if self._is_fresh(key, state, extra):
+            self.skipped.append(key)
+            return
+
+        with open(source_path, encoding='utf-8') as f:
+            html = f.read()
+        html = self.rewrite_image_urls(html)
+        html = STYLESHEET_HREF_RE.sub(
+            lambda m: f'href="{self.assets[m.group(1)]["url"]}"' if m.group(1) in self.assets else m.group(0),
+            html,
+        )
+        self._write(filename, minify_html(html).encode('utf-8'))
+        self._record(key, 'page', state, [filename], {}, extra)
+        self.rebuilt.append(key)
+
+    def build(self):
+        """بناء الموقع: الصور أولاً، ثم CSS، ثم الصفحات التي تشير إليهما"""
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        images = self.find_images()
+        for filename, source_path in sorted(images.items()):
+            self.build_image(filename, source_path)
+
+        for stylesheet in STYLESHEETS:
+            self.build_stylesheet(stylesheet)
+
+        pages = sorted(name for name in os.listdir(self.project_dir) if name.endswith('.html'))
+        for page in pages:
+            self.build_page(page)
+
+        # حذف مخرجات المصادر التي لم تعد موجودة
+        current = {f"images/{name}" for name in images} | set(STYLESHEETS) | set(pages)
+        for key in set(self.manifest['sources']) - current:
+            for output in self.manifest['sources'].pop(key).get('outputs', []):
+                try:
+                    os.remove(os.path.join(self.output_dir, output))
+                except OSError:
+                    pass
+
+        self._write('_headers', NETLIFY_HEADERS.encode('utf-8'))
+        self._save_manifest()
+        try:
+            os.remove(os.path.join(self.output_dir, LEGACY_MANIFEST_NAME))
+        except OSError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="بناء نسخة ثابتة من الموقع في مجلد dist/")
+    parser.add_argument('--output', default=os.path.join(PROJECT_DIR, 'dist'), help="مجلد الإخراج")
+    parser.add_argument('--clean', action='store_true', help="حذف مجلد الإخراج وإعادة بناء كل شيء")
+    parser.add_argument('--widths', default=','.join(str(w) for w in VARIANT_WIDTHS),
+                        help="عروض نسخ الويب للصور مفصولة بفواصل")
+    args = parser.parse_args()
+
+    if args.clean:
+        if os.path.isdir(args.output):
+            shutil.rmtree(args.output)
+        try:
+            os.remove(manifest_path_for(PROJECT_DIR, args.output))
+        except OSError:
+            pass
+    if ImageProcessor is None:
+        print("⚠️ Pillow غير مثبت - سيتم نسخ الصور بدون إنشاء نسخ الويب")
+
+    widths = [int(width) for width in args.widths.split(',') if width]
+    builder = SiteBuilder(PROJECT_DIR, args.output, widths)
+    builder.build()
+    print(f"📦 تم البناء في: {args.output}")
+    print(f"🔨 أعيد بناء {len(builder.rebuilt)} ملف، ولم يتغير {len(builder.skipped)}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
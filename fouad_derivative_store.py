@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+مخزن النسخ المشتقة من الصور
+Content-addressed derivative store shared by the image manager and the site server
+
+مفتاح كل نسخة = بصمة محتوى المصدر + العمليات بعد توحيد معاملاتها + صيغة
+الحفظ وخياراته. تكرار العملية نفسها يعيد الملف المخزن فوراً، والنسخ المتطابقة
+من ملفات مكررة بأسماء مختلفة تُخزن مرة واحدة.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from fouad_file_digest import file_digest
+from fouad_image_metadata import CACHE_DIR_NAME
+from fouad_image_processor import ImageProcessor, Operation, normalize_operations
+
+DERIVATIVES_DIR_NAME = 'derivatives'
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# أقل مدة (ثوانٍ) بين إعادة قراءة المجلد لمعرفة ما كتبته العمليات الأخرى
+DISK_SYNC_INTERVAL = 10.0
+
+# امتداد الملف المخزن حسب صيغة الحفظ
+FORMAT_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp', 'GIF': '.gif', 'BMP': '.bmp'}
+
+
+class SourceDigests:
+    """بصمات محتوى المصادر - تُحسب مرة واحدة لكل نسخة من الملف (مثل ETag الخادم)"""
+
+    def __init__(self):
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    def get(self, path, stat_result=None):
+        stat_result = stat_result or os.stat(path)
+        key = (stat_result.st_mtime_ns, stat_result.st_size)
+        cached = self._digests.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        digest = file_digest(path)
+        with self._lock:
+            self._digests[path] = (key, digest)
+        return digest
+
+
+def _canonical(value):
+    """2.0 و 2 نفس المعامل؛ القوائم والقواميس تُوحد بشكل متكرر"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _canonical(item) for key, item in value.items()}
+    return value
+
+
+def derivative_name(source_digest: str, operations: List[Operation], output_format: str,
+                    encoder: Optional[Dict[str, Any]] = None) -> str:
+    """اسم الملف المخزن: بصمة الوصفة كاملة + امتداد الصيغة"""
+    recipe = json.dumps({
+        'source': source_digest,
+        'operations': _canonical(normalize_operations(operations)),
+        'format': output_format.upper(),
+        'encoder': _canonical(encoder or {}),
+    }, sort_keys=True, separators=(',', ':'))
+    extension = FORMAT_EXTENSIONS.get(output_format.upper(), f".{output_format.lower()}")
+    return hashlib.sha256(recipe.encode('utf-8')).hexdigest()[:32] + extension
+
+
+class DerivativeStore:
+    """مخزن قرص محدود الحجم مع إخراج الأقدم استخداماً (LRU)
+
+    المجلد مشترك بين عمليات الخادم ومدير الصور. كل عملية تحسب الحجم من نسختها
+    وتعيد قراءة المجلد عند الإضافة مرة كل DISK_SYNC_INTERVAL ثانية، فالحد مطبق على
+    القرص كله لكنه تقريبي بين مرتي قراءة. وقت التعديل يحفظ ترتيب الاستخدام لكل العمليات.
+    ملف أُعيد مساره قد يُخرج قبل فتحه: عند FileNotFoundError يُطلب من جديد فيُعاد إنشاؤه.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.digests = SourceDigests()
+        self._entries = OrderedDict()  # اسم الملف -> الحجم
+        self._total_bytes = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._synced_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load_existing()
+
+    @classmethod
+    def for_project(cls, project_path: str, max_bytes: int = DEFAULT_MAX_BYTES) -> 'DerivativeStore':
+        """المخزن المشترك للمشروع: .fouad_cache/derivatives (نفس مسار الخادم الافتراضي)"""
+        return cls(os.path.join(project_path, CACHE_DIR_NAME, DERIVATIVES_DIR_NAME), max_bytes)
+
+    def _load_existing(self):
+        """استرجاع محتوى المخزن بعد إعادة التشغيل بترتيب آخر استخدام"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._sync_from_disk()
+
+    def _sync_from_disk(self):
+        """إعادة بناء القائمة من المجلد (ما كتبته أو حذفته العمليات الأخرى) ثم الإخراج"""
+        existing = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                try:
+                    stat_result = entry.stat()
+                except OSError:
+                    continue
+                existing.append((stat_result.st_mtime, entry.name, stat_result.st_size))
+
+        self._entries.clear()
+        self._total_bytes = 0
+        for _, name, size in sorted(existing):
+            self._entries[name] = size
+            self._total_bytes += size
+        self._synced_at = time.monotonic()
+        self._evict()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+    def _touch(self, name) -> bool:
+        """تحديث ترتيب الاستخدام؛ False إذا حذفت عملية أخرى الملف"""
+        try:
+            # وقت التعديل يحفظ ترتيب الاستخدام بين مرات التشغيل
+            os.utime(os.path.join(self.cache_dir, name))
+        except OSError:
+            self._total_bytes -= self._entries.pop(name)
+            return False
+        self._entries.move_to_end(name)
+        return True
+
+    def lookup(self, name: str) -> Optional[str]:
+        """مسار النسخة المخزنة أو None"""
+        with self._lock:
+            if name in self._entries and self._touch(name):
+                return os.path.join(self.cache_dir, name)
+        return None
+
+    def get_or_render(self, name: str, render: Callable[[str], Any]) -> str:
+        """إرجاع النسخة من المخزن أو إنشاؤها مرة واحدة مهما تعددت الطلبات المتزامنة"""
+        with self._lock:
+            if name in self._entries and self._touch(name):
+                self.hits += 1
+                return os.path.join(self.cache_dir, name)
+
+            self.misses += 1
+            future = self._inflight.get(name)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[name] = future
+
+        if not owner:
+            return future.result()
+
+        path = os.path.join(self.cache_dir, name)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            render(tmp_path)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+            with self._lock:
+                if time.monotonic() - self._synced_at >= DISK_SYNC_INTERVAL:
+                    self._sync_from_disk()
+                self._total_bytes += size - self._entries.pop(name, 0)
+                self._entries[name] = size
+                self._evict()
+            future.set_result(path)
+            return path
+        except Exception as e:
+            future.set_exception(e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(name, None)
+
+    def get_or_create(self, source_path: str, operations: List[Operation], output_format: str,
+                      encoder: Optional[Dict[str, Any]] = None,
+                      render: Optional[Callable[[str], Any]] = None,
+                      source_digest: Optional[str] = None) -> str:
+        """واجهة البحث المشتركة: مسار النسخة المشتقة، تُنشأ فقط إذا لم تكن في المخزن
+
+        source_digest: بصمة محسوبة مسبقاً (مثل ETag الخادم) لتجنب قراءة الملف مرة أخرى.
+        render: دالة إنشاء خاصة تكتب في المسار المعطى؛ الافتراضي ImageProcessor.render.
+        """
+        output_format = output_format.upper()
+        encoder = dict(encoder or {})
+        if source_digest is None:
+            source_digest = self.digests.get(source_path)
+        name = derivative_name(source_digest, operations, output_format, encoder)
+
+        if render is None:
+            def render(output_path):
+                processor = ImageProcessor(os.path.dirname(source_path))
+                processor.render(source_path, output_path, operations, output_format, **encoder)
+        return self.get_or_render(name, render)
+
+    def stats(self):
+        """عدادات للمراقبة"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+            }
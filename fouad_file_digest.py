@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+بصمة محتوى الملفات
+Shared content digest for server ETags and derivative store keys
+
+الخادم يرسل ETag الملف كبصمة المصدر إلى مخزن النسخ المشتقة، فالاثنان يجب
+أن يحسبا البصمة بنفس الطريقة. لا يعتمد على Pillow لأن الخادم يعمل بدونه.
+"""
+
+import hashlib
+
+# طول البصمة بالأحرف الست عشرية (128 بت)
+DIGEST_LENGTH = 32
+
+
+def file_digest(path: str) -> str:
+    """sha256 لمحتوى الملف (قراءة على أجزاء) مقصوراً على DIGEST_LENGTH"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:DIGEST_LENGTH]
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+كشف الصور المكررة والمتشابهة
+Perceptual-hash duplicate and near-duplicate detection
+
+لكل صورة ثلاث بصمات إدراكية بطول 64 بت (aHash و dHash و pHash) تُحسب
+بالتوازي وتُخزن في فهرس البيانات (.fouad_cache/metadata.sqlite3) فلا يُعاد
+حسابها إلا إذا تغير الملف. البحث عن المتشابهات يتم في شجرة BK بمسافة
+هامنج، ثم تُجمع النتائج في مجموعات. الدمج يُبقي أفضل نسخة، وينقل الباقي
+إلى .fouad_cache/duplicates (قابل للاسترجاع)، ويحدّث روابط HTML و CSS.
+
+    python fouad_image_dedup.py images                 # تقرير
+    python fouad_image_dedup.py images --threshold 4   # تشابه أدق
+    python fouad_image_dedup.py images --merge         # دمج كل المجموعات
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import shutil
+import time
+import urllib.parse
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from fouad_image_metadata import CACHE_DIR_NAME, HASH_COLUMNS, ImageMetadataIndex, probe_image
+from fouad_image_processor import BatchProcessor, ImageProcessor
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp'}
+SITE_FILE_EXTENSIONS = ('.html', '.css')
+
+HASH_SIZE = 8
+PHASH_SIZE = 32
+
+# أقصى مسافة هامنج (من 64 بت) لاعتبار صورتين نسخة متشابهة
+DEFAULT_THRESHOLD = 8
+
+DUPLICATES_DIR_NAME = 'duplicates'
+
+# جيب التمام لأول 8 ترددات من DCT-II بطول 32 (يكفي لبصمة pHash)
+_DCT_COSINES = [
+    [math.cos(math.pi * (2 * n + 1) * k / (2 * PHASH_SIZE)) for n in range(PHASH_SIZE)]
+    for k in range(HASH_SIZE)
+]
+
+
+def _bits_to_hex(bits) -> str:
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return f"{value:016x}"
+
+
+def hamming(first: str, second: str) -> int:
+    """عدد البتات المختلفة بين بصمتين بصيغة hex"""
+    return bin(int(first, 16) ^ int(second, 16)).count('1')
+
+
+def _grayscale(img: Image.Image, width: int, height: int) -> List[int]:
+    """الصورة فوق خلفية بيضاء، رمادية، بحجم صغير ثابت (بدون الحفاظ على النسبة)"""
+    if img.format == 'JPEG':
+        img.draft('L', (width * 4, height * 4))
+    img = ImageProcessor.prepare_for_format(img, 'JPEG').convert('L')
+    return list(img.resize((width, height), Image.Resampling.LANCZOS).tobytes())
+
+
+def average_hash(img: Image.Image) -> str:
+    pixels = _grayscale(img, HASH_SIZE, HASH_SIZE)
+    mean = sum(pixels) / len(pixels)
+    return _bits_to_hex(pixel > mean for pixel in pixels)
+
+
+def difference_hash(img: Image.Image) -> str:
+    pixels = _grayscale(img, HASH_SIZE + 1, HASH_SIZE)
+    width = HASH_SIZE + 1
+    return _bits_to_hex(
+        pixels[row * width + column + 1] > pixels[row * width + column]
+        for row in range(HASH_SIZE) for column in range(HASH_SIZE)
+    )
+
+
+def perceptual_hash(img: Image.Image) -> str:
+    """pHash: أقل 8×8 ترددات من DCT لصورة 32×32 مقارنة بوسيطها"""
+    pixels = _grayscale(img, PHASH_SIZE, PHASH_SIZE)
+    rows = [pixels[y * PHASH_SIZE:(y + 1) * PHASH_SIZE] for y in range(PHASH_SIZE)]
+    # DCT قابل للفصل: الصفوف ثم الأعمدة، للترددات المنخفضة فقط
+    row_coefficients = [[sum(c * p for c, p in zip(cosines, row)) for cosines in _DCT_COSINES]
+                        for row in rows]
+    coefficients = [
+        sum(cosines[y] * row_coefficients[y][u] for y in range(PHASH_SIZE))
+        for cosines in _DCT_COSINES for u in range(HASH_SIZE)
+    ]
+    median = sorted(coefficients)[len(coefficients) // 2]
+    return _bits_to_hex(value > median for value in coefficients)
+
+
+def compute_hashes(filepath: str) -> Dict[str, str]:
+    with Image.open(filepath) as img:
+        hashes = {'ahash': average_hash(img)}
+    # كل بصمة تفتح الملف من جديد لأن draft لا تعمل إلا قبل تحميل البكسلات
+    with Image.open(filepath) as img:
+        hashes['dhash'] = difference_hash(img)
+    with Image.open(filepath) as img:
+        hashes['phash'] = perceptual_hash(img)
+    return hashes
+
+
+def _hash_worker(images_path: str, filename: str) -> Dict[str, Any]:
+    """صف الفهرس كاملاً (الترويسة وبصمة المحتوى) مع البصمات الإدراكية في عملية عاملة"""
+    filepath = os.path.abspath(os.path.join(images_path, filename))
+    row = probe_image(filepath)
+    if not row['error']:
+        row.update(compute_hashes(filepath))
+    return row
+
+
+class BKTree:
+    """شجرة BK بمسافة هامنج: البحث عن القريبين بدون مقارنة كل العناصر"""
+
+    def __init__(self):
+        self._root = None  # [البصمة، العناصر، الأبناء حسب المسافة]
+        self.size = 0
+
+    def add(self, value: str, item: Any):
+        self.size += 1
+        if self._root is None:
+            self._root = [value, [item], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value: str, max_distance: int) -> List[Tuple[int, Any]]:
+        """كل العناصر ضمن المسافة المحددة مع مسافاتها"""
+        results = []
+        pending = [self._root] if self._root is not None else []
+        while pending:
+            node = pending.pop()
+            distance = hamming(value, node[0])
+            if distance <= max_distance:
+                results.extend((distance, item) for item in node[1])
+            # متباينة المثلث: الأبناء خارج هذا المدى لا يمكن أن يكونوا قريبين
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    pending.append(child)
+        return results
+
+
+def ensure_hashes(index: ImageMetadataIndex, images_path: str, filenames: List[str],
+                  batch: Optional[BatchProcessor] = None, progress_callback=None) -> List[Dict[str, Any]]:
+    """صفوف الفهرس مع البصمات؛ تُحسب بالتوازي للملفات الجديدة أو المتغيرة فقط
+
+    الفهرس يُقرأ بدون فحص الملفات، وكل ملف ناقص يُفحص ويُحسب في العمليات العاملة
+    (قراءة الملف كاملاً لبصمة المحتوى تتم هناك لا في الحلقة الأولى).
+    """
+    rows = {}
+    missing = []
+    for filename in filenames:
+        row = index.lookup(os.path.join(images_path, filename))
+        if row is not None and row['error']:
+            continue
+        if row is not None and row['content_hash'] and all(row.get(column) for column in HASH_COLUMNS):
+            rows[filename] = row
+        else:
+            missing.append(filename)
+
+    if missing:
+        batch = batch or BatchProcessor(images_path)
+        for result in batch.map(_hash_worker, missing, progress_callback=progress_callback):
+            row = result['output']
+            if result['error'] or row is None:
+                continue
+            index.store([row])
+            if row['error']:
+                continue
+            index.store_hashes(row['path'], row['mtime_ns'], row['size'], row)
+            rows[result['filename']] = row
+
+    return [dict(row, filename=filename) for filename, row in rows.items()
+            if all(row.get(column) for column in HASH_COLUMNS)]
+
+
+def referenced_names(project_path: str) -> set:
+    """أسماء الصور المستخدمة في صفحات الموقع"""
+    contents = []
+    for name in os.listdir(project_path):
+        if name.endswith(SITE_FILE_EXTENSIONS):
+            with open(os.path.join(project_path, name), encoding='utf-8', errors='replace') as f:
+                contents.append(f.read())
+    text = '\n'.join(contents)
+    return set(_image_names_in(text))
+
+
+def _image_names_in(text: str):
+    for chunk in text.replace('"', "'").replace('(', "'").replace(')', "'").split("'"):
+        name = urllib.parse.unquote(chunk.rsplit('/', 1)[-1])
+        if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+            yield name
+
+
+def find_clusters(rows: List[Dict[str, Any]], threshold: int = DEFAULT_THRESHOLD,
+                  referenced: Optional[set] = None) -> List[List[Dict[str, Any]]]:
+    """مجموعات الصور المتشابهة: pHash عبر شجرة BK ثم تأكيد بـ dHash
+
+    أول عنصر في كل مجموعة هو النسخة المقترح إبقاؤها: المستخدمة في الموقع،
+    ثم الأعلى دقة، ثم الأقصر اسماً (النسخ المشتقة تحمل لاحقات).
+    """
+    referenced = referenced or set()
+    tree = BKTree()
+    for position, row in enumerate(rows):
+        tree.add(row['phash'], position)
+
+    parents = list(range(len(rows)))
+
+    def find(position):
+        while parents[position] != position:
+            parents[position] = parents[parents[position]]
+            position = parents[position]
+        return position
+
+    for position, row in enumerate(rows):
+        for _, other in tree.search(row['phash'], threshold):
+            if other != position and hamming(row['dhash'], rows[other]['dhash']) <= threshold:
+                parents[find(other)] = find(position)
+
+    groups: Dict[int, List[Dict[str, Any]]] = {}
+    for position, row in enumerate(rows):
+        groups.setdefault(find(position), []).append(row)
+
+    clusters = []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        members.sort(key=lambda row: (row['filename'] not in referenced,
+                                      -(row['width'] or 0) * (row['height'] or 0),
+                                      len(row['filename']), row['filename']))
+        keeper = members[0]
+        clusters.append([
+            dict(row, distance=hamming(keeper['phash'], row['phash']),
+                 identical=row['content_hash'] == keeper['content_hash'])
+            for row in members
+        ])
+    clusters.sort(key=lambda cluster: -sum(row['size'] for row in cluster[1:]))
+    return clusters
+
+
+def _rewrite_references(project_path: str, replacements: Dict[str, str]) -> List[str]:
+    """استبدال روابط الصور المنقولة بالنسخة المُبقاة في ملفات HTML و CSS
+
+    المطابقة على اسم الملف بعد آخر '/' (كما في _image_names_in) لا على اسم المجلد، لأن
+    الصفحات تشير إلى /images/<الاسم> بينما المجلد على القرص قد يكون صور.
+    """
+    forms = {}
+    for old, new in replacements.items():
+        forms[old] = new
+        forms[urllib.parse.quote(old)] = urllib.parse.quote(new)
+    pattern = re.compile(
+        r"(?<=[/'\"(])(" + '|'.join(re.escape(form) for form in sorted(forms, key=len, reverse=True))
+        + r")(?=[\s'\")?#]|$)"
+    )
+    rewritten = []
+    for name in os.listdir(project_path):
+        if not name.endswith(SITE_FILE_EXTENSIONS):
+            continue
+        path = os.path.join(project_path, name)
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        updated = pattern.sub(lambda match: forms[match.group(1)], text)
+        if updated != text:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(updated)
+            os.replace(tmp_path, path)
+            rewritten.append(name)
+    return rewritten
+
+
+def merge_cluster(cluster: List[Dict[str, Any]], images_path: str, project_path: str,
+                  keep: Optional[str] = None) -> Dict[str, Any]:
+    """إبقاء نسخة واحدة ونقل الباقي إلى .fouad_cache/duplicates/<الوقت>/ مع تحديث الروابط"""
+    keep = keep or cluster[0]['filename']
+    moved = [row['filename'] for row in cluster if row['filename'] != keep]
+    destination = os.path.join(project_path, CACHE_DIR_NAME, DUPLICATES_DIR_NAME,
+                               time.strftime('%Y%m%d_%H%M%S'))
+    for filename in moved:
+        # الأسماء قد تكون نسبية داخل مجلدات فرعية (sub/x.png)
+        target = os.path.join(destination, filename)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(os.path.join(images_path, filename), target)
+    rewritten = _rewrite_references(project_path, {filename: keep for filename in moved})
+    return {'kept': keep, 'moved': moved, 'moved_to': destination, 'rewritten': rewritten}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('images', help="مجلد الصور")
+    parser.add_argument('--project', help="مجلد المشروع (افتراضياً المجلد الأعلى لمجلد الصور)")
+    parser.add_argument('--threshold', type=int, default=DEFAULT_THRESHOLD,
+                        help="أقصى مسافة هامنج من 64 بت")
+    parser.add_argument('--merge', action='store_true', help="دمج كل المجموعات")
+    parser.add_argument('--json', action='store_true', help="طباعة المجموعات بصيغة JSON")
+    args = parser.parse_args()
+
+    images_path = os.path.abspath(args.images)
+    project_path = os.path.abspath(args.project or os.path.dirname(images_path))
+    filenames = sorted(name for name in os.listdir(images_path)
+                       if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS)
+
+    index = ImageMetadataIndex.for_project(project_path)
+    try:
+        rows = ensure_hashes(index, images_path, filenames)
+    finally:
+        index.close()
+    clusters = find_clusters(rows, args.threshold, referenced_names(project_path))
+
+    if args.json:
+        fields = ('filename', 'width', 'height', 'size', 'distance', 'identical', 'phash')
+        print(json.dumps([[{field: row[field] for field in fields} for row in cluster]
+                          for cluster in clusters], ensure_ascii=False, indent=2))
+    else:
+        for number, cluster in enumerate(clusters, 1):
+            print(f"🧬 مجموعة {number}:")
+            for row in cluster:
+                marker = '✅' if row is cluster[0] else ('🟰' if row['identical'] else '≈')
+                print(f"   {marker} {row['filename']:<45} {row['width']}x{row['height']}  "
+                      f"{row['size']:>10,} بايت  مسافة {row['distance']}")
+        print(f"📊 {len(clusters)} مجموعة من {len(rows)} صورة")
+
+    if args.merge:
+        for cluster in clusters:
+            result = merge_cluster(cluster, images_path, project_path)
+            print(f"🔀 أُبقيت {result['kept']} ونُقلت {len(result['moved'])} إلى {result['moved_to']}"
+                  + (f" - حُدثت: {', '.join(result['rewritten'])}" if result['rewritten'] else ''))
+
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,8 @@ import subprocess
 import threading
 import time
 import shutil
+from bisect import bisect_left
+from collections import OrderedDict
 from pathlib import Path
 from typing import Optional, List, Dict, Any
 
@@ -20,19 +22,20 @@ from typing import Optional, List, Dict, Any
 try:
     from PyQt5.QtWidgets import (
         QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-        QLabel, QPushButton, QListWidget, QListWidgetItem, QSplitter,
+        QLabel, QPushButton, QSplitter,
         QTextEdit, QProgressBar, QGroupBox, QGridLayout, QSlider,
         QSpinBox, QComboBox, QCheckBox, QFileDialog, QMessageBox,
         QStatusBar, QTabWidget, QScrollArea, QFrame, QDialog,
         QDialogButtonBox, QFormLayout, QLineEdit, QTreeWidget,
-        QTreeWidgetItem, QHeaderView
+        QTreeWidgetItem, QHeaderView, QListView, QAbstractItemView
     )
     from PyQt5.QtCore import (
         Qt, QThread, pyqtSignal, QTimer, QSize, QUrl, QProcess,
-        QSettings, QDir, QFileInfo, QMimeData
+        QSettings, QDir, QFileInfo, QMimeData, QObject, QRunnable, QThreadPool,
+        QAbstractListModel, QModelIndex, QFileSystemWatcher
     )
     from PyQt5.QtGui import (
-        QPixmap, QIcon, QFont, QPalette, QColor, QBrush,
+        QPixmap, QImage, QIcon, QFont, QPalette, QColor, QBrush,
         QLinearGradient, QPainter, QDragEnterEvent, QDropEvent
     )
 except ImportError:
@@ -42,12 +45,21 @@ except ImportError:
 
 # PIL imports for image processing
 try:
-    from PIL import Image, ImageFilter, ImageEnhance, ImageDraw
+    from PIL import Image, ImageDraw
 except ImportError:
     print("❌ Pillow غير مثبت! يرجى تثبيته بالأمر:")
     print("pip install Pillow")
     sys.exit(1)
 
+# معالج الصور (مشترك مع خادم الموقع)
+from fouad_image_processor import BatchProcessor, ImageProcessor, OperationCancelled, proxy_operations
+from fouad_image_metadata import CACHE_DIR_NAME, ImageMetadataIndex
+from fouad_derivative_store import DerivativeStore
+from fouad_image_optimizer import build_report, default_metric, optimize_images, write_report
+from fouad_thumbnails import ThumbnailCache
+from fouad_image_scanner import diff_scans, iter_image_chunks, scan_images
+from fouad_image_dedup import DUPLICATES_DIR_NAME, ensure_hashes, find_clusters, merge_cluster, referenced_names
+
 # Requests for server communication
 try:
     import requests
@@ -179,154 +191,310 @@ class ServerManager(QThread):
             time.sleep(5)  # فحص كل 5 ثواني
 
 
-class ImageProcessor:
-    """معالج الصور - يحتوي على جميع وظائف تعديل الصور"""
+class ThumbnailSignals(QObject):
+    """إشارات توليد المصغرات"""
     
-    def __init__(self, images_path: str):
+    ready = pyqtSignal(str, str)  # (اسم الصورة، مسار المصغرة)
+
+
+class ThumbnailTask(QRunnable):
+    """توليد مصغرة صورة واحدة (أو قراءتها من الذاكرة) في خيط خلفي"""
+    
+    def __init__(self, cache: ThumbnailCache, images_path: str, filename: str,
+                 signals: ThumbnailSignals):
+        super().__init__()
+        self.cache = cache
         self.images_path = images_path
+        self.filename = filename
+        self.signals = signals
     
-    def get_image_info(self, filename: str) -> Dict[str, Any]:
-        """الحصول على معلومات الصورة"""
-        filepath = os.path.join(self.images_path, filename)
-        if not os.path.exists(filepath):
-            return {}
-        
+    def run(self):
         try:
-            with Image.open(filepath) as img:
-                file_size = os.path.getsize(filepath)
-                return {
-                    'filename': filename,
-                    'format': img.format,
-                    'mode': img.mode,
-                    'size': img.size,  # (width, height)
-                    'file_size': file_size,
-                    'file_size_mb': round(file_size / (1024 * 1024), 2)
-                }
-        except Exception as e:
-            return {'error': str(e)}
+            thumbnail_path = self.cache.get_or_create(os.path.join(self.images_path, self.filename))
+        except Exception:
+            # ملف تالف أو حُذف: يبقى العنصر بدون مصغرة
+            thumbnail_path = ""
+        self.signals.ready.emit(self.filename, thumbnail_path)
+
+
+class FolderScanSignals(QObject):
+    """إشارات فحص مجلد الصور في الخلفية"""
     
-    def resize_image(self, filename: str, new_width: int, new_height: int) -> str:
-        """تغيير حجم الصورة"""
-        input_path = os.path.join(self.images_path, filename)
-        name, ext = os.path.splitext(filename)
-        output_filename = f"{name}_resized_{new_width}x{new_height}{ext}"
-        output_path = os.path.join(self.images_path, output_filename)
-        
-        try:
-            with Image.open(input_path) as img:
-                resized_img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                resized_img.save(output_path)
-                return output_filename
-        except Exception as e:
-            raise Exception(f"خطأ في تغيير الحجم: {str(e)}")
+    chunk = pyqtSignal(int, list)              # (رقم الفحص، أسماء دفعة جديدة)
+    finished = pyqtSignal(int, dict, object, list)  # (رقم الفحص، التوقيعات، الفرق، المجلدات)
+
+
+class FolderScanTask(QRunnable):
+    """فحص المجلد بـ os.scandir خارج خيط الواجهة، مع حساب الفرق عن الفحص السابق"""
     
-    def apply_brightness(self, filename: str, factor: float) -> str:
-        """تطبيق تأثير الإضاءة"""
-        input_path = os.path.join(self.images_path, filename)
-        name, ext = os.path.splitext(filename)
-        output_filename = f"{name}_bright_{factor}{ext}"
-        output_path = os.path.join(self.images_path, output_filename)
-        
-        try:
-            with Image.open(input_path) as img:
-                enhancer = ImageEnhance.Brightness(img)
-                bright_img = enhancer.enhance(factor)
-                bright_img.save(output_path)
-                return output_filename
-        except Exception as e:
-            raise Exception(f"خطأ في تعديل الإضاءة: {str(e)}")
+    def __init__(self, generation: int, images_path: str, recursive: bool,
+                 previous: Optional[Dict[str, Any]], signals: FolderScanSignals):
+        super().__init__()
+        self.generation = generation
+        self.images_path = images_path
+        self.recursive = recursive
+        self.previous = previous  # None = تحميل أول يُرسل الأسماء على دفعات
+        self.signals = signals
     
-    def apply_contrast(self, filename: str, factor: float) -> str:
-        """تطبيق تأثير التباين"""
-        input_path = os.path.join(self.images_path, filename)
-        name, ext = os.path.splitext(filename)
-        output_filename = f"{name}_contrast_{factor}{ext}"
-        output_path = os.path.join(self.images_path, output_filename)
-        
-        try:
-            with Image.open(input_path) as img:
-                enhancer = ImageEnhance.Contrast(img)
-                contrast_img = enhancer.enhance(factor)
-                contrast_img.save(output_path)
-                return output_filename
-        except Exception as e:
-            raise Exception(f"خطأ في تعديل التباين: {str(e)}")
+    def run(self):
+        entries = {}
+        directories = []
+        for chunk in iter_image_chunks(self.images_path, self.recursive, directories=directories):
+            entries.update(chunk)
+            if self.previous is None:
+                self.signals.chunk.emit(self.generation, [name for name, _ in chunk])
+        diff = diff_scans(self.previous, entries) if self.previous is not None else None
+        self.signals.finished.emit(self.generation, entries, diff, directories)
+
+
+class ImageFolderWatcher(QObject):
+    """مراقبة مجلد الصور وإرسال التغييرات كفروقات: مضاف، محذوف، متغير، معاد تسميته
     
-    def apply_blur(self, filename: str, radius: int) -> str:
-        """تطبيق تأثير التمويه"""
-        input_path = os.path.join(self.images_path, filename)
-        name, ext = os.path.splitext(filename)
-        output_filename = f"{name}_blur_{radius}{ext}"
-        output_path = os.path.join(self.images_path, output_filename)
-        
-        try:
-            with Image.open(input_path) as img:
-                blurred_img = img.filter(ImageFilter.GaussianBlur(radius))
-                blurred_img.save(output_path)
-                return output_filename
-        except Exception as e:
-            raise Exception(f"خطأ في تطبيق التمويه: {str(e)}")
+    أول فحص يُرسل الأسماء على دفعات (chunk_loaded) حتى تظهر القائمة قبل انتهائه.
+    """
     
-    def apply_sharpen(self, filename: str) -> str:
-        """تطبيق تأثير الحدة"""
-        input_path = os.path.join(self.images_path, filename)
-        name, ext = os.path.splitext(filename)
-        output_filename = f"{name}_sharp{ext}"
-        output_path = os.path.join(self.images_path, output_filename)
-        
-        try:
-            with Image.open(input_path) as img:
-                sharpened_img = img.filter(ImageFilter.SHARPEN)
-                sharpened_img.save(output_path)
-                return output_filename
-        except Exception as e:
-            raise Exception(f"خطأ في تطبيق الحدة: {str(e)}")
+    chunk_loaded = pyqtSignal(list)
+    load_finished = pyqtSignal(int)               # عدد الصور
+    changed = pyqtSignal(list, list, list, list)  # (مضاف، محذوف، متغير، [(القديم، الجديد)])
     
-    def rotate_image(self, filename: str, angle: int) -> str:
-        """دوران الصورة"""
-        input_path = os.path.join(self.images_path, filename)
-        name, ext = os.path.splitext(filename)
-        output_filename = f"{name}_rotated_{angle}{ext}"
-        output_path = os.path.join(self.images_path, output_filename)
-        
-        try:
-            with Image.open(input_path) as img:
-                rotated_img = img.rotate(angle, expand=True)
-                rotated_img.save(output_path)
-                return output_filename
-        except Exception as e:
-            raise Exception(f"خطأ في دوران الصورة: {str(e)}")
+    def __init__(self, images_path: str, recursive: bool = False, parent=None):
+        super().__init__(parent)
+        self.images_path = images_path
+        self.recursive = recursive
+        self.entries: Dict[str, Any] = {}
+        self.loaded = False
+        self.generation = 0
+        self.scanning = False
+        self.dirty = False
+        
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.signals = FolderScanSignals()
+        self.signals.chunk.connect(self.on_chunk)
+        self.signals.finished.connect(self.on_scan_finished)
+        
+        self.watcher = QFileSystemWatcher([images_path], self)
+        # دفعة من التغييرات (نسخ عدة ملفات مثلاً) تُجمع في فحص واحد
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(150)
+        self.timer.timeout.connect(self.rescan)
+        self.watcher.directoryChanged.connect(lambda _: self.timer.start())
+    
+    def start(self, recursive: Optional[bool] = None):
+        """تحميل المجلد من البداية (أول مرة أو عند تغيير خيار المجلدات الفرعية)"""
+        if recursive is not None:
+            self.recursive = recursive
+        self.generation += 1
+        self.entries = {}
+        self.loaded = False
+        self.dirty = False
+        self.scanning = True
+        subdirectories = [path for path in self.watcher.directories() if path != self.images_path]
+        if subdirectories:
+            self.watcher.removePaths(subdirectories)
+        self.pool.start(FolderScanTask(self.generation, self.images_path, self.recursive, None, self.signals))
+    
+    def rescan(self):
+        """فحص في الخلفية وإرسال الفرق فقط؛ فحص واحد في كل مرة"""
+        self.timer.stop()
+        if not self.loaded:
+            if self.scanning:
+                # التغيير قد يكون بعد قراءة الفحص الأول لموضعه: فحص آخر بعد انتهائه
+                self.dirty = True
+            else:
+                self.start()
+            return
+        if self.scanning:
+            self.dirty = True
+            return
+        self.scanning = True
+        self.pool.start(FolderScanTask(self.generation, self.images_path, self.recursive,
+                                       self.entries, self.signals))
+    
+    def on_chunk(self, generation: int, names: list):
+        if generation == self.generation:
+            self.chunk_loaded.emit(names)
     
-    def crop_image(self, filename: str, left: int, top: int, right: int, bottom: int) -> str:
-        """قص الصورة"""
-        input_path = os.path.join(self.images_path, filename)
-        name, ext = os.path.splitext(filename)
-        output_filename = f"{name}_cropped{ext}"
-        output_path = os.path.join(self.images_path, output_filename)
+    def on_scan_finished(self, generation: int, entries: dict, diff, directories: list):
+        if generation != self.generation:
+            return
+        self.scanning = False
+        self.entries = entries
+        
+        # المجلدات الفرعية الجديدة تُراقب أيضاً
+        watched = set(self.watcher.directories())
+        new_directories = [path for path in directories if path not in watched]
+        if new_directories:
+            self.watcher.addPaths(new_directories)
+        
+        if diff is None:
+            self.loaded = True
+            self.load_finished.emit(len(entries))
+        elif any(diff):
+            self.changed.emit(*diff)
+        
+        if self.dirty:
+            self.dirty = False
+            self.rescan()
+    
+    def shutdown(self):
+        self.generation += 1
+        self.pool.clear()
+        self.pool.waitForDone(2000)
+
+
+class ImageListModel(QAbstractListModel):
+    """نموذج قائمة الصور مرتب بالاسم؛ كل تغيير يُطبق كإدراج أو حذف أو نقل لصف واحد"""
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.names: List[str] = []
+        self.icons: Dict[str, QIcon] = {}
+    
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.names)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        name = self.names[index.row()]
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            return name
+        if role == Qt.DecorationRole:
+            return self.icons.get(name)
+        return None
+    
+    def row_of(self, name: str) -> int:
+        """رقم الصف بالبحث الثنائي، أو -1"""
+        row = bisect_left(self.names, name)
+        return row if row < len(self.names) and self.names[row] == name else -1
+    
+    def reset(self, names: List[str]):
+        """إعادة بناء واحدة بدل إدراج كل صف"""
+        self.beginResetModel()
+        self.names = sorted(names)
+        self.icons.clear()
+        self.endResetModel()
+    
+    def extend(self, names: List[str]):
+        """دفعة من الفحص: إضافة في النهاية ثم ترتيب واحد مع نقل الفهارس الدائمة (التحديد)
         
-        try:
-            with Image.open(input_path) as img:
-                cropped_img = img.crop((left, top, right, bottom))
-                cropped_img.save(output_path)
-                return output_filename
-        except Exception as e:
-            raise Exception(f"خطأ في قص الصورة: {str(e)}")
+        الإدراج في موضع كل اسم يكلف تحريك القائمة لكل صف، والترتيب يدمج الدفعة في تمريرة.
+        """
+        if not names:
+            return
+        start = len(self.names)
+        self.beginInsertRows(QModelIndex(), start, start + len(names) - 1)
+        self.names.extend(names)
+        self.endInsertRows()
+        
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        persistent_names = [self.names[index.row()] for index in persistent]
+        self.names.sort()
+        self.changePersistentIndexList(
+            persistent, [self.index(bisect_left(self.names, name)) for name in persistent_names]
+        )
+        self.layoutChanged.emit()
+    
+    def insert(self, name: str):
+        row = bisect_left(self.names, name)
+        if row < len(self.names) and self.names[row] == name:
+            return
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.names.insert(row, name)
+        self.endInsertRows()
+    
+    def remove(self, name: str):
+        row = self.row_of(name)
+        if row < 0:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.names[row]
+        self.icons.pop(name, None)
+        self.endRemoveRows()
+    
+    def rename(self, old_name: str, new_name: str):
+        """نقل الصف إلى موضعه الجديد؛ التحديد يتبعه لأن الفهارس الدائمة تُحدث"""
+        row = self.row_of(old_name)
+        if row < 0:
+            self.insert(new_name)
+            return
+        # الموضع في القائمة بدون الصف نفسه، بدون نسخها
+        target = bisect_left(self.names, new_name)
+        if target > row:
+            target -= 1
+        if target != row:
+            # وجهة النقل بترقيم ما قبل الحذف
+            destination = target if target < row else target + 1
+            self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), destination)
+            del self.names[row]
+            self.names.insert(target, new_name)
+            self.endMoveRows()
+        else:
+            self.names[row] = new_name
+        icon = self.icons.pop(old_name, None)
+        if icon is not None:
+            self.icons[new_name] = icon
+        index = self.index(target)
+        self.dataChanged.emit(index, index)
+    
+    def set_icon(self, name: str, icon: Optional[QIcon]):
+        row = self.row_of(name)
+        if row < 0:
+            return
+        if icon is None:
+            self.icons.pop(name, None)
+        else:
+            self.icons[name] = icon
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
 
 
-class ImageListWidget(QListWidget):
-    """قائمة الصور مع دعم السحب والإفلات"""
+class ImageListWidget(QListView):
+    """قائمة الصور مع دعم السحب والإفلات ووضع شبكة المصغرات
+    
+    تعرض ImageListModel فقط العناصر الظاهرة، والتغييرات تصل كفروقات فيبقى التحديد والتمرير.
+    """
     
     image_selected = pyqtSignal(str)  # إشارة عند اختيار صورة
     
+    # أقصى عدد من المصغرات المحملة في الذاكرة؛ الأبعد عن العرض تُفرغ أولاً
+    MAX_LOADED_THUMBNAILS = 600
+    
     def __init__(self):
         super().__init__()
         self.setAcceptDrops(True)
-        self.setDragDropMode(QListWidget.InternalMove)
-        self.setSelectionMode(QListWidget.SingleSelection)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        
+        self.image_model = ImageListModel(self)
+        self.setModel(self.image_model)
+        
+        # وضع الشبكة: المصغرات تُحمل للعناصر الظاهرة فقط
+        self.grid_mode = False
+        self.images_path = None
+        self.thumbnail_cache = None
+        self.thumbnail_pool = QThreadPool(self)
+        self.thumbnail_pool.setMaxThreadCount(max(1, QThread.idealThreadCount()))
+        self.thumbnail_signals = ThumbnailSignals()
+        self.thumbnail_signals.ready.connect(self.on_thumbnail_ready)
+        self.loaded_thumbnails = OrderedDict()  # اسم الصورة -> None (ترتيب آخر ظهور)
+        
+        # تجميع أحداث التمرير وتغيير الحجم في تحديث واحد
+        self.visible_timer = QTimer(self)
+        self.visible_timer.setSingleShot(True)
+        self.visible_timer.setInterval(50)
+        self.visible_timer.timeout.connect(self.load_visible_thumbnails)
+        self.verticalScrollBar().valueChanged.connect(self.schedule_visible_update)
+        self.image_model.rowsInserted.connect(self.schedule_visible_update)
+        self.image_model.rowsRemoved.connect(self.schedule_visible_update)
+        self.image_model.modelReset.connect(self.schedule_visible_update)
         
         # تنسيق القائمة
         self.setStyleSheet("""
-            QListWidget {
+            QListView {
                 background-color: #1a1a2e;
                 border: 2px solid #00ff41;
                 border-radius: 8px;
@@ -334,26 +502,153 @@ class ImageListWidget(QListWidget):
                 font-family: 'Courier New', monospace;
                 font-size: 12px;
             }
-            QListWidget::item {
+            QListView::item {
                 padding: 8px;
                 border-bottom: 1px solid #333;
                 background-color: rgba(0, 255, 65, 0.1);
             }
-            QListWidget::item:selected {
+            QListView::item:selected {
                 background-color: #00ff41;
                 color: black;
                 font-weight: bold;
             }
-            QListWidget::item:hover {
+            QListView::item:hover {
                 background-color: rgba(0, 255, 65, 0.2);
             }
         """)
         
-        self.itemClicked.connect(self.on_item_selected)
+        # العنصر الحالي يتغير بالنقر وبأسهم لوحة المفاتيح
+        self.selectionModel().currentChanged.connect(self.on_item_selected)
+        self.set_grid_mode(False)
     
-    def on_item_selected(self, item):
+    def set_thumbnail_source(self, images_path: str, thumbnail_cache: ThumbnailCache):
+        """مجلد الصور وذاكرة المصغرات لوضع الشبكة"""
+        self.images_path = images_path
+        self.thumbnail_cache = thumbnail_cache
+    
+    def set_grid_mode(self, enabled: bool):
+        """التبديل بين قائمة الأسماء وشبكة المصغرات"""
+        self.grid_mode = enabled
+        if enabled:
+            size = self.thumbnail_cache.size if self.thumbnail_cache else 160
+            self.setViewMode(QListView.IconMode)
+            self.setIconSize(QSize(size, size))
+            self.setGridSize(QSize(size + 24, size + 40))
+            self.setResizeMode(QListView.Adjust)
+            self.setMovement(QListView.Static)
+            self.setWordWrap(True)
+        else:
+            self.setViewMode(QListView.ListMode)
+            self.setIconSize(QSize())
+            self.setGridSize(QSize())
+            self.clear_thumbnails()
+        # عناصر بنفس الحجم وتخطيط على دفعات: فتح مجلد بعشرات الآلاف من الصور فوراً
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(500)
+        self.schedule_visible_update()
+    
+    def clear_thumbnails(self):
+        """إلغاء الطلبات المنتظرة وإفراغ المصغرات المحملة"""
+        self.thumbnail_pool.clear()
+        for filename in self.loaded_thumbnails:
+            self.image_model.set_icon(filename, None)
+        self.loaded_thumbnails.clear()
+    
+    def invalidate_thumbnails(self, filenames: List[str]):
+        """ملفات تغير محتواها: تُعاد مصغراتها عند ظهورها"""
+        for filename in filenames:
+            if filename in self.loaded_thumbnails:
+                del self.loaded_thumbnails[filename]
+                self.image_model.set_icon(filename, None)
+        self.schedule_visible_update()
+    
+    def current_name(self) -> Optional[str]:
+        index = self.currentIndex()
+        return self.image_model.names[index.row()] if index.isValid() else None
+    
+    def select_name(self, filename: str):
+        row = self.image_model.row_of(filename)
+        if row >= 0:
+            index = self.image_model.index(row)
+            self.setCurrentIndex(index)
+            self.scrollTo(index)
+    
+    def neighbor_names(self, filename: str) -> List[str]:
+        """الصورة التالية والسابقة في القائمة (للتحميل المسبق)"""
+        names = self.image_model.names
+        row = self.image_model.row_of(filename)
+        if row < 0:
+            return []
+        return [names[r] for r in (row + 1, row - 1) if 0 <= r < len(names)]
+    
+    def schedule_visible_update(self, *args):
+        if self.grid_mode:
+            self.visible_timer.start()
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.schedule_visible_update()
+    
+    def visible_names(self) -> List[str]:
+        """العناصر الظاهرة فقط: بحث ثنائي عن أول عنصر ثم المشي حتى نهاية العرض
+        
+        ترتيب العناصر يطابق ترتيبها الرأسي في القائمة والشبكة، فالكلفة لا تعتمد على عددها.
+        """
+        viewport = self.viewport().rect()
+        names = self.image_model.names
+        low, high = 0, len(names)
+        while low < high:
+            middle = (low + high) // 2
+            if self.visualRect(self.image_model.index(middle)).bottom() < viewport.top():
+                low = middle + 1
+            else:
+                high = middle
+        
+        visible = []
+        for row in range(low, len(names)):
+            rect = self.visualRect(self.image_model.index(row))
+            if rect.top() > viewport.bottom():
+                break
+            if rect.intersects(viewport):
+                visible.append(names[row])
+        return visible
+    
+    def load_visible_thumbnails(self):
+        """طلب مصغرات العناصر الظاهرة فقط؛ الطلبات القديمة التي خرجت من العرض تُلغى"""
+        if not self.grid_mode or not self.thumbnail_cache or not self.images_path:
+            return
+        
+        self.thumbnail_pool.clear()
+        for filename in self.visible_names():
+            if filename in self.loaded_thumbnails:
+                self.loaded_thumbnails.move_to_end(filename)
+                continue
+            self.thumbnail_pool.start(ThumbnailTask(
+                self.thumbnail_cache, self.images_path, filename, self.thumbnail_signals
+            ))
+    
+    def on_thumbnail_ready(self, filename: str, thumbnail_path: str):
+        """عرض المصغرة عند جهوزها (في خيط الواجهة)"""
+        if not self.grid_mode or not thumbnail_path or self.image_model.row_of(filename) < 0:
+            return
+        pixmap = QPixmap(thumbnail_path)
+        if pixmap.isNull():
+            return
+        self.image_model.set_icon(filename, QIcon(pixmap))
+        self.loaded_thumbnails[filename] = None
+        self.loaded_thumbnails.move_to_end(filename)
+        
+        # الأقدم ظهوراً يُفرغ من الذاكرة ويُعاد تحميله من القرص عند ظهوره مجدداً
+        while len(self.loaded_thumbnails) > self.MAX_LOADED_THUMBNAILS:
+            old_filename, _ = self.loaded_thumbnails.popitem(last=False)
+            self.image_model.set_icon(old_filename, None)
+    
+    def on_item_selected(self, current, previous=None):
         """عند اختيار عنصر من القائمة"""
-        filename = item.text()
+        if not current.isValid():
+            return
+        filename = self.image_model.names[current.row()]
         self.image_selected.emit(filename)
     
     def dragEnterEvent(self, event: QDragEnterEvent):
@@ -363,6 +658,13 @@ class ImageListWidget(QListWidget):
         else:
             event.ignore()
     
+    def dragMoveEvent(self, event):
+        # QListView يرفض الإفلات افتراضياً إذا لم يُقبل أثناء الحركة
+        if event.mimeData().hasUrls():
+            event.accept()
+        else:
+            event.ignore()
+    
     def dropEvent(self, event: QDropEvent):
         """عند إفلات ملف"""
         files = [url.toLocalFile() for url in event.mimeData().urls()]
@@ -374,13 +676,130 @@ class ImageListWidget(QListWidget):
                 print(f"تم إفلات ملف: {file_path}")
 
 
+def pil_to_qimage(img: Image.Image) -> QImage:
+    """تحويل صورة Pillow إلى QImage بدون ملف وسيط (آمن خارج خيط الواجهة بعكس QPixmap)"""
+    img = img.convert('RGBA')
+    data = img.tobytes('raw', 'RGBA')
+    qimage = QImage(data, img.width, img.height, img.width * 4, QImage.Format_RGBA8888)
+    # copy() لأن QImage لا يملك البيانات
+    return qimage.copy()
+
+
+def pil_to_qpixmap(img: Image.Image) -> QPixmap:
+    """تحويل صورة Pillow إلى QPixmap بدون ملف وسيط"""
+    return QPixmap.fromImage(pil_to_qimage(img))
+
+
+class PreviewSignals(QObject):
+    """إشارات فك ترميز المعاينات"""
+    
+    ready = pyqtSignal(object, int, int, QImage)  # (المفتاح، عرض وارتفاع المربع المطلوب، الصورة)
+    failed = pyqtSignal(object)
+    adjusted = pyqtSignal(int, object, QImage)    # (رقم الطلب، (المفتاح، النسخة المصغرة)، الناتج)
+
+
+class PreviewTask(QRunnable):
+    """فك ترميز معاينة بدقة العرض في خيط خلفي"""
+    
+    def __init__(self, key, image_path: str, width: int, height: int, signals: PreviewSignals):
+        super().__init__()
+        self.key = key
+        self.image_path = image_path
+        self.width = width
+        self.height = height
+        self.signals = signals
+    
+    def run(self):
+        try:
+            # فك ترميز بدقة العرض فقط بدل الصورة كاملة ثم تصغيرها
+            preview = ImageProcessor.open_downscaled(self.image_path, self.width, self.height)
+            qimage = pil_to_qimage(preview)
+        except Exception:
+            self.signals.failed.emit(self.key)
+            return
+        self.signals.ready.emit(self.key, self.width, self.height, qimage)
+
+
+class AdjustedPreviewTask(QRunnable):
+    """تطبيق تعديلات المعاينة الحية على نسخة مصغرة من الصورة"""
+    
+    def __init__(self, generation: int, key, proxy, operations, width: int, height: int,
+                 signals: PreviewSignals):
+        super().__init__()
+        self.generation = generation
+        self.key = key
+        self.proxy = proxy  # (صورة Pillow مصغرة، نسبة التصغير) أو None
+        self.operations = operations
+        self.width = width
+        self.height = height
+        self.signals = signals
+    
+    def run(self):
+        try:
+            proxy = self.proxy
+            if proxy is None:
+                # النسخة المصغرة تُفك مرة واحدة لكل صورة وتُعاد لكل قيمة جديدة
+                with Image.open(self.key[0]) as img:
+                    full_width = img.width
+                image = ImageProcessor.open_downscaled(self.key[0], self.width, self.height)
+                proxy = (image, image.width / full_width)
+            image, scale = proxy
+            result = ImageProcessor.apply_operations(image, proxy_operations(self.operations, scale))
+            qimage = pil_to_qimage(result)
+        except Exception:
+            return
+        self.signals.adjusted.emit(self.generation, (self.key, proxy), qimage)
+
+
+class PixmapCache:
+    """ذاكرة معاينات حديثة محدودة بعدد البايتات مع إخراج الأقدم استخداماً"""
+    
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()  # المفتاح -> (الصورة، عرض وارتفاع المربع المطلوب)
+    
+    @staticmethod
+    def _bytes(pixmap: QPixmap) -> int:
+        return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+    
+    def get(self, key, width: int, height: int) -> Optional[QPixmap]:
+        """المعاينة إن كانت فُكت لمربع بنفس الحجم أو أكبر"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        pixmap, box = entry
+        # أصغر من مربعها في الاتجاهين = الصورة بدقتها الكاملة، تصلح لأي مربع
+        full_size = pixmap.width() < box[0] and pixmap.height() < box[1]
+        if not full_size and pixmap.width() < width and pixmap.height() < height:
+            # فُكت لمربع أصغر من المطلوب: تحتاج فك ترميز أدق
+            return None
+        self._entries.move_to_end(key)
+        return pixmap
+    
+    def put(self, key, pixmap: QPixmap, width: int, height: int):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.total_bytes -= self._bytes(old[0])
+        self._entries[key] = (pixmap, (width, height))
+        self.total_bytes += self._bytes(pixmap)
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self.total_bytes -= self._bytes(evicted)
+    
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+
 class ImagePreviewWidget(QLabel):
-    """عنصر معاينة الصور"""
+    """عنصر معاينة الصور
+    
+    فك الترميز بحجم العنصر في الخلفية، مع ذاكرة للمعاينات الحديثة وتحميل مسبق للجيران.
+    """
     
     def __init__(self):
         super().__init__()
         self.setMinimumSize(400, 300)
-        self.setScaledContents(True)
         self.setAlignment(Qt.AlignCenter)
         
         # تنسيق المعاينة
@@ -396,30 +815,326 @@ class ImagePreviewWidget(QLabel):
         
         self.setText("🖼️ اختر صورة لعرضها")
         self.current_image_path = None
+        self.current_key = None
+        
+        self.cache = PixmapCache()
+        self.inflight = set()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(2)
+        self.signals = PreviewSignals()
+        self.signals.ready.connect(self.on_preview_ready)
+        self.signals.failed.connect(self.on_preview_failed)
+        
+        # المعاينة الحية: خيط واحد، والطلب الأحدث فقط يُعرض
+        self.proxy = None  # (المفتاح، (صورة مصغرة، النسبة))
+        self.adjust_generation = 0
+        self.adjust_operations = None
+        self.adjust_pool = QThreadPool(self)
+        self.adjust_pool.setMaxThreadCount(1)
+        self.signals.adjusted.connect(self.on_adjusted_ready)
+        self.adjust_timer = QTimer(self)
+        self.adjust_timer.setSingleShot(True)
+        self.adjust_timer.setInterval(40)
+        self.adjust_timer.timeout.connect(self.render_adjusted)
+        
+        # إعادة فك الترميز بعد انتهاء تغيير الحجم لا مع كل حدث
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(150)
+        self.resize_timer.timeout.connect(self.reload_current)
+    
+    def target_size(self):
+        """مربع فك الترميز بالبكسلات الفعلية للشاشة"""
+        ratio = self.devicePixelRatioF()
+        return max(1, int(self.width() * ratio)), max(1, int(self.height() * ratio))
+    
+    @staticmethod
+    def cache_key(image_path: str):
+        """المسار + وقت التعديل + الحجم: الملف المعدل يُفك من جديد"""
+        stat = os.stat(image_path)
+        return (image_path, stat.st_mtime_ns, stat.st_size)
+    
+    def request(self, key, priority: int = 0):
+        if key in self.inflight:
+            return
+        width, height = self.target_size()
+        self.inflight.add(key)
+        self.pool.start(PreviewTask(key, key[0], width, height, self.signals), priority)
     
     def load_image(self, image_path: str):
         """تحميل وعرض صورة"""
-        if os.path.exists(image_path):
-            pixmap = QPixmap(image_path)
-            if not pixmap.isNull():
-                # تغيير حجم الصورة للمعاينة
-                scaled_pixmap = pixmap.scaled(
-                    self.size(), 
-                    Qt.KeepAspectRatio, 
-                    Qt.SmoothTransformation
-                )
-                self.setPixmap(scaled_pixmap)
-                self.current_image_path = image_path
-            else:
-                self.setText("❌ لا يمكن تحميل الصورة")
-        else:
+        try:
+            key = self.cache_key(image_path)
+        except OSError:
             self.setText("❌ الملف غير موجود")
+            return
+        
+        self.current_image_path = image_path
+        self.current_key = key
+        self.cancel_adjustments()
+        pixmap = self.cache.get(key, *self.target_size())
+        if pixmap is not None:
+            self.show_pixmap(pixmap)
+            return
+        
+        # المعاينة المطلوبة الآن قبل أي تحميل مسبق في الطابور
+        self.setText("⏳ جاري التحميل...")
+        self.request(key, priority=1)
+    
+    def prefetch(self, image_paths: List[str]):
+        """فك ترميز الصور المجاورة مسبقاً بأولوية منخفضة"""
+        width, height = self.target_size()
+        for image_path in image_paths:
+            try:
+                key = self.cache_key(image_path)
+            except OSError:
+                continue
+            if self.cache.get(key, width, height) is None:
+                self.request(key, priority=-1)
+    
+    def show_pixmap(self, pixmap: QPixmap):
+        # المعاينة فُكت لمربع العنصر؛ التصغير هنا فقط إذا صغر العنصر بعد ذلك
+        ratio = self.devicePixelRatioF()
+        width, height = self.target_size()
+        if pixmap.width() > width or pixmap.height() > height:
+            pixmap = pixmap.scaled(width, height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        pixmap.setDevicePixelRatio(ratio)
+        self.setPixmap(pixmap)
+    
+    def on_preview_ready(self, key, width: int, height: int, qimage: QImage):
+        """في خيط الواجهة: QPixmap لا يُنشأ إلا هنا"""
+        self.inflight.discard(key)
+        pixmap = QPixmap.fromImage(qimage)
+        self.cache.put(key, pixmap, width, height)
+        if key == self.current_key and self.adjust_operations is None:
+            self.show_pixmap(pixmap)
+    
+    def on_preview_failed(self, key):
+        self.inflight.discard(key)
+        if key == self.current_key:
+            self.setText("❌ لا يمكن تحميل الصورة")
+    
+    def show_adjusted(self, operations):
+        """معاينة حية للعمليات على نسخة مصغرة؛ الطلبات المتقاربة تُجمع في طلب واحد"""
+        if self.current_key is None:
+            return
+        self.adjust_operations = operations
+        self.adjust_timer.start()
+    
+    def render_adjusted(self):
+        if self.current_key is None or self.adjust_operations is None:
+            return
+        self.adjust_generation += 1
+        proxy = self.proxy[1] if self.proxy and self.proxy[0] == self.current_key else None
+        width, height = self.target_size()
+        # الطلبات التي لم تبدأ بعد أصبحت قديمة
+        self.adjust_pool.clear()
+        self.adjust_pool.start(AdjustedPreviewTask(
+            self.adjust_generation, self.current_key, proxy, self.adjust_operations,
+            width, height, self.signals
+        ))
+    
+    def on_adjusted_ready(self, generation: int, proxy, qimage: QImage):
+        if proxy[0] == self.current_key:
+            self.proxy = proxy
+        if generation == self.adjust_generation and self.adjust_operations is not None:
+            self.show_pixmap(QPixmap.fromImage(qimage))
+    
+    def cancel_adjustments(self):
+        """إيقاف المعاينة الحية دون تغيير المعروض"""
+        self.adjust_timer.stop()
+        self.adjust_pool.clear()
+        self.adjust_operations = None
+        self.adjust_generation += 1
+    
+    def clear_adjustments(self):
+        """العودة إلى معاينة الصورة الأصلية"""
+        self.cancel_adjustments()
+        self.reload_current()
+    
+    def reload_current(self):
+        if self.current_image_path:
+            adjust_operations = self.adjust_operations
+            self.load_image(self.current_image_path)
+            if adjust_operations is not None:
+                self.show_adjusted(adjust_operations)
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.current_image_path:
+            # النسخة المصغرة للمعاينة الحية بحجم العنصر القديم
+            self.proxy = None
+            self.resize_timer.start()
     
     def clear_preview(self):
         """مسح المعاينة"""
         self.clear()
         self.setText("🖼️ اختر صورة لعرضها")
         self.current_image_path = None
+        self.current_key = None
+        self.proxy = None
+        self.cancel_adjustments()
+
+
+class JobSignals(QObject):
+    """إشارات مهام الخلفية (QRunnable ليس QObject فلا يملك إشارات)"""
+    
+    started = pyqtSignal(int)            # رقم المهمة
+    progress = pyqtSignal(int, int)      # (رقم المهمة، النسبة المئوية)
+    finished = pyqtSignal(int, object)   # (رقم المهمة، النتيجة)
+    failed = pyqtSignal(int, str)        # (رقم المهمة، رسالة الخطأ)
+    cancelled = pyqtSignal(int)
+
+
+class ImageJob(QRunnable):
+    """مهمة واحدة في الخلفية: function(cancel_check=..., progress_callback=...)"""
+    
+    def __init__(self, job_id: int, title: str, function, signals: JobSignals):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.job_id = job_id
+        self.title = title
+        self.function = function
+        self.signals = signals
+        self.percent = 0
+        self._cancel_event = threading.Event()
+    
+    def cancel(self):
+        """إلغاء تعاوني: يُفحص بين العمليات والشرائح"""
+        self._cancel_event.set()
+    
+    def is_cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+    
+    def report_progress(self, fraction: float):
+        # إشارة فقط عند تغير النسبة المئوية حتى لا تُغرق حلقة أحداث الواجهة
+        percent = max(0, min(100, int(fraction * 100)))
+        if percent != self.percent:
+            self.percent = percent
+            self.signals.progress.emit(self.job_id, percent)
+    
+    def run(self):
+        if self.is_cancelled():
+            self.signals.cancelled.emit(self.job_id)
+            return
+        
+        self.signals.started.emit(self.job_id)
+        try:
+            result = self.function(cancel_check=self.is_cancelled,
+                                   progress_callback=self.report_progress)
+        except Exception as e:
+            # رسائل الخطأ مغلفة في المعالج، لذا الإلغاء يُعرف من حالة المهمة
+            if isinstance(e, OperationCancelled) or self.is_cancelled():
+                self.signals.cancelled.emit(self.job_id)
+            else:
+                self.signals.failed.emit(self.job_id, str(e))
+        else:
+            self.signals.finished.emit(self.job_id, result)
+
+
+class JobQueue(QObject):
+    """طابور مهام الصور على QThreadPool: النتائج والتقدم تعود بالإشارات إلى خيط الواجهة"""
+    
+    def __init__(self, max_threads: Optional[int] = None, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads or max(1, QThread.idealThreadCount()))
+        self.signals = JobSignals()
+        self.jobs: Dict[int, ImageJob] = {}
+        self._next_id = 1
+        
+        # إزالة المهمة من القائمة عند انتهائها بأي شكل (تُنفذ في خيط الواجهة)
+        self.signals.finished.connect(lambda job_id, _: self._forget(job_id))
+        self.signals.failed.connect(lambda job_id, _: self._forget(job_id))
+        self.signals.cancelled.connect(self._forget)
+    
+    def _forget(self, job_id: int):
+        self.jobs.pop(job_id, None)
+    
+    def submit(self, title: str, function) -> int:
+        """إضافة مهمة إلى الطابور وإرجاع رقمها"""
+        job_id = self._next_id
+        self._next_id += 1
+        job = ImageJob(job_id, title, function, self.signals)
+        self.jobs[job_id] = job
+        self.pool.start(job)
+        return job_id
+    
+    def cancel(self, job_id: int):
+        """المهمة المنتظرة تُسحب من الطابور، والجارية يُطلب إيقافها"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        job.cancel()
+        if self.pool.tryTake(job):
+            self.signals.cancelled.emit(job_id)
+    
+    def cancel_all(self):
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+    
+    def progress(self) -> int:
+        """متوسط تقدم المهام غير المنتهية"""
+        if not self.jobs:
+            return 100
+        return sum(job.percent for job in self.jobs.values()) // len(self.jobs)
+    
+    def shutdown(self, timeout_ms: int = 5000):
+        """إلغاء كل المهام وانتظار الجارية قبل إغلاق التطبيق"""
+        self.cancel_all()
+        self.pool.waitForDone(timeout_ms)
+
+
+class DuplicatesDialog(QDialog):
+    """عرض مجموعات الصور المكررة واختيار ما يُدمج منها"""
+
+    def __init__(self, clusters, parent=None):
+        super().__init__(parent)
+        self.clusters = clusters
+        self.setWindowTitle("🧬 الصور المكررة والمتشابهة")
+        self.resize(720, 480)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(
+            "✅ النسخة المُبقاة (المستخدمة في الموقع أو الأعلى دقة) - "
+            "الباقي يُنقل إلى .fouad_cache/duplicates وتُحدّث روابطه"
+        ))
+
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(["الصورة", "الأبعاد", "الحجم", "المسافة"])
+        self.tree.header().setSectionResizeMode(0, QHeaderView.Stretch)
+        for number, cluster in enumerate(clusters, 1):
+            group = QTreeWidgetItem([f"مجموعة {number} ({len(cluster)} صور)"])
+            group.setFlags(group.flags() | Qt.ItemIsUserCheckable)
+            group.setCheckState(0, Qt.Checked)
+            group.setData(0, Qt.UserRole, number - 1)
+            for row in cluster:
+                marker = '✅' if row is cluster[0] else ('🟰' if row['identical'] else '≈')
+                group.addChild(QTreeWidgetItem([
+                    f"{marker} {row['filename']}",
+                    f"{row['width']}x{row['height']}",
+                    f"{row['size'] / 1024:.1f} KB",
+                    str(row['distance']),
+                ]))
+            self.tree.addTopLevelItem(group)
+        self.tree.expandAll()
+        layout.addWidget(self.tree)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Cancel)
+        merge_btn = buttons.addButton("🔀 دمج المحدد", QDialogButtonBox.AcceptRole)
+        merge_btn.setEnabled(bool(clusters))
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def selected_clusters(self):
+        """المجموعات المؤشر عليها"""
+        selected = []
+        for i in range(self.tree.topLevelItemCount()):
+            item = self.tree.topLevelItem(i)
+            if item.checkState(0) == Qt.Checked:
+                selected.append(self.clusters[item.data(0, Qt.UserRole)])
+        return selected
 
 
 class ProjectDetector:
@@ -468,20 +1183,12 @@ class ProjectDetector:
         return os.path.exists(images_folder)
     
     @staticmethod
-    def get_images_in_project(project_path: str) -> List[str]:
-        """الحصول على قائمة الصور في المشروع"""
+    def get_images_in_project(project_path: str, recursive: bool = False) -> List[str]:
+        """الحصول على قائمة الصور في المشروع (أسماء نسبية عند تضمين المجلدات الفرعية)"""
         images_path = os.path.join(project_path, "images")
-        if not os.path.exists(images_path):
+        if not os.path.isdir(images_path):
             return []
-        
-        image_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp'}
-        images = []
-        
-        for file in os.listdir(images_path):
-            if any(file.lower().endswith(ext) for ext in image_extensions):
-                images.append(file)
-        
-        return sorted(images)
+        return sorted(scan_images(images_path, recursive))
 
 
 class FouadImageManager(QMainWindow):
@@ -493,8 +1200,20 @@ class FouadImageManager(QMainWindow):
         self.images_path = None
         self.server_manager = None
         self.image_processor = None
+        self.metadata_index = None
+        self.thumbnail_cache = None
+        self.folder_watcher = None
         self.current_selected_image = None
         
+        # طابور مهام الصور في الخلفية حتى لا تتجمد الواجهة
+        self.job_queue = JobQueue(parent=self)
+        self.job_handlers = {}  # رقم المهمة -> (رسالة الفشل، دالة النجاح)
+        self.job_queue.signals.started.connect(self.on_job_started)
+        self.job_queue.signals.progress.connect(self.on_job_progress)
+        self.job_queue.signals.finished.connect(self.on_job_finished)
+        self.job_queue.signals.failed.connect(self.on_job_failed)
+        self.job_queue.signals.cancelled.connect(self.on_job_cancelled)
+        
         # إعدادات التطبيق
         self.settings = QSettings("FouadCyber", "ImageManager")
         
@@ -518,7 +1237,14 @@ class FouadImageManager(QMainWindow):
         
         if self.project_path:
             self.images_path = os.path.join(self.project_path, "images")
-            self.image_processor = ImageProcessor(self.images_path)
+            # المخزن المشترك مع الخادم: تكرار العملية نفسها يُنسخ من المخزن فوراً
+            self.image_processor = ImageProcessor(
+                self.images_path, store=DerivativeStore.for_project(self.project_path)
+            )
+            self.metadata_index = ImageMetadataIndex.for_project(self.project_path)
+            self.thumbnail_cache = ThumbnailCache.for_project(self.project_path)
+            if os.path.isdir(self.images_path):
+                self.create_folder_watcher()
             self.setWindowTitle(f"🛡️ مدير صور فؤاد - {os.path.basename(self.project_path)}")
         else:
             self.setWindowTitle("🛡️ مدير صور فؤاد - لم يتم العثور على المشروع")
@@ -585,11 +1311,23 @@ class FouadImageManager(QMainWindow):
         add_btn.clicked.connect(self.add_images)
         buttons_layout.addWidget(add_btn)
         
+        self.grid_mode_btn = QPushButton("🔲 شبكة")
+        self.grid_mode_btn.setCheckable(True)
+        self.grid_mode_btn.setToolTip("عرض الصور كشبكة مصغرات")
+        buttons_layout.addWidget(self.grid_mode_btn)
+        
         layout.addLayout(buttons_layout)
         
         # قائمة الصور
         self.images_list = ImageListWidget()
         self.images_list.image_selected.connect(self.on_image_selected)
+        if self.thumbnail_cache:
+            self.images_list.set_thumbnail_source(self.images_path, self.thumbnail_cache)
+            self.grid_mode_btn.setChecked(self.settings.value("thumbnail_grid", False, type=bool))
+            self.images_list.set_grid_mode(self.grid_mode_btn.isChecked())
+        else:
+            self.grid_mode_btn.setEnabled(False)
+        self.grid_mode_btn.toggled.connect(self.toggle_grid_mode)
         layout.addWidget(self.images_list)
         
         # معلومات الصورة المختارة
@@ -710,9 +1448,15 @@ class FouadImageManager(QMainWindow):
         
         # شريط التقدم للعمليات
         self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
         self.progress_bar.setVisible(False)
         layout.addWidget(self.progress_bar)
         
+        self.cancel_jobs_btn = QPushButton("⏹️ إلغاء العمليات الجارية")
+        self.cancel_jobs_btn.clicked.connect(self.job_queue.cancel_all)
+        self.cancel_jobs_btn.setVisible(False)
+        layout.addWidget(self.cancel_jobs_btn)
+        
         # رسائل الحالة
         self.operation_status = QLabel("")
         self.operation_status.setWordWrap(True)
@@ -781,6 +1525,13 @@ class FouadImageManager(QMainWindow):
         widget = QWidget()
         layout = QVBoxLayout(widget)
         
+        # المعاينة الحية: أثر الشريط الأخير على نسخة مصغرة، والملف يُكتب عند التطبيق فقط
+        self.live_operation = None
+        self.live_preview_checkbox = QCheckBox("👁️ معاينة حية")
+        self.live_preview_checkbox.setToolTip("عرض أثر الشريط مباشرة قبل التطبيق")
+        self.live_preview_checkbox.toggled.connect(self.toggle_live_preview)
+        layout.addWidget(self.live_preview_checkbox)
+        
         # فلتر الإضاءة
         brightness_group = QGroupBox("💡 الإضاءة")
         brightness_layout = QVBoxLayout(brightness_group)
@@ -789,6 +1540,7 @@ class FouadImageManager(QMainWindow):
         self.brightness_slider.setRange(10, 300)  # 0.1 to 3.0
         self.brightness_slider.setValue(100)  # 1.0
         self.brightness_slider.valueChanged.connect(self.update_brightness_label)
+        self.brightness_slider.valueChanged.connect(lambda _: self.update_live_preview('brightness'))
         
         self.brightness_label = QLabel("1.0")
         brightness_layout.addWidget(QLabel("المستوى:"))
@@ -810,6 +1562,7 @@ class FouadImageManager(QMainWindow):
         self.contrast_slider.setRange(10, 300)
         self.contrast_slider.setValue(100)
         self.contrast_slider.valueChanged.connect(self.update_contrast_label)
+        self.contrast_slider.valueChanged.connect(lambda _: self.update_live_preview('contrast'))
         
         self.contrast_label = QLabel("1.0")
         contrast_layout.addWidget(QLabel("المستوى:"))
@@ -831,6 +1584,7 @@ class FouadImageManager(QMainWindow):
         self.blur_slider.setRange(1, 20)
         self.blur_slider.setValue(2)
         self.blur_slider.valueChanged.connect(self.update_blur_label)
+        self.blur_slider.valueChanged.connect(lambda _: self.update_live_preview('blur'))
         
         self.blur_label = QLabel("2")
         blur_layout.addWidget(QLabel("الشدة:"))
@@ -957,6 +1711,17 @@ class FouadImageManager(QMainWindow):
         
         layout.addWidget(save_group)
         
+        # فحص مجلد الصور
+        scan_group = QGroupBox("📂 مجلد الصور")
+        scan_layout = QVBoxLayout(scan_group)
+        
+        self.recursive_scan_checkbox = QCheckBox("تضمين المجلدات الفرعية")
+        self.recursive_scan_checkbox.setChecked(self.settings.value("scan_recursive", False, type=bool))
+        self.recursive_scan_checkbox.toggled.connect(self.set_recursive_scan)
+        scan_layout.addWidget(self.recursive_scan_checkbox)
+        
+        layout.addWidget(scan_group)
+        
         # إعدادات الخادم
         server_settings_group = QGroupBox("🌐 إعدادات الخادم")
         server_settings_layout = QFormLayout(server_settings_group)
@@ -982,10 +1747,14 @@ class FouadImageManager(QMainWindow):
         
         optimize_images_btn = QPushButton("⚡ تحسين جميع الصور")
         optimize_images_btn.clicked.connect(self.optimize_all_images)
-        
+
+        duplicates_btn = QPushButton("🧬 الصور المكررة")
+        duplicates_btn.clicked.connect(self.find_duplicates)
+
         tools_layout.addWidget(clear_cache_btn)
         tools_layout.addWidget(backup_images_btn)
         tools_layout.addWidget(optimize_images_btn)
+        tools_layout.addWidget(duplicates_btn)
         
         layout.addWidget(tools_group)
         
@@ -1105,33 +1874,105 @@ class FouadImageManager(QMainWindow):
         }
         """)
     
+    def create_folder_watcher(self):
+        """المراقب يفحص المجلد في الخلفية ويرسل أول تحميل على دفعات ثم الفروقات فقط"""
+        self.folder_watcher = ImageFolderWatcher(
+            self.images_path, self.settings.value("scan_recursive", False, type=bool), self
+        )
+        self.folder_watcher.chunk_loaded.connect(self.on_images_chunk)
+        self.folder_watcher.load_finished.connect(self.on_images_loaded)
+        self.folder_watcher.changed.connect(self.on_images_changed)
+    
     def refresh_images(self):
-        """تحديث قائمة الصور"""
+        """تحديث قائمة الصور (الفرق فقط؛ المراقب يستدعي نفس المسار تلقائياً)"""
         if not self.images_path or not os.path.exists(self.images_path):
             self.status_bar.showMessage("❌ مجلد الصور غير موجود")
             return
         
-        self.images_list.clear()
-        images = ProjectDetector.get_images_in_project(self.project_path)
-        
-        for image in images:
-            item = QListWidgetItem(image)
-            self.images_list.addItem(item)
-        
-        self.status_bar.showMessage(f"🔄 تم تحديث القائمة - {len(images)} صورة")
+        if self.folder_watcher is None:
+            self.create_folder_watcher()
+        self.folder_watcher.rescan()
+    
+    def set_recursive_scan(self, enabled: bool):
+        """تضمين المجلدات الفرعية: إعادة تحميل القائمة من البداية"""
+        self.settings.setValue("scan_recursive", enabled)
+        if self.folder_watcher is None:
+            return
+        self.images_list.clear_thumbnails()
+        self.images_list.image_model.reset([])
+        self.folder_watcher.start(enabled)
+    
+    def scanned_image_names(self) -> Optional[List[str]]:
+        """أسماء الصور من آخر فحص للمراقب بدل إعادة فحص المجلد في خيط الواجهة"""
+        if self.folder_watcher is None or not self.folder_watcher.loaded:
+            self.status_bar.showMessage("⏳ جاري فحص مجلد الصور، حاول بعد انتهائه")
+            return None
+        return sorted(self.folder_watcher.entries)
+    
+    def on_images_chunk(self, names: List[str]):
+        """دفعة من الفحص الأول: القائمة تعمل قبل انتهاء الفحص"""
+        self.images_list.image_model.extend(names)
+        self.status_bar.showMessage(f"⏳ جاري فحص مجلد الصور... {self.images_list.image_model.rowCount()} صورة")
+    
+    def on_images_loaded(self, count: int):
+        self.status_bar.showMessage(f"🔄 تم تحديث القائمة - {count} صورة")
+        # تحديث فهرس البيانات في الخلفية؛ يحذف أيضاً صفوف ملفات حُذفت والمدير مغلق
+        if self.metadata_index:
+            self.metadata_index.refresh_in_background(
+                [os.path.join(self.images_path, name) for name in self.folder_watcher.entries],
+                prune_directory=self.images_path
+            )
+    
+    def on_images_changed(self, added: List[str], removed: List[str], changed: List[str],
+                          renamed: List[tuple]):
+        """تطبيق فرق المجلد على النموذج: كلفة التحديث بحجم التغيير لا بحجم المجلد"""
+        model = self.images_list.image_model
+        for name in removed:
+            model.remove(name)
+        for old_name, new_name in renamed:
+            model.rename(old_name, new_name)
+        if len(added) > 100:
+            model.extend(added)
+        else:
+            for name in added:
+                model.insert(name)
+        self.images_list.invalidate_thumbnails(changed)
+        self.status_bar.showMessage(f"🔄 تم تحديث القائمة - {len(self.folder_watcher.entries)} صورة")
+        
+        # الصورة المختارة أعيدت تسميتها أو تغير محتواها
+        for old_name, new_name in renamed:
+            if old_name == self.current_selected_image:
+                self.current_selected_image = new_name
+        if self.current_selected_image in changed:
+            self.on_image_selected(self.current_selected_image)
+        
+        # تحديث فهرس البيانات في الخلفية للملفات المتأثرة فقط
+        if self.metadata_index:
+            paths = lambda names: [os.path.join(self.images_path, name) for name in names]
+            self.metadata_index.forget(paths(removed + [old for old, _ in renamed]))
+            self.metadata_index.refresh_in_background(paths(added + changed + [new for _, new in renamed]))
+    
+    def toggle_grid_mode(self, enabled: bool):
+        """التبديل بين قائمة الأسماء وشبكة المصغرات (يُحفظ في الإعدادات)"""
+        self.images_list.set_grid_mode(enabled)
+        self.settings.setValue("thumbnail_grid", enabled)
     
     def on_image_selected(self, filename: str):
         """عند اختيار صورة من القائمة"""
         self.current_selected_image = filename
         image_path = os.path.join(self.images_path, filename)
         
-        # عرض الصورة في المعاينة
+        # عرض الصورة في المعاينة، وتحميل السابقة والتالية مسبقاً للتصفح الفوري
         self.preview_widget.load_image(image_path)
+        self.preview_widget.prefetch(
+            [os.path.join(self.images_path, name) for name in self.images_list.neighbor_names(filename)]
+        )
+        self.update_live_preview()
         
-        # عرض معلومات الصورة
-        if self.image_processor:
-            info = self.image_processor.get_image_info(filename)
-            if 'error' not in info:
+        # عرض معلومات الصورة (من الفهرس بدون فتح الملف إذا لم يتغير)
+        if self.metadata_index:
+            info = self.metadata_index.get_image_info(image_path)
+            if info and 'error' not in info:
                 info_text = f"""
 الاسم: {info['filename']}
 الصيغة: {info['format']}
@@ -1155,7 +1996,7 @@ class FouadImageManager(QMainWindow):
                 self.width_spinbox.setValue(info['size'][0])
                 self.height_spinbox.setValue(info['size'][1])
             else:
-                self.info_label.setText(f"خطأ: {info['error']}")
+                self.info_label.setText(f"خطأ: {info.get('error', 'الملف غير موجود')}")
         
         self.status_bar.showMessage(f"تم اختيار: {filename}")
     
@@ -1205,8 +2046,10 @@ class FouadImageManager(QMainWindow):
         """عند تغيير خيار الحفاظ على النسبة"""
         if self.keep_ratio_checkbox.isChecked() and self.current_selected_image:
             # حساب النسبة من الصورة الأصلية
-            info = self.image_processor.get_image_info(self.current_selected_image)
-            if 'error' not in info:
+            info = self.metadata_index.get_image_info(
+                os.path.join(self.images_path, self.current_selected_image)
+            )
+            if info and 'error' not in info:
                 original_ratio = info['size'][0] / info['size'][1]
                 current_width = self.width_spinbox.value()
                 new_height = int(current_width / original_ratio)
@@ -1220,21 +2063,15 @@ class FouadImageManager(QMainWindow):
         width = self.width_spinbox.value()
         height = self.height_spinbox.value()
         
-        try:
-            self.show_operation_progress("جاري تغيير الحجم...")
-            new_filename = self.image_processor.resize_image(
-                self.current_selected_image, width, height
-            )
-            
-            self.operation_status.setText(f"✅ تم إنشاء: {new_filename}")
-            self.refresh_images()
+        def on_resized(new_filename):
+            self.on_image_created(new_filename)
             QMessageBox.information(self, "نجح", f"تم تغيير حجم الصورة!\nالملف الجديد: {new_filename}")
-            
-        except Exception as e:
-            self.operation_status.setText(f"❌ فشل: {str(e)}")
-            QMessageBox.critical(self, "خطأ", f"فشل تغيير الحجم: {str(e)}")
-        finally:
-            self.hide_operation_progress()
+        
+        self.submit_image_job(
+            "تغيير الحجم", "فشل تغيير الحجم",
+            self.image_processor.resize_image, self.current_selected_image, width, height,
+            on_finished=on_resized
+        )
     
     def update_brightness_label(self, value):
         """تحديث نص شريط الإضاءة"""
@@ -1250,27 +2087,35 @@ class FouadImageManager(QMainWindow):
         """تحديث نص شريط التمويه"""
         self.blur_label.setText(str(value))
     
+    def live_operations(self, name: str):
+        """عملية الشريط بقيمته الحالية كما سيطبقها زر التطبيق"""
+        if name == 'brightness':
+            return [('brightness', {'factor': self.brightness_slider.value() / 100.0})]
+        if name == 'contrast':
+            return [('contrast', {'factor': self.contrast_slider.value() / 100.0})]
+        return [('blur', {'radius': self.blur_slider.value()})]
+    
+    def update_live_preview(self, name: Optional[str] = None):
+        """إعادة رسم المعاينة الحية عند تحريك شريط"""
+        if name is not None:
+            self.live_operation = name
+        if self.live_preview_checkbox.isChecked() and self.current_selected_image and self.live_operation:
+            self.preview_widget.show_adjusted(self.live_operations(self.live_operation))
+    
+    def toggle_live_preview(self, enabled: bool):
+        if enabled:
+            self.update_live_preview()
+        else:
+            self.preview_widget.clear_adjustments()
+    
     def apply_brightness(self):
         """تطبيق فلتر الإضاءة"""
         if not self.current_selected_image:
             return
         
         factor = self.brightness_slider.value() / 100.0
-        
-        try:
-            self.show_operation_progress("جاري تطبيق الإضاءة...")
-            new_filename = self.image_processor.apply_brightness(
-                self.current_selected_image, factor
-            )
-            
-            self.operation_status.setText(f"✅ تم إنشاء: {new_filename}")
-            self.refresh_images()
-            
-        except Exception as e:
-            self.operation_status.setText(f"❌ فشل: {str(e)}")
-            QMessageBox.critical(self, "خطأ", f"فشل تطبيق الإضاءة: {str(e)}")
-        finally:
-            self.hide_operation_progress()
+        self.submit_image_job("تطبيق الإضاءة", "فشل تطبيق الإضاءة",
+                              self.image_processor.apply_brightness, self.current_selected_image, factor)
     
     def apply_contrast(self):
         """تطبيق فلتر التباين"""
@@ -1278,21 +2123,8 @@ class FouadImageManager(QMainWindow):
             return
         
         factor = self.contrast_slider.value() / 100.0
-        
-        try:
-            self.show_operation_progress("جاري تطبيق التباين...")
-            new_filename = self.image_processor.apply_contrast(
-                self.current_selected_image, factor
-            )
-            
-            self.operation_status.setText(f"✅ تم إنشاء: {new_filename}")
-            self.refresh_images()
-            
-        except Exception as e:
-            self.operation_status.setText(f"❌ فشل: {str(e)}")
-            QMessageBox.critical(self, "خطأ", f"فشل تطبيق التباين: {str(e)}")
-        finally:
-            self.hide_operation_progress()
+        self.submit_image_job("تطبيق التباين", "فشل تطبيق التباين",
+                              self.image_processor.apply_contrast, self.current_selected_image, factor)
     
     def apply_blur(self):
         """تطبيق فلتر التمويه"""
@@ -1300,59 +2132,24 @@ class FouadImageManager(QMainWindow):
             return
         
         radius = self.blur_slider.value()
-        
-        try:
-            self.show_operation_progress("جاري تطبيق التمويه...")
-            new_filename = self.image_processor.apply_blur(
-                self.current_selected_image, radius
-            )
-            
-            self.operation_status.setText(f"✅ تم إنشاء: {new_filename}")
-            self.refresh_images()
-            
-        except Exception as e:
-            self.operation_status.setText(f"❌ فشل: {str(e)}")
-            QMessageBox.critical(self, "خطأ", f"فشل تطبيق التمويه: {str(e)}")
-        finally:
-            self.hide_operation_progress()
+        self.submit_image_job("تطبيق التمويه", "فشل تطبيق التمويه",
+                              self.image_processor.apply_blur, self.current_selected_image, radius)
     
     def apply_sharpen(self):
         """تطبيق فلتر الحدة"""
         if not self.current_selected_image:
             return
         
-        try:
-            self.show_operation_progress("جاري تطبيق الحدة...")
-            new_filename = self.image_processor.apply_sharpen(self.current_selected_image)
-            
-            self.operation_status.setText(f"✅ تم إنشاء: {new_filename}")
-            self.refresh_images()
-            
-        except Exception as e:
-            self.operation_status.setText(f"❌ فشل: {str(e)}")
-            QMessageBox.critical(self, "خطأ", f"فشل تطبيق الحدة: {str(e)}")
-        finally:
-            self.hide_operation_progress()
+        self.submit_image_job("تطبيق الحدة", "فشل تطبيق الحدة",
+                              self.image_processor.apply_sharpen, self.current_selected_image)
     
     def rotate_image(self, angle: int):
         """دوران الصورة"""
         if not self.current_selected_image:
             return
         
-        try:
-            self.show_operation_progress(f"جاري دوران الصورة {angle}°...")
-            new_filename = self.image_processor.rotate_image(
-                self.current_selected_image, angle
-            )
-            
-            self.operation_status.setText(f"✅ تم إنشاء: {new_filename}")
-            self.refresh_images()
-            
-        except Exception as e:
-            self.operation_status.setText(f"❌ فشل: {str(e)}")
-            QMessageBox.critical(self, "خطأ", f"فشل دوران الصورة: {str(e)}")
-        finally:
-            self.hide_operation_progress()
+        self.submit_image_job(f"دوران الصورة {angle}°", "فشل دوران الصورة",
+                              self.image_processor.rotate_image, self.current_selected_image, angle)
     
     def apply_custom_rotation(self):
         """تطبيق دوران مخصص"""
@@ -1365,101 +2162,72 @@ class FouadImageManager(QMainWindow):
         if not self.current_selected_image:
             return
         
-        try:
-            input_path = os.path.join(self.images_path, self.current_selected_image)
-            name, ext = os.path.splitext(self.current_selected_image)
-            output_filename = f"{name}_flipped_h{ext}"
-            output_path = os.path.join(self.images_path, output_filename)
-            
-            self.show_operation_progress("جاري الانعكاس الأفقي...")
-            
-            with Image.open(input_path) as img:
-                flipped_img = img.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
-                flipped_img.save(output_path)
-            
-            self.operation_status.setText(f"✅ تم إنشاء: {output_filename}")
-            self.refresh_images()
-            
-        except Exception as e:
-            self.operation_status.setText(f"❌ فشل: {str(e)}")
-            QMessageBox.critical(self, "خطأ", f"فشل الانعكاس: {str(e)}")
-        finally:
-            self.hide_operation_progress()
+        self.submit_image_job("الانعكاس الأفقي", "فشل الانعكاس",
+                              self.image_processor.flip_image, self.current_selected_image, 'horizontal')
     
     def flip_vertical(self):
         """انعكاس عمودي"""
         if not self.current_selected_image:
             return
         
-        try:
-            input_path = os.path.join(self.images_path, self.current_selected_image)
-            name, ext = os.path.splitext(self.current_selected_image)
-            output_filename = f"{name}_flipped_v{ext}"
-            output_path = os.path.join(self.images_path, output_filename)
-            
-            self.show_operation_progress("جاري الانعكاس العمودي...")
-            
-            with Image.open(input_path) as img:
-                flipped_img = img.transpose(Image.Transpose.FLIP_TOP_BOTTOM)
-                flipped_img.save(output_path)
-            
-            self.operation_status.setText(f"✅ تم إنشاء: {output_filename}")
-            self.refresh_images()
-            
-        except Exception as e:
-            self.operation_status.setText(f"❌ فشل: {str(e)}")
-            QMessageBox.critical(self, "خطأ", f"فشل الانعكاس: {str(e)}")
-        finally:
-            self.hide_operation_progress()
+        self.submit_image_job("الانعكاس العمودي", "فشل الانعكاس",
+                              self.image_processor.flip_image, self.current_selected_image, 'vertical')
     
     def convert_format(self):
         """تحويل صيغة الصورة"""
         if not self.current_selected_image:
             return
         
-        new_format = self.output_format_combo.currentText().lower()
-        if new_format == 'jpeg':
-            ext = '.jpg'
-        else:
-            ext = f'.{new_format}'
-        
-        try:
-            input_path = os.path.join(self.images_path, self.current_selected_image)
-            name = os.path.splitext(self.current_selected_image)[0]
-            output_filename = f"{name}_converted{ext}"
-            output_path = os.path.join(self.images_path, output_filename)
-            
-            self.show_operation_progress(f"جاري تحويل إلى {new_format.upper()}...")
-            
-            with Image.open(input_path) as img:
-                # تحويل إلى RGB إذا كان التنسيق لا يدعم الشفافية
-                if new_format in ['jpeg', 'bmp'] and img.mode in ['RGBA', 'LA']:
-                    rgb_img = Image.new('RGB', img.size, (255, 255, 255))
-                    rgb_img.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                    img = rgb_img
-                
-                img.save(output_path, format=new_format.upper())
-            
-            self.operation_status.setText(f"✅ تم التحويل: {output_filename}")
-            self.refresh_images()
-            
-        except Exception as e:
-            self.operation_status.setText(f"❌ فشل: {str(e)}")
-            QMessageBox.critical(self, "خطأ", f"فشل تحويل الصيغة: {str(e)}")
-        finally:
-            self.hide_operation_progress()
-    
-    def show_operation_progress(self, message: str):
-        """عرض شريط التقدم مع رسالة"""
-        self.progress_bar.setVisible(True)
-        self.progress_bar.setRange(0, 0)  # شريط لانهائي
-        self.operation_status.setText(f"⏳ {message}")
-        QApplication.processEvents()
-    
-    def hide_operation_progress(self):
-        """إخفاء شريط التقدم"""
-        self.progress_bar.setVisible(False)
-        QApplication.processEvents()
+        new_format = self.output_format_combo.currentText()
+        self.submit_image_job(f"تحويل إلى {new_format}", "فشل تحويل الصيغة",
+                              self.image_processor.convert_format, self.current_selected_image, new_format)
+    
+    def submit_image_job(self, title: str, error_message: str, method, *args, on_finished=None) -> int:
+        """تشغيل method(*args) في الخلفية؛ الدالة تستقبل cancel_check و progress_callback"""
+        job_id = self.job_queue.submit(title, lambda **hooks: method(*args, **hooks))
+        self.job_handlers[job_id] = (error_message, on_finished or self.on_image_created)
+        self.update_jobs_status()
+        return job_id
+    
+    def on_image_created(self, new_filename: str):
+        """النتيجة الافتراضية لعمليات التعديل: ملف جديد في مجلد الصور"""
+        self.operation_status.setText(f"✅ تم إنشاء: {new_filename}")
+        # إعادة الكتابة فوق ملف موجود لا تغير inode فلا يراها المراقب
+        self.images_list.invalidate_thumbnails([new_filename])
+        self.refresh_images()
+    
+    def update_jobs_status(self, message: Optional[str] = None):
+        """شريط التقدم وزر الإلغاء حسب المهام غير المنتهية"""
+        jobs = list(self.job_queue.jobs.values())
+        self.progress_bar.setVisible(bool(jobs))
+        self.cancel_jobs_btn.setVisible(bool(jobs))
+        if jobs:
+            self.progress_bar.setValue(self.job_queue.progress())
+            titles = "، ".join(job.title for job in jobs[:3])
+            self.operation_status.setText(f"⏳ {titles}" + (f" (+{len(jobs) - 3})" if len(jobs) > 3 else ""))
+        if message:
+            self.operation_status.setText(message)
+    
+    def on_job_started(self, job_id: int):
+        self.update_jobs_status()
+    
+    def on_job_progress(self, job_id: int, percent: int):
+        self.progress_bar.setValue(self.job_queue.progress())
+    
+    def on_job_finished(self, job_id: int, result):
+        _, on_finished = self.job_handlers.pop(job_id, (None, None))
+        self.update_jobs_status()
+        if on_finished is not None:
+            on_finished(result)
+    
+    def on_job_failed(self, job_id: int, error: str):
+        error_message, _ = self.job_handlers.pop(job_id, ("فشلت العملية", None))
+        self.update_jobs_status(f"❌ فشل: {error}")
+        QMessageBox.critical(self, "خطأ", f"{error_message}: {error}")
+    
+    def on_job_cancelled(self, job_id: int):
+        self.job_handlers.pop(job_id, None)
+        self.update_jobs_status("⏹️ أُلغيت العملية")
     
     def view_original_size(self):
         """عرض الصورة بحجمها الأصلي"""
@@ -1598,46 +2366,130 @@ class FouadImageManager(QMainWindow):
                 QMessageBox.critical(self, "خطأ", f"فشل إنشاء النسخة الاحتياطية: {str(e)}")
     
     def optimize_all_images(self):
-        """تحسين جميع الصور (ضغط بدون فقدان جودة)"""
+        """تحسين جميع الصور: أصغر ترميز يحافظ على الجودة، في مجلد منفصل دون المساس بالأصل"""
         if not self.images_path:
             return
         
+        output_dir = os.path.join(self.project_path, "optimized")
         reply = QMessageBox.question(
             self, 
             "تأكيد", 
-            "هل تريد تحسين جميع الصور؟ (قد يستغرق وقتاً طويلاً)",
+            f"هل تريد تحسين جميع الصور؟ (قد يستغرق وقتاً طويلاً)\nستُحفظ النتائج في: {output_dir}",
             QMessageBox.Yes | QMessageBox.No
         )
         
         if reply == QMessageBox.Yes:
-            images = ProjectDetector.get_images_in_project(self.project_path)
-            optimized_count = 0
+            images = self.scanned_image_names()
+            if images is None:
+                return
+            settings = {'metric': default_metric()}
             
-            for i, image in enumerate(images):
-                try:
-                    image_path = os.path.join(self.images_path, image)
-                    with Image.open(image_path) as img:
-                        # حفظ بجودة محسنة
-                        img.save(image_path, optimize=True, quality=85)
-                        optimized_count += 1
-                except Exception:
-                    pass
-                
-                # تحديث التقدم
-                progress = int((i + 1) / len(images) * 100)
-                self.status_bar.showMessage(f"تحسين الصور... {progress}%")
-                QApplication.processEvents()
+            def run(cancel_check, progress_callback):
+                # البحث عن أفضل ترميز لكل صورة، موزعاً على كل أنوية المعالج
+                batch = BatchProcessor(self.images_path)
+                results = []
+                for result in optimize_images(self.images_path, images, output_dir, batch=batch, **settings):
+                    results.append(result)
+                    progress_callback(result['done'] / result['total'])
+                    if cancel_check():
+                        batch.cancel()
+                if batch.cancelled:
+                    raise OperationCancelled()
+                report = build_report(results, settings)
+                return report, write_report(report, output_dir)
             
-            self.status_bar.showMessage(f"تم تحسين {optimized_count} صورة")
-            QMessageBox.information(self, "تم", f"تم تحسين {optimized_count} صورة بنجاح")
+            self.submit_image_job("تحسين الصور", "فشل تحسين الصور", run,
+                                  on_finished=self.on_images_optimized)
+    
+    def on_images_optimized(self, result):
+        """عرض ملخص تقرير التحسين"""
+        report, report_path = result
+        optimized_count = sum(1 for entry in report['files'] if entry['output'])
+        summary = (
+            f"تم تحسين {optimized_count} صورة، ووُفر "
+            f"{report['saved_bytes'] / (1024 * 1024):.2f} ميجابايت ({report['saved_ratio']:.0%})\n"
+            f"التقرير: {report_path}"
+        )
+        self.status_bar.showMessage(f"تم تحسين {optimized_count} صورة")
+        if report['errors']:
+            errors = [f"{error['filename']}: {error['error']}" for error in report['errors']]
+            QMessageBox.warning(
+                self, "تم مع أخطاء",
+                f"{summary}\nفشلت {len(errors)}:\n" + "\n".join(errors[:20])
+            )
+        else:
+            QMessageBox.information(self, "تم", summary)
+    
+    def find_duplicates(self):
+        """كشف الصور المكررة والمتشابهة ودمج المجموعات المختارة"""
+        if not self.images_path or not self.metadata_index:
+            return
+        
+        images = self.scanned_image_names()
+        if images is None:
+            return
+        
+        def run(cancel_check, progress_callback):
+            # البصمات المخزنة في الفهرس لا يُعاد حسابها إلا للملفات المتغيرة
+            batch = BatchProcessor(self.images_path)
+            
+            def on_progress(done, total, result):
+                progress_callback(done / total)
+                if cancel_check():
+                    batch.cancel()
+            
+            rows = ensure_hashes(self.metadata_index, self.images_path, images,
+                                 batch=batch, progress_callback=on_progress)
+            if batch.cancelled:
+                raise OperationCancelled()
+            return rows, find_clusters(rows, referenced=referenced_names(self.project_path))
+        
+        self.submit_image_job("حساب بصمات الصور", "فشل كشف الصور المكررة", run,
+                              on_finished=self.on_duplicates_found)
+    
+    def on_duplicates_found(self, result):
+        """عرض مجموعات الصور المتشابهة ودمج المختار منها"""
+        rows, clusters = result
+        self.status_bar.showMessage(f"🧬 {len(clusters)} مجموعة متشابهة من {len(rows)} صورة")
+        
+        if not clusters:
+            QMessageBox.information(self, "الصور المكررة", "لا توجد صور مكررة أو متشابهة")
+            return
+        
+        dialog = DuplicatesDialog(clusters, self)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        
+        moved = []
+        try:
+            for cluster in dialog.selected_clusters():
+                moved.extend(merge_cluster(cluster, self.images_path, self.project_path)['moved'])
+        except Exception as e:
+            QMessageBox.critical(self, "خطأ", f"فشل دمج الصور المكررة: {str(e)}")
+        
+        self.refresh_images()
+        if moved:
+            QMessageBox.information(
+                self, "تم",
+                f"تم نقل {len(moved)} صورة مكررة إلى:\n"
+                f"{os.path.join(self.project_path, CACHE_DIR_NAME, DUPLICATES_DIR_NAME)}"
+            )
     
     def closeEvent(self, event):
         """عند إغلاق التطبيق"""
+        # إيقاف مهام الصور قبل إغلاق الفهرس الذي قد تستخدمه
+        self.job_queue.shutdown()
+        if self.folder_watcher:
+            self.folder_watcher.shutdown()
+        
         if self.server_manager:
             self.server_manager.should_stop = True
             self.server_manager.stop_server()
             self.server_manager.wait()
         
+        if self.metadata_index:
+            self.metadata_index.close()
+        
         # حفظ الإعدادات
         self.settings.setValue("geometry", self.saveGeometry())
         self.settings.setValue("windowState", self.saveState())
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+فهرس بيانات الصور الدائم
+Persistent image metadata index (SQLite)
+
+كل صف مفتاحه المسار + وقت التعديل + الحجم، ويحفظ الأبعاد والصيغة ونمط
+الألوان والحجم وبصمة المحتوى. الصف الذي يطابق stat() الحالي يُستخدم
+مباشرة بدون فتح الملف، وأي ملف تغير يُعاد فحصه وحده. get() يقرأ الترويسة
+فقط، وبصمة المحتوى (قراءة الملف كاملاً) تُحسب في التحديث الخلفي.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from PIL import Image
+
+# مجلد الذاكرة المشتركة للمدير داخل مجلد المشروع
+CACHE_DIR_NAME = '.fouad_cache'
+METADATA_DB_NAME = 'metadata.sqlite3'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    format TEXT,
+    mode TEXT,
+    content_hash TEXT,
+    error TEXT,
+    probed_at REAL NOT NULL
+)
+"""
+
+COLUMNS = ('path', 'mtime_ns', 'size', 'width', 'height', 'format', 'mode',
+           'content_hash', 'error', 'probed_at')
+
+# البصمات الإدراكية (fouad_image_dedup) تُحسب لاحقاً لأنها تحتاج فك ترميز البكسلات.
+# إعادة فحص الملف تستبدل الصف كاملاً فتُمسح بصماته القديمة تلقائياً.
+HASH_COLUMNS = ('ahash', 'dhash', 'phash')
+
+
+def content_hash(filepath: str) -> str:
+    """بصمة sha256 لمحتوى الملف (قراءة على أجزاء)"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def probe_image(filepath: str, stat: Optional[os.stat_result] = None,
+                hash_content: bool = True) -> Dict[str, Any]:
+    """فحص الترويسة فقط: Image.open لا يفك ترميز البكسلات
+    
+    hash_content=False يتخطى بصمة المحتوى لأنها تقرأ الملف كاملاً.
+    """
+    stat = stat or os.stat(filepath)
+    row = {
+        'path': filepath, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+        'width': None, 'height': None, 'format': None, 'mode': None,
+        'content_hash': None, 'error': None, 'probed_at': time.time(),
+    }
+    try:
+        with Image.open(filepath) as img:
+            row['width'], row['height'] = img.size
+            row['format'] = img.format
+            row['mode'] = img.mode
+        if hash_content:
+            row['content_hash'] = content_hash(filepath)
+    except Exception as e:
+        row['error'] = str(e)
+    return row
+
+
+class ImageMetadataIndex:
+    """فهرس SQLite لبيانات الصور مع تحديث تزايدي وفحص متوازٍ في الخلفية"""
+
+    def __init__(self, db_path: str, max_workers: Optional[int] = None):
+        self.db_path = db_path
+        self.max_workers = max_workers or min(8, (os.cpu_count() or 1) * 2)
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+        # اتصال واحد مشترك بين خيط الواجهة وخيوط الفحص، محمي بقفل
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(SCHEMA)
+            # ترقية القواعد القديمة بالأعمدة المضافة
+            existing = {row['name'] for row in self._conn.execute("PRAGMA table_info(images)")}
+            for column in HASH_COLUMNS:
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE images ADD COLUMN {column} TEXT")
+
+    @classmethod
+    def for_project(cls, project_path: str) -> 'ImageMetadataIndex':
+        """الفهرس الافتراضي للمشروع: .fouad_cache/metadata.sqlite3"""
+        return cls(os.path.join(project_path, CACHE_DIR_NAME, METADATA_DB_NAME))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _lookup(self, filepath: str) -> Optional[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT * FROM images WHERE path = ?", (filepath,)
+            ).fetchone()
+    
+    def _lookup_many(self, filepaths: List[str], columns: str = "*") -> Dict[str, sqlite3.Row]:
+        """صفوف المسارات المطلوبة فقط، على دفعات تحت حد متغيرات SQLite"""
+        rows = {}
+        with self._lock:
+            for start in range(0, len(filepaths), 500):
+                batch = filepaths[start:start + 500]
+                for row in self._conn.execute(
+                    f"SELECT {columns} FROM images WHERE path IN ({', '.join('?' for _ in batch)})", batch
+                ):
+                    rows[row['path']] = row
+        return rows
+
+    def _store(self, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        placeholders = ', '.join('?' for _ in COLUMNS)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO images ({', '.join(COLUMNS)}) VALUES ({placeholders})",
+                [tuple(row[column] for column in COLUMNS) for row in rows],
+            )
+
+    def lookup(self, filepath: str, stat: Optional[os.stat_result] = None) -> Optional[Dict[str, Any]]:
+        """صف الملف إن كان مطابقاً لحالته الحالية، بدون فحص الملف"""
+        filepath = os.path.abspath(filepath)
+        try:
+            stat = stat or os.stat(filepath)
+        except OSError:
+            return None
+        row = self._lookup(filepath)
+        if row is not None and row['mtime_ns'] == stat.st_mtime_ns and row['size'] == stat.st_size:
+            return dict(row)
+        return None
+    
+    def get(self, filepath: str) -> Optional[Dict[str, Any]]:
+        """صف الملف المطابق لحالته الحالية؛ تُفحص ترويسته فوراً إذا كان جديداً أو تغير
+        
+        يُستدعى من خيط الواجهة، فبصمة المحتوى تبقى فارغة حتى يحسبها refresh().
+        """
+        filepath = os.path.abspath(filepath)
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+
+        row = self.lookup(filepath, stat)
+        if row is not None:
+            return row
+
+        row = probe_image(filepath, stat, hash_content=False)
+        self._store([row])
+        return row
+    
+    def store(self, rows: List[Dict[str, Any]]):
+        """حفظ صفوف فُحصت خارج الفهرس (في عمليات عاملة مثلاً)"""
+        self._store(rows)
+
+    def get_image_info(self, filepath: str) -> Dict[str, Any]:
+        """نفس صيغة ImageProcessor.get_image_info لكن من الفهرس"""
+        row = self.get(filepath)
+        if row is None:
+            return {}
+        if row['error']:
+            return {'error': row['error']}
+        return {
+            'filename': os.path.basename(filepath),
+            'format': row['format'],
+            'mode': row['mode'],
+            'size': (row['width'], row['height']),
+            'file_size': row['size'],
+            'file_size_mb': round(row['size'] / (1024 * 1024), 2),
+            'content_hash': row['content_hash'],
+        }
+
+    def store_hashes(self, filepath: str, mtime_ns: int, size: int, hashes: Dict[str, str]):
+        """حفظ البصمات الإدراكية فقط إذا كان الصف ما زال لنفس نسخة الملف"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE images SET {', '.join(f'{column} = ?' for column in HASH_COLUMNS)} "
+                "WHERE path = ? AND mtime_ns = ? AND size = ?",
+                (*(hashes[column] for column in HASH_COLUMNS), os.path.abspath(filepath), mtime_ns, size),
+            )
+
+    def forget(self, filepaths: Iterable[str]):
+        """حذف صفوف ملفات حُذفت أو أعيدت تسميتها"""
+        removed = [(os.path.abspath(filepath),) for filepath in filepaths]
+        if removed:
+            with self._lock, self._conn:
+                self._conn.executemany("DELETE FROM images WHERE path = ?", removed)
+    
+    def refresh(self, filepaths: Iterable[str], prune_directory: Optional[str] = None) -> int:
+        """تحديث تزايدي: فحص الملفات الجديدة أو المتغيرة أو بلا بصمة محتوى فقط بالتوازي
+
+        prune_directory: حذف صفوف الملفات التي لم تعد موجودة داخل هذا المجلد.
+        يعيد عدد الملفات التي أعيد فحصها.
+        """
+        filepaths = [os.path.abspath(filepath) for filepath in filepaths]
+        # صفوف الملفات المطلوبة فقط: التحديث بعد تغير ملف واحد لا يقرأ الجدول كله
+        known = self._lookup_many(filepaths, "path, mtime_ns, size, content_hash, error")
+
+        current = set()
+        stale = []
+        for filepath in filepaths:
+            try:
+                stat = os.stat(filepath)
+            except OSError:
+                continue
+            current.add(filepath)
+            row = known.get(filepath)
+            if row is None or (row['mtime_ns'], row['size']) != (stat.st_mtime_ns, stat.st_size) \
+                    or (row['content_hash'] is None and row['error'] is None):
+                stale.append((filepath, stat))
+
+        if stale:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                rows = list(executor.map(lambda item: probe_image(*item), stale))
+            self._store(rows)
+
+        if prune_directory is not None:
+            prefix = os.path.join(os.path.abspath(prune_directory), '')
+            with self._lock:
+                indexed = [row['path'] for row in self._conn.execute(
+                    "SELECT path FROM images WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)
+                )]
+            removed = [(path,) for path in indexed if path not in current]
+            if removed:
+                with self._lock, self._conn:
+                    self._conn.executemany("DELETE FROM images WHERE path = ?", removed)
+
+        return len(stale)
+
+    def refresh_in_background(self, filepaths: Iterable[str],
+                              prune_directory: Optional[str] = None) -> threading.Thread:
+        """تشغيل refresh() في خيط خلفي حتى لا تتجمد الواجهة"""
+        thread = threading.Thread(
+            target=self.refresh, args=(list(filepaths), prune_directory), daemon=True
+        )
+        thread.start()
+        return thread
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+محسن أحجام الصور بالبحث في خيارات الترميز
+Target-size / target-quality encoder search for the site images
+
+لكل صورة يُجرب: JPEG تدريجي بعدة جودات، WebP بفقد وبدون فقد، PNG محسن
+ولوحة ألوان 256. يُختار أصغر ناتج يبقى فوق حد الجودة (SSIM أو PSNR)،
+أو الأفضل جودة ضمن ميزانية بايتات. النتائج تُكتب في مجلد منفصل (الأصل لا
+يُستبدل) مع تقرير JSON بالبايتات الموفرة لكل ملف.
+
+    python fouad_image_optimizer.py images --output optimized
+    python fouad_image_optimizer.py images --metric psnr --threshold 42
+    python fouad_image_optimizer.py images --max-bytes 150000 --formats jpeg,webp
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from PIL import Image, ImageChops, ImageStat
+
+from fouad_image_processor import BatchProcessor, ImageProcessor, OperationCancelled, cancel_requested
+
+# NumPy اختيارية: بدونها يُستخدم PSNR بدل SSIM
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp'}
+FORMAT_EXTENSIONS = {'JPEG': '.jpg', 'WEBP': '.webp', 'PNG': '.png'}
+
+# سلم الجودة للترميز بفقد (تصاعدي) ويُبحث فيه ثنائياً
+QUALITY_LADDER = (40, 50, 60, 65, 70, 75, 80, 85, 90, 95)
+
+DEFAULT_THRESHOLDS = {'ssim': 0.985, 'psnr': 40.0}
+
+# المقارنة تتم بعد التصغير إلى هذا الحد لتبقى سريعة على الصور الضخمة
+METRIC_MAX_SIDE = 2048
+
+
+def default_metric() -> str:
+    return 'ssim' if np is not None else 'psnr'
+
+
+def _comparable(img: Image.Image) -> Image.Image:
+    """RGB فوق خلفية بيضاء بحجم محدود: نفس الأساس للأصل وكل مرشح"""
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        img = background
+    elif img.mode != 'RGB':
+        img = img.convert('RGB')
+    if max(img.size) > METRIC_MAX_SIDE:
+        scale = METRIC_MAX_SIDE / max(img.size)
+        img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))),
+                         Image.Resampling.BOX)
+    return img
+
+
+def psnr(reference: Image.Image, candidate: Image.Image) -> float:
+    """نسبة الإشارة إلى الضوضاء بالديسيبل (Pillow فقط)"""
+    squares = ImageStat.Stat(ImageChops.difference(reference, candidate)).rms
+    mse = sum(value ** 2 for value in squares) / len(squares)
+    return math.inf if mse == 0 else 10 * math.log10(255 ** 2 / mse)
+
+
+def _box_mean(values, window):
+    """متوسط نافذة مربعة لكل بكسل بالصورة التكاملية"""
+    integral = values.cumsum(0).cumsum(1)
+    integral = np.pad(integral, ((1, 0), (1, 0)))
+    total = (integral[window:, window:] - integral[:-window, window:]
+             - integral[window:, :-window] + integral[:-window, :-window])
+    return total / (window * window)
+
+
+def ssim(reference: Image.Image, candidate: Image.Image, window: int = 8) -> float:
+    """SSIM على الإضاءة بنوافذ 8×8 (يحتاج NumPy)"""
+    if np is None:
+        raise RuntimeError("SSIM يحتاج NumPy - استخدم PSNR أو ثبّت numpy")
+    first = np.asarray(reference.convert('L'), dtype=np.float32)
+    second = np.asarray(candidate.convert('L'), dtype=np.float32)
+    window = min(window, first.shape[0], first.shape[1])
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+
+    mean_first, mean_second = _box_mean(first, window), _box_mean(second, window)
+    variance_first = _box_mean(first * first, window) - mean_first ** 2
+    variance_second = _box_mean(second * second, window) - mean_second ** 2
+    covariance = _box_mean(first * second, window) - mean_first * mean_second
+
+    score = ((2 * mean_first * mean_second + c1) * (2 * covariance + c2)) / \
+            ((mean_first ** 2 + mean_second ** 2 + c1) * (variance_first + variance_second + c2))
+    return float(score.mean())
+
+
+METRICS: Dict[str, Callable[[Image.Image, Image.Image], float]] = {'ssim': ssim, 'psnr': psnr}
+
+
+def _encode(img: Image.Image, output_format: str, options: Dict[str, Any]) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, format=output_format, **options)
+    return buffer.getvalue()
+
+
+def _has_transparency(img: Image.Image) -> bool:
+    if img.mode in ('RGBA', 'LA'):
+        return img.getchannel('A').getextrema()[0] < 255
+    return 'transparency' in img.info
+
+
+def _first_true(values, predicate) -> Optional[int]:
+    """بحث ثنائي عن أول موضع يتحقق فيه شرط رتيب (خطأ... خطأ، صح... صح)"""
+    low, high, found = 0, len(values) - 1, None
+    while low <= high:
+        middle = (low + high) // 2
+        if predicate(values[middle]):
+            found, high = middle, middle - 1
+        else:
+            low = middle + 1
+    return found
+
+
+class EncoderSearch:
+    """البحث عن أفضل ترميز لصورة واحدة"""
+
+    def __init__(self, metric: Optional[str] = None, threshold: Optional[float] = None,
+                 max_bytes: Optional[int] = None, formats=('JPEG', 'WEBP', 'PNG')):
+        self.metric = metric or default_metric()
+        if self.metric not in METRICS:
+            raise ValueError(f"مقياس غير معروف: {self.metric}")
+        self.threshold = DEFAULT_THRESHOLDS[self.metric] if threshold is None else threshold
+        self.max_bytes = max_bytes
+        self.formats = tuple(output_format.upper() for output_format in formats)
+
+    def _candidate(self, img, reference, output_format, options, label):
+        if cancel_requested():
+            raise OperationCancelled()
+        data = _encode(img, output_format, options)
+        with Image.open(io.BytesIO(data)) as decoded:
+            score = METRICS[self.metric](reference, _comparable(decoded))
+        return {'format': output_format, 'options': options, 'label': label,
+                'bytes': len(data), 'score': score, 'data': data}
+
+    def _search_lossy(self, img, reference, output_format, base_options, label):
+        """أدنى جودة تتجاوز الحد، أو أعلى جودة ضمن الميزانية"""
+        cache = {}
+
+        def attempt(quality):
+            if quality not in cache:
+                cache[quality] = self._candidate(img, reference, output_format,
+                                                 dict(base_options, quality=quality), f"{label} q{quality}")
+            return cache[quality]
+
+        if self.max_bytes is not None:
+            descending = QUALITY_LADDER[::-1]
+            index = _first_true(descending, lambda q: attempt(q)['bytes'] <= self.max_bytes)
+            return attempt(descending[index] if index is not None else QUALITY_LADDER[0])
+
+        index = _first_true(QUALITY_LADDER, lambda q: attempt(q)['score'] >= self.threshold)
+        return attempt(QUALITY_LADDER[index]) if index is not None else None
+
+    def candidates(self, img: Image.Image, extra_options: Dict[str, Any]) -> List[Dict[str, Any]]:
+        reference = _comparable(img)
+        transparent = _has_transparency(img)
+        results = []
+
+        if 'JPEG' in self.formats and not transparent:
+            jpeg = ImageProcessor.prepare_for_format(img, 'JPEG')
+            results.append(self._search_lossy(
+                jpeg, reference, 'JPEG', dict(extra_options, optimize=True, progressive=True), 'JPEG'))
+        if 'WEBP' in self.formats:
+            webp = img if img.mode in ('RGB', 'RGBA') else img.convert('RGBA' if transparent else 'RGB')
+            results.append(self._search_lossy(webp, reference, 'WEBP',
+                                              dict(extra_options, method=6), 'WebP'))
+            results.append(self._candidate(webp, reference, 'WEBP',
+                                           dict(extra_options, lossless=True, method=6), 'WebP lossless'))
+        if 'PNG' in self.formats:
+            png = img if img.mode in ('1', 'L', 'LA', 'P', 'RGB', 'RGBA') else img.convert('RGBA')
+            results.append(self._candidate(png, reference, 'PNG', {'optimize': True}, 'PNG optimized'))
+            if png.mode in ('RGB', 'RGBA'):
+                palette = png.quantize(256, method=Image.Quantize.FASTOCTREE if png.mode == 'RGBA'
+                                       else Image.Quantize.MEDIANCUT)
+                results.append(self._candidate(palette, reference, 'PNG', {'optimize': True}, 'PNG 256 colors'))
+        return [result for result in results if result is not None]
+
+    def choose(self, candidates: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """أصغر ناتج فوق حد الجودة، أو أفضل جودة ضمن الميزانية (وإلا الأصغر)"""
+        if not candidates:
+            return None
+        if self.max_bytes is not None:
+            fitting = [c for c in candidates if c['bytes'] <= self.max_bytes]
+            if fitting:
+                return max(fitting, key=lambda c: (c['score'], -c['bytes']))
+            return min(candidates, key=lambda c: c['bytes'])
+        accepted = [c for c in candidates if c['score'] >= self.threshold]
+        return min(accepted, key=lambda c: c['bytes']) if accepted else None
+
+
+def output_name_for(filename: str, output_format: str) -> str:
+    """اسم الناتج: يبقى الاسم إذا لم تتغير الصيغة، وإلا يُضاف امتداد الصيغة للاسم الكامل
+
+    الاحتفاظ بامتداد الأصل يمنع تصادم ملفات بنفس الاسم (progr.jpg و progr.jpeg).
+    """
+    extension = FORMAT_EXTENSIONS[output_format]
+    source_extension = os.path.splitext(filename)[1].lower()
+    if source_extension == extension or (output_format == 'JPEG' and source_extension == '.jpeg'):
+        return filename
+    return filename + extension
+
+
+def _optimize_worker(images_path: str, filename: str, output_dir: str,
+                     settings: Dict[str, Any]) -> Dict[str, Any]:
+    """تحسين ملف واحد داخل عملية عاملة؛ يعيد سطر التقرير"""
+    source_path = os.path.join(images_path, filename)
+    original_bytes = os.path.getsize(source_path)
+    search = EncoderSearch(**settings)
+
+    with Image.open(source_path) as img:
+        img.load()
+        # الحفاظ على اتجاه الصورة وملف الألوان
+        extra_options = {key: img.info[key] for key in ('exif', 'icc_profile') if img.info.get(key)}
+        candidates = search.candidates(img, extra_options)
+    best = search.choose(candidates)
+
+    entry = {'filename': filename, 'original_bytes': original_bytes, 'output': None,
+             'choice': None, 'optimized_bytes': original_bytes, 'saved_bytes': 0, 'score': None}
+    if best is None or best['bytes'] >= original_bytes:
+        # لا يوجد ترميز أصغر يحقق الشرط: الأصل هو الأفضل
+        entry['choice'] = 'original'
+        return entry
+
+    output_name = output_name_for(filename, best['format'])
+    output_path = os.path.join(output_dir, output_name)
+    # الأسماء قد تكون نسبية داخل مجلدات فرعية (sub/x.png)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tmp_path = os.path.join(os.path.dirname(output_path), f".{os.path.basename(output_name)}.{os.getpid()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(best['data'])
+    os.replace(tmp_path, output_path)
+
+    entry.update({
+        'output': output_name,
+        'choice': best['label'],
+        'optimized_bytes': best['bytes'],
+        'saved_bytes': original_bytes - best['bytes'],
+        'score': round(best['score'], 4) if math.isfinite(best['score']) else None,
+    })
+    return entry
+
+
+def optimize_images(images_path: str, filenames: List[str], output_dir: str,
+                    batch: Optional[BatchProcessor] = None, progress_callback=None, **settings):
+    """تحسين الصور بالتوازي على كل الأنوية؛ مولد لنتائج BatchProcessor"""
+    EncoderSearch(**settings)  # التحقق من الإعدادات قبل تشغيل العمال
+    batch = batch or BatchProcessor(images_path)
+    return batch.map(_optimize_worker, filenames, (output_dir, settings), progress_callback)
+
+
+def build_report(results: List[Dict[str, Any]], settings: Dict[str, Any]) -> Dict[str, Any]:
+    """تقرير البايتات الموفرة لكل ملف والإجمالي"""
+    files = []
+    errors = []
+    for result in results:
+        if result['error']:
+            errors.append({'filename': result['filename'], 'error': result['error']})
+        else:
+            files.append(result['output'])
+    original = sum(entry['original_bytes'] for entry in files)
+    optimized = sum(entry['optimized_bytes'] for entry in files)
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'settings': settings,
+        'files': files,
+        'errors': errors,
+        'original_bytes': original,
+        'optimized_bytes': optimized,
+        'saved_bytes': original - optimized,
+        'saved_ratio': round((original - optimized) / original, 4) if original else 0.0,
+    }
+
+
+def write_report(report: Dict[str, Any], output_dir: str) -> str:
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, 'optimize-report.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('images', help="مجلد الصور")
+    parser.add_argument('--output', default='optimized', help="مجلد النتائج (الأصل لا يُستبدل)")
+    parser.add_argument('--metric', choices=sorted(METRICS), default=default_metric())
+    parser.add_argument('--threshold', type=float, help="الحد الأدنى للجودة (SSIM 0.985 أو PSNR 40 افتراضياً)")
+    parser.add_argument('--max-bytes', type=int, help="ميزانية البايتات لكل صورة بدل حد الجودة")
+    parser.add_argument('--formats', default='jpeg,webp,png', help="الصيغ المسموحة")
+    parser.add_argument('--workers', type=int, help="عدد العمليات (افتراضياً عدد الأنوية)")
+    args = parser.parse_args()
+
+    if args.metric == 'ssim' and np is None:
+        sys.exit("❌ SSIM يحتاج numpy - استخدم --metric psnr")
+
+    settings = {
+        'metric': args.metric,
+        'threshold': args.threshold,
+        'max_bytes': args.max_bytes,
+        'formats': [output_format.strip().upper() for output_format in args.formats.split(',')
+                    if output_format.strip()],
+    }
+    filenames = sorted(name for name in os.listdir(args.images)
+                       if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS)
+
+    results = []
+    batch = BatchProcessor(args.images, args.workers)
+    for result in optimize_images(args.images, filenames, args.output, batch, **settings):
+        results.append(result)
+        if result['error']:
+            print(f"❌ {result['filename']}: {result['error']}")
+            continue
+        entry = result['output']
+        print(f"[{result['done']}/{result['total']}] {entry['filename']:<40} "
+              f"{entry['original_bytes']:>10,} → {entry['optimized_bytes']:>10,}  {entry['choice']}")
+
+    report = build_report(results, settings)
+    path = write_report(report, args.output)
+    print(f"💾 وُفر {report['saved_bytes']:,} بايت ({report['saved_ratio']:.1%}) - التقرير: {path}")
+
+
+if __name__ == '__main__':
+    main()
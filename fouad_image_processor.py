@@ -0,0 +1,951 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+معالج صور موقع فؤاد للأمن السيبراني
+Image processing core for Fouad Cyber Security Store
+وظائف Pillow فقط (بدون PyQt5) ليستخدمها مدير الصور وخادم الموقع معاً
+"""
+
+import math
+import multiprocessing
+import os
+import shutil
+import struct
+import zlib
+from itertools import groupby
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+
+from PIL import Image, ImageChops, ImageFilter
+
+# عملية واحدة في خط المعالجة: (الاسم، المعاملات)
+Operation = Tuple[str, Dict[str, Any]]
+
+# التصغير السريع: فك ترميز JPEG بدقة مخفضة ثم reduce() بعوامل صحيحة،
+# مع إبقاء الصورة الوسيطة أكبر من الهدف بهذا المعامل قبل LANCZOS النهائي
+FAST_DOWNSCALE_GAP = 2.0
+
+# سقف ذاكرة العمل الإضافية فوق المصدر المفكوك للمعالجة بالشرائح (بايت)؛ 0 يعطل التقسيم
+TILE_MEMORY_LIMIT = int(os.environ.get('IMAGE_TILE_MEMORY_LIMIT', 64 * 1024 * 1024))
+
+
+class OperationCancelled(Exception):
+    """أُلغيت المعالجة بطلب من المستخدم"""
+
+
+class ImageProcessor:
+    """معالج الصور - يحتوي على جميع وظائف تعديل الصور"""
+    
+    def __init__(self, images_path: str, memory_limit: Optional[int] = None, store=None):
+        self.images_path = images_path
+        self.memory_limit = TILE_MEMORY_LIMIT if memory_limit is None else memory_limit
+        # مخزن النسخ المشتقة (DerivativeStore) اختياري: بدونه تُحسب كل عملية من جديد
+        self.store = store
+    
+    def needs_tiling(self, img: Image.Image) -> bool:
+        """هل تتجاوز المعالجة الكاملة (المصدر + النسخ الوسيطة) سقف الذاكرة؟
+        
+        المسار بالشرائح يكتب PNG فقط، فالصيغ الأخرى تمر بالمسار الكامل دائماً.
+        """
+        if not self.memory_limit or img.mode not in PNG_COLOR_TYPES:
+            return False
+        full_bytes = img.width * img.height * _pixel_bytes(img.mode)
+        return full_bytes * UNTILED_WORKING_COPIES > self.memory_limit
+    
+    def get_image_info(self, filename: str) -> Dict[str, Any]:
+        """الحصول على معلومات الصورة"""
+        filepath = os.path.join(self.images_path, filename)
+        if not os.path.exists(filepath):
+            return {}
+        
+        try:
+            with Image.open(filepath) as img:
+                file_size = os.path.getsize(filepath)
+                return {
+                    'filename': filename,
+                    'format': img.format,
+                    'mode': img.mode,
+                    'size': img.size,  # (width, height)
+                    'file_size': file_size,
+                    'file_size_mb': round(file_size / (1024 * 1024), 2)
+                }
+        except Exception as e:
+            return {'error': str(e)}
+    
+    def resize_image(self, filename: str, new_width: int, new_height: int,
+                     fast: bool = False, **hooks) -> str:
+        """تغيير حجم الصورة (fast: فك ترميز مخفض الدقة عند التصغير الكبير)"""
+        name, ext = os.path.splitext(filename)
+        output_filename = f"{name}_resized_{new_width}x{new_height}{ext}"
+        
+        try:
+            return self._derive(
+                filename, [('resize', {'width': new_width, 'height': new_height, 'fast': fast})],
+                output_filename, **hooks
+            )
+        except Exception as e:
+            raise Exception(f"خطأ في تغيير الحجم: {str(e)}")
+    
+    @staticmethod
+    def resize(img: Image.Image, new_width: int, new_height: int,
+               fast: bool = False) -> Image.Image:
+        """تغيير حجم صورة مفتوحة (المنطق المشترك لكل عمليات التصغير)
+        
+        fast: قبل تحميل البكسلات يُطلب من JPEG فك ترميز بمقياس 1/2 أو 1/4 أو 1/8،
+        ثم يصغر reduce() بعامل صحيح، ويبقى LANCZOS للخطوة الأخيرة فقط.
+        """
+        if not fast:
+            return img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        
+        if img.format == 'JPEG':
+            # لا أثر لها إذا كانت البكسلات محملة مسبقاً
+            img.draft(img.mode, (int(new_width * FAST_DOWNSCALE_GAP),
+                                 int(new_height * FAST_DOWNSCALE_GAP)))
+        return img.resize((new_width, new_height), Image.Resampling.LANCZOS,
+                          reducing_gap=FAST_DOWNSCALE_GAP)
+    
+    @staticmethod
+    def open_downscaled(filepath: str, max_width: int, max_height: int) -> Image.Image:
+        """فتح صورة مصغرة لتتسع داخل المربع المحدد بأقل كلفة فك ترميز (للمعاينات والمصغرات)"""
+        with Image.open(filepath) as img:
+            scale = min(max_width / img.width, max_height / img.height, 1.0)
+            new_width = max(1, round(img.width * scale))
+            new_height = max(1, round(img.height * scale))
+            return ImageProcessor.resize(img, new_width, new_height, fast=True)
+    
+    @staticmethod
+    def prepare_for_format(img: Image.Image, output_format: str) -> Image.Image:
+        """تحويل نمط الألوان ليناسب صيغة الحفظ (JPEG لا يدعم الشفافية)"""
+        if output_format in ('JPEG', 'BMP') and img.mode in ('RGBA', 'LA', 'P'):
+            img = img.convert('RGBA')
+            rgb_img = Image.new('RGB', img.size, (255, 255, 255))
+            rgb_img.paste(img, mask=img.split()[-1])
+            return rgb_img
+        if output_format == 'JPEG' and img.mode not in ('RGB', 'L', 'CMYK'):
+            return img.convert('RGB')
+        return img
+    
+    @staticmethod
+    def web_save_options(output_format: str, quality: int = 80) -> Dict[str, Any]:
+        """خيارات الحفظ لنسخ الويب"""
+        save_options: Dict[str, Any] = {'optimize': True}
+        if output_format in ('JPEG', 'WEBP'):
+            save_options['quality'] = quality
+        if output_format == 'JPEG':
+            save_options['progressive'] = True
+        return save_options
+    
+    def render(self, input_path: str, output_path: str, operations: List[Operation],
+               output_format: Optional[str] = None,
+               cancel_check: Optional[Callable[[], bool]] = None,
+               progress_callback: Optional[Callable[[float], None]] = None,
+               **save_options) -> str:
+        """فك ترميز واحد، العمليات، ثم الحفظ بالصيغة المطلوبة
+        
+        العملية الواحدة القابلة للتقسيم على صورة كبيرة بناتج PNG تمر بالمعالجة بالشرائح.
+        progress_callback يستقبل نسبة الإنجاز من 0 إلى 1.
+        """
+        operations = normalize_operations(operations)
+        with Image.open(input_path) as img:
+            output_format = (output_format or img.format or 'PNG').upper()
+            if len(operations) == 1 and operations[0][0] in TILED_OPERATIONS \
+                    and not save_options and output_format == 'PNG' and self.needs_tiling(img):
+                name, params = operations[0]
+                return write_tiled(img, output_path, name, params, self.memory_limit, output_format,
+                                   cancel_check, progress_callback)
+            
+            # العمليات حتى 90% والترميز والحفظ الباقي
+            operations_progress = None
+            if progress_callback is not None:
+                def operations_progress(fraction):
+                    progress_callback(fraction * 0.9)
+            result = self.apply_operations(img, operations, cancel_check=cancel_check,
+                                           progress_callback=operations_progress)
+            result = self.prepare_for_format(result, output_format)
+            if cancel_check is not None and cancel_check():
+                raise OperationCancelled()
+            if result is img:
+                # بدون عمليات: تحميل البكسلات قبل احتمال الكتابة فوق المصدر
+                result.load()
+            result.save(output_path, format=output_format, **save_options)
+        if progress_callback is not None:
+            progress_callback(1.0)
+        return output_path
+    
+    def _derive(self, filename: str, operations: List[Operation], output_filename: str,
+                cancel_check: Optional[Callable[[], bool]] = None,
+                progress_callback: Optional[Callable[[float], None]] = None) -> str:
+        """إنشاء الملف الناتج، أو نسخه من المخزن إذا حُسب سابقاً لنفس المحتوى والمعاملات
+        
+        cancel_check و progress_callback تصل من دوال التعديل (**hooks) لمهام الخلفية في المدير.
+        """
+        input_path = os.path.join(self.images_path, filename)
+        output_path = os.path.join(self.images_path, output_filename)
+        output_format = Image.registered_extensions().get(os.path.splitext(output_filename)[1].lower())
+        if self.store is None or output_format is None:
+            self.render(input_path, output_path, operations, output_format,
+                        cancel_check, progress_callback)
+            return output_filename
+        
+        stored_path = self.store.get_or_create(
+            input_path, operations, output_format,
+            render=lambda path: self.render(input_path, path, operations, output_format,
+                                            cancel_check, progress_callback),
+        )
+        if cancel_check is not None and cancel_check():
+            raise OperationCancelled()
+        # نسخة مستقلة لا رابط صلب: تعديل الملف في مجلد الصور لا يفسد المخزن
+        shutil.copyfile(stored_path, output_path)
+        if progress_callback is not None:
+            progress_callback(1.0)
+        return output_filename
+    
+    def create_web_variant(self, filename: str, output_path: str, width: int,
+                           output_format: Optional[str] = None, quality: int = 80) -> str:
+        """إنشاء نسخة ويب بعرض محدد مع الحفاظ على النسبة (بدون تكبير)"""
+        input_path = os.path.join(self.images_path, filename)
+        
+        try:
+            if output_format is None:
+                with Image.open(input_path) as img:
+                    output_format = img.format or 'PNG'
+            output_format = output_format.upper()
+            self.render(input_path, output_path, [('fit', {'width': width})], output_format,
+                        **self.web_save_options(output_format, quality))
+            return output_path
+        except Exception as e:
+            raise Exception(f"خطأ في إنشاء نسخة الويب: {str(e)}")
+    
+    def apply_brightness(self, filename: str, factor: float, **hooks) -> str:
+        """تطبيق تأثير الإضاءة"""
+        name, ext = os.path.splitext(filename)
+        output_filename = f"{name}_bright_{factor}{ext}"
+        
+        try:
+            return self._derive(filename, [('brightness', {'factor': factor})], output_filename, **hooks)
+        except Exception as e:
+            raise Exception(f"خطأ في تعديل الإضاءة: {str(e)}")
+    
+    def apply_contrast(self, filename: str, factor: float, **hooks) -> str:
+        """تطبيق تأثير التباين"""
+        name, ext = os.path.splitext(filename)
+        output_filename = f"{name}_contrast_{factor}{ext}"
+        
+        try:
+            return self._derive(filename, [('contrast', {'factor': factor})], output_filename, **hooks)
+        except Exception as e:
+            raise Exception(f"خطأ في تعديل التباين: {str(e)}")
+    
+    def apply_blur(self, filename: str, radius: int, **hooks) -> str:
+        """تطبيق تأثير التمويه"""
+        name, ext = os.path.splitext(filename)
+        output_filename = f"{name}_blur_{radius}{ext}"
+        
+        try:
+            return self._derive(filename, [('blur', {'radius': radius})], output_filename, **hooks)
+        except Exception as e:
+            raise Exception(f"خطأ في تطبيق التمويه: {str(e)}")
+    
+    def apply_sharpen(self, filename: str, **hooks) -> str:
+        """تطبيق تأثير الحدة"""
+        name, ext = os.path.splitext(filename)
+        output_filename = f"{name}_sharp{ext}"
+        
+        try:
+            return self._derive(filename, ['sharpen'], output_filename, **hooks)
+        except Exception as e:
+            raise Exception(f"خطأ في تطبيق الحدة: {str(e)}")
+    
+    def rotate_image(self, filename: str, angle: int, **hooks) -> str:
+        """دوران الصورة"""
+        name, ext = os.path.splitext(filename)
+        output_filename = f"{name}_rotated_{angle}{ext}"
+        
+        try:
+            return self._derive(filename, [('rotate', {'angle': angle})], output_filename, **hooks)
+        except Exception as e:
+            raise Exception(f"خطأ في دوران الصورة: {str(e)}")
+    
+    def crop_image(self, filename: str, left: int, top: int, right: int, bottom: int, **hooks) -> str:
+        """قص الصورة"""
+        name, ext = os.path.splitext(filename)
+        output_filename = f"{name}_cropped{ext}"
+        
+        try:
+            return self._derive(filename, [('crop', {'left': left, 'top': top, 'right': right, 'bottom': bottom})], output_filename, **hooks)
+        except Exception as e:
+            raise Exception(f"خطأ في قص الصورة: {str(e)}")
+    
+    def flip_image(self, filename: str, direction: str, **hooks) -> str:
+        """انعكاس الصورة (horizontal أو vertical)"""
+        name, ext = os.path.splitext(filename)
+        output_filename = f"{name}_flipped_{direction[0]}{ext}"
+        
+        try:
+            return self._derive(filename, [('flip', {'direction': direction})], output_filename, **hooks)
+        except Exception as e:
+            raise Exception(f"خطأ في الانعكاس: {str(e)}")
+    
+    def convert_format(self, filename: str, output_format: str, **hooks) -> str:
+        """تحويل صيغة الصورة (الشفافية تُدمج فوق خلفية بيضاء للصيغ التي لا تدعمها)"""
+        output_format = output_format.upper()
+        ext = '.jpg' if output_format == 'JPEG' else f".{output_format.lower()}"
+        output_filename = f"{os.path.splitext(filename)[0]}_converted{ext}"
+        
+        try:
+            return self._derive(filename, [], output_filename, **hooks)
+        except Exception as e:
+            raise Exception(f"خطأ في تحويل الصيغة: {str(e)}")
+    
+    @staticmethod
+    def apply_operations(img: Image.Image, operations: List[Operation],
+                         optimize: bool = True,
+                         cancel_check: Optional[Callable[[], bool]] = None,
+                         progress_callback: Optional[Callable[[float], None]] = None) -> Image.Image:
+        """تطبيق سلسلة عمليات على صورة مفتوحة في الذاكرة"""
+        if optimize:
+            operations = optimize_operations(operations)
+        else:
+            operations = normalize_operations(operations)
+        # العمليات النقطية المتتالية تُدمج في جدول بحث واحد وتمريرة واحدة
+        steps = []
+        for is_point, group in groupby(operations, key=lambda op: op[0] in POINT_OPERATIONS):
+            group = list(group)
+            steps.extend([(True, group)] if is_point else [(False, operation) for operation in group])
+        
+        for done, (is_point, operation) in enumerate(steps, 1):
+            # الإلغاء تعاوني: يُفحص بين العمليات
+            if cancel_check is not None and cancel_check():
+                raise OperationCancelled()
+            if is_point:
+                img = apply_point_operations(img, operation)
+            else:
+                name, params = operation
+                img = PIPELINE_OPERATIONS[name][0](img, **params)
+            if progress_callback is not None:
+                progress_callback(done / len(steps))
+        return img
+    
+    def process_pipeline(self, filename: str, operations: List[Operation],
+                         output_filename: Optional[str] = None, optimize_ops: bool = True,
+                         cancel_check: Optional[Callable[[], bool]] = None,
+                         **save_options) -> str:
+        """خط معالجة مدمج: فك ترميز واحد، كل العمليات في الذاكرة، ثم ترميز واحد لملف واحد
+        
+        operations مثل: [('resize', {'width': 800, 'height': 600}),
+                         ('brightness', {'factor': 1.2}), ('sharpen', {})]
+        optimize_ops يعيد ترتيب العمليات؛ save_options تمر إلى الحفظ (ومنها optimize).
+        """
+        operations = normalize_operations(operations)
+        input_path = os.path.join(self.images_path, filename)
+        if output_filename is None:
+            name, ext = os.path.splitext(filename)
+            output_filename = f"{name}_{operations_tag(operations)}{ext}"
+        output_path = os.path.join(self.images_path, output_filename)
+        
+        try:
+            with Image.open(input_path) as img:
+                result = self.apply_operations(img, operations, optimize_ops, cancel_check)
+                output_format = Image.registered_extensions().get(
+                    os.path.splitext(output_filename)[1].lower(), img.format or 'PNG'
+                )
+                result = self.prepare_for_format(result, output_format)
+                if result is img:
+                    # بدون عمليات: تحميل البكسلات قبل احتمال الكتابة فوق المصدر
+                    result.load()
+                result.save(output_path, format=output_format, **save_options)
+                return output_filename
+        except OperationCancelled:
+            raise
+        except Exception as e:
+            raise Exception(f"خطأ في خط المعالجة: {str(e)}")
+
+
+# ===== خط المعالجة المدمج =====
+
+def _op_resize(img, width, height, fast=False):
+    return ImageProcessor.resize(img, width, height, fast)
+
+
+def _op_fit(img, width, height=None):
+    """تصغير ليتسع داخل العرض (والارتفاع) مع الحفاظ على النسبة وبدون تكبير"""
+    scale = min(width / img.width, (height or img.height) / img.height)
+    if scale >= 1:
+        return img
+    return ImageProcessor.resize(img, max(1, round(img.width * scale)),
+                                 max(1, round(img.height * scale)), fast=True)
+
+
+def _op_brightness(img, factor):
+    return apply_point_operations(img, [('brightness', {'factor': factor})])
+
+
+def _op_contrast(img, factor):
+    return apply_point_operations(img, [('contrast', {'factor': factor})])
+
+
+def _op_gamma(img, gamma):
+    return apply_point_operations(img, [('gamma', {'gamma': gamma})])
+
+
+def _op_levels(img, black=0, white=255, gamma=1.0, out_black=0, out_white=255):
+    return apply_point_operations(img, [('levels', {
+        'black': black, 'white': white, 'gamma': gamma,
+        'out_black': out_black, 'out_white': out_white,
+    })])
+
+
+def _op_invert(img):
+    return apply_point_operations(img, [('invert', {})])
+
+
+def _op_channel_mix(img, matrix):
+    return apply_point_operations(img, [('channel_mix', {'matrix': matrix})])
+
+
+def _op_blur(img, radius):
+    return img.filter(ImageFilter.GaussianBlur(radius))
+
+
+def _op_sharpen(img):
+    return img.filter(ImageFilter.SHARPEN)
+
+
+def _op_rotate(img, angle):
+    return img.rotate(angle, expand=True)
+
+
+def _op_crop(img, left, top, right, bottom, clamp=False):
+    if clamp:
+        # قص موسع بهامش: لا نتجاوز حدود الصورة حتى لا تظهر حواف سوداء
+        left, top = max(0, left), max(0, top)
+        right, bottom = min(img.width, right), min(img.height, bottom)
+    return img.crop((left, top, right, bottom))
+
+
+def _op_flip(img, direction):
+    if direction == 'horizontal':
+        return img.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+    return img.transpose(Image.Transpose.FLIP_TOP_BOTTOM)
+
+
+# الاسم -> (الدالة، وسم اسم الملف بنفس صيغة الدوال المنفردة)
+PIPELINE_OPERATIONS = {
+    'resize': (_op_resize, lambda p: f"resized_{p['width']}x{p['height']}"),
+    'fit': (_op_fit, lambda p: f"fit_{p['width']}"),
+    'brightness': (_op_brightness, lambda p: f"bright_{p['factor']}"),
+    'contrast': (_op_contrast, lambda p: f"contrast_{p['factor']}"),
+    'blur': (_op_blur, lambda p: f"blur_{p['radius']}"),
+    'sharpen': (_op_sharpen, lambda p: "sharp"),
+    'rotate': (_op_rotate, lambda p: f"rotated_{p['angle']}"),
+    'crop': (_op_crop, lambda p: "cropped"),
+    'flip': (_op_flip, lambda p: f"flipped_{p['direction'][0]}"),
+    'gamma': (_op_gamma, lambda p: f"gamma_{p['gamma']}"),
+    'levels': (_op_levels, lambda p: f"levels_{p.get('black', 0)}-{p.get('white', 255)}"),
+    'invert': (_op_invert, lambda p: "inverted"),
+    'channel_mix': (_op_channel_mix, lambda p: "mixed"),
+}
+
+
+def normalize_operations(operations) -> List[Operation]:
+    """قبول (الاسم، المعاملات) أو الاسم وحده، والتحقق من أن العملية معروفة"""
+    normalized = []
+    for operation in operations:
+        name, params = (operation, {}) if isinstance(operation, str) else operation
+        if name not in PIPELINE_OPERATIONS:
+            raise ValueError(f"عملية غير معروفة: {name}")
+        normalized.append((name, dict(params or {})))
+    return normalized
+
+
+def operations_tag(operations: List[Operation]) -> str:
+    """resized_800x600_bright_1.2_sharp"""
+    return '_'.join(PIPELINE_OPERATIONS[name][1](params) for name, params in operations)
+
+
+def _crop_halo(name: str, params: Dict[str, Any]) -> Optional[int]:
+    """الهامش الذي يحتاجه القص ليسبق هذه العملية بنفس النتيجة، أو None إذا لم يجز ذلك
+    
+    العمليات النقطية لا تحتاج هامشاً، والمرشحات المحلية تحتاج نصف قطر أثرها.
+    التباين يعتمد على متوسط الصورة كلها لذلك لا يسبقه القص.
+    """
+    if name in POINT_OPERATIONS and name != 'contrast':
+        return 0
+    if name == 'sharpen':
+        return 2
+    if name == 'blur':
+        return int(math.ceil(3 * params['radius'])) + 4
+    return None
+
+
+def proxy_operations(operations: List[Operation], scale: float) -> List[Operation]:
+    """نفس العمليات بمعاملات مكافئة على نسخة مصغرة بالمعامل scale (للمعاينة الحية)
+    
+    العمليات النقطية لا تتأثر بالحجم؛ نصف قطر التمويه يُصغر بنفس النسبة.
+    """
+    scaled = []
+    for name, params in normalize_operations(operations):
+        if name == 'blur':
+            params = dict(params, radius=params['radius'] * scale)
+        scaled.append((name, params))
+    return scaled
+
+
+def optimize_operations(operations: List[Operation]) -> List[Operation]:
+    """إعادة ترتيب آمنة للعمليات تحافظ على نفس النتيجة
+    
+    - القص ينتقل قبل الإضاءة والمرشحات المحلية (مع هامش ثم قص نهائي) فتعمل على بكسلات أقل
+    - الدورانات المتتالية بمضاعفات 90° تُدمج، والانعكاسان المتتاليان المتماثلان يُلغيان
+    """
+    result = normalize_operations(operations)
+    
+    index = 0
+    while index < len(result):
+        name, params = result[index]
+        # القص المولد من هذه الدالة (يحمل clamp) لا يُنقل مرة أخرى
+        if name != 'crop' or 'clamp' in params:
+            index += 1
+            continue
+        
+        target = index
+        halo = 0
+        while target > 0:
+            previous_halo = _crop_halo(*result[target - 1])
+            if previous_halo is None:
+                break
+            halo += previous_halo
+            target -= 1
+        
+        if target == index:
+            index += 1
+            continue
+        
+        result.pop(index)
+        if halo == 0:
+            result.insert(target, (name, params))
+            index += 1
+            continue
+        
+        left, top = params['left'], params['top']
+        width, height = params['right'] - left, params['bottom'] - top
+        expanded_left, expanded_top = max(0, left - halo), max(0, top - halo)
+        result.insert(target, ('crop', {
+            'left': expanded_left, 'top': expanded_top,
+            'right': params['right'] + halo, 'bottom': params['bottom'] + halo,
+            'clamp': True,
+        }))
+        # القص النهائي بإحداثيات نسبية داخل المنطقة الموسعة
+        offset_left, offset_top = left - expanded_left, top - expanded_top
+        result.insert(index + 1, ('crop', {
+            'left': offset_left, 'top': offset_top,
+            'right': offset_left + width, 'bottom': offset_top + height,
+            'clamp': False,
+        }))
+        index += 2
+    
+    merged: List[Operation] = []
+    for name, params in result:
+        if merged and name == merged[-1][0] == 'rotate' \
+                and params['angle'] % 90 == 0 and merged[-1][1]['angle'] % 90 == 0:
+            angle = (merged[-1][1]['angle'] + params['angle']) % 360
+            merged.pop()
+            if angle:
+                merged.append(('rotate', {'angle': angle}))
+            continue
+        if merged and name == merged[-1][0] == 'flip' and params == merged[-1][1]:
+            merged.pop()
+            continue
+        merged.append((name, params))
+    return merged
+
+
+
+# ===== العمليات النقطية بجدول بحث واحد =====
+
+# عمليات تعتمد على قيمة البكسل وحدها (أو مزج قنواته) فتُدمج في تمريرة واحدة
+POINT_OPERATIONS = {'brightness', 'contrast', 'gamma', 'levels', 'invert', 'channel_mix'}
+POINT_MODES = ('L', 'LA', 'RGB', 'RGBA')
+
+# أوزان تحويل RGB إلى L في Pillow (ITU-R 601-2)
+LUMA_WEIGHTS = (0.299, 0.587, 0.114)
+
+IDENTITY_CURVE = list(range(256))
+
+
+def _f32(value: float) -> float:
+    """تقريب إلى float32 كما يحسب Pillow داخلياً"""
+    return struct.unpack('f', struct.pack('f', value))[0]
+
+
+def _blend_curve(base: int, factor: float) -> List[int]:
+    """نفس حساب Image.blend(ثابت، الصورة، factor) لكل قيمة (أساس ImageEnhance)"""
+    alpha = _f32(factor)
+    curve = []
+    for value in range(256):
+        temp = _f32(base + _f32(alpha * (value - base)))
+        curve.append(0 if temp <= 0 else 255 if temp >= 255 else int(temp))
+    return curve
+
+
+def _levels_curve(black: int, white: int, gamma: float, out_black: int, out_white: int) -> List[int]:
+    span = max(1, white - black)
+    curve = []
+    for value in range(256):
+        level = min(1.0, max(0.0, (value - black) / span)) ** (1 / gamma)
+        curve.append(min(255, max(0, round(out_black + level * (out_white - out_black)))))
+    return curve
+
+
+def _point_curve(name: str, params: Dict[str, Any], mean: Optional[int] = None) -> List[int]:
+    """منحنى القيم (256 مدخلاً) لعملية نقطية واحدة على قنوات اللون"""
+    if name == 'brightness':
+        return _blend_curve(0, params['factor'])
+    if name == 'contrast':
+        return _blend_curve(mean, params['factor'])
+    if name == 'gamma':
+        return _levels_curve(0, 255, params['gamma'], 0, 255)
+    if name == 'levels':
+        return _levels_curve(params.get('black', 0), params.get('white', 255), params.get('gamma', 1.0),
+                             params.get('out_black', 0), params.get('out_white', 255))
+    if name == 'invert':
+        return [255 - value for value in range(256)]
+    raise ValueError(f"ليست عملية نقطية: {name}")
+
+
+def _color_luts(img: Image.Image, curve: List[int]) -> List[List[int]]:
+    """جدول لكل قناة: المنحنى لقنوات اللون، والشفافية تبقى كما هي"""
+    return [IDENTITY_CURVE if band == 'A' else curve for band in img.getbands()]
+
+
+def _apply_luts(img: Image.Image, luts: List[List[int]]) -> Image.Image:
+    """تمريرة واحدة على البكسلات بجدول بحث لكل قناة"""
+    return img.point([value for lut in luts for value in lut])
+
+
+def _luminance_mean(img: Image.Image, luts: Optional[List[List[int]]] = None) -> int:
+    """متوسط الإضاءة كما يحسبه ImageEnhance.Contrast
+    
+    بدون جداول معلقة يُحسب من L تماماً؛ مع جداول معلقة يُقدر من مدرجات القنوات
+    الأصلية بعد تمريرها عبر الجداول (فرق ±1 مستوى على الأكثر) بدل تمريرة إضافية.
+    """
+    if luts is None:
+        histogram = img.convert('L').histogram()
+        total = sum(histogram)
+        return int(sum(value * count for value, count in enumerate(histogram)) / total + 0.5)
+    
+    histogram = img.histogram()
+    total = img.width * img.height
+    means = [
+        sum(count * lut[value] for value, count in enumerate(histogram[band * 256:(band + 1) * 256])) / total
+        for band, lut in enumerate(luts)
+    ]
+    if img.mode in ('L', 'LA'):
+        return int(means[0] + 0.5)
+    return int(sum(weight * mean for weight, mean in zip(LUMA_WEIGHTS, means)) + 0.5)
+
+
+def _mix_channels(img: Image.Image, matrix: List[List[float]]) -> Image.Image:
+    """مزج القنوات بمصفوفة 3×3 (صف لكل قناة ناتجة) مع إبقاء الشفافية"""
+    if img.mode not in ('RGB', 'RGBA'):
+        raise ValueError(f"مزج القنوات يحتاج صورة RGB وليس {img.mode}")
+    coefficients = tuple(value for row in matrix for value in (*row, 0))
+    mixed = img.convert('RGB').convert('RGB', coefficients)
+    if img.mode == 'RGBA':
+        mixed.putalpha(img.getchannel('A'))
+    return mixed
+
+
+def apply_point_operations(img: Image.Image, operations: List[Operation]) -> Image.Image:
+    """دمج سلسلة عمليات نقطية في جدول بحث واحد لكل قناة وتطبيقه بتمريرة واحدة
+    
+    مزج القنوات لا يُختزل إلى جدول لكل قناة، فيقسم السلسلة: جدول ثم مزج ثم جدول.
+    الإضاءة والتباين وحدهما يطابقان ImageEnhance بكسلاً بكسلاً.
+    """
+    if img.mode not in POINT_MODES:
+        has_alpha = 'A' in img.getbands() or 'transparency' in img.info
+        img = img.convert('RGBA' if has_alpha else 'RGB')
+    
+    luts = None
+    for name, params in normalize_operations(operations):
+        if name == 'channel_mix':
+            if luts is not None:
+                img = _apply_luts(img, luts)
+                luts = None
+            img = _mix_channels(img, params['matrix'])
+            continue
+        
+        mean = _luminance_mean(img, luts) if name == 'contrast' else None
+        curve = _point_curve(name, params, mean)
+        if luts is None:
+            luts = _color_luts(img, curve)
+        else:
+            # تركيب المنحنيات: الجدول الجديد يُطبق على ناتج الجدول السابق
+            luts = [lut if band == 'A' else [curve[value] for value in lut]
+                    for band, lut in zip(img.getbands(), luts)]
+    
+    return _apply_luts(img, luts) if luts is not None else img
+
+
+# ===== المعالجة بالشرائح للصور الكبيرة =====
+
+# العمليات التي تُنفذ بالشرائح عندما تتجاوز الصورة سقف الذاكرة
+TILED_OPERATIONS = ('brightness', 'contrast', 'blur')
+
+# الأنماط المدعومة -> نوع الألوان في PNG
+PNG_COLOR_TYPES = {'L': 0, 'LA': 4, 'RGB': 2, 'RGBA': 6}
+
+# تقدير عدد النسخ بحجم الصورة في المسار الكامل (المصدر + الصورة المنحلة + الناتج)
+UNTILED_WORKING_COPIES = 3
+# تقدير عدد النسخ بحجم الشريحة (الشريحة بهامشها، ناتج العملية، القص، مرشح PNG وضغطه)
+STRIP_WORKING_COPIES = 8
+
+
+def _pixel_bytes(mode: str) -> int:
+    """حجم البكسل في ذاكرة Pillow (الأنماط متعددة القنوات تُخزن بأربعة بايتات)"""
+    return 1 if mode == 'L' else 4
+
+
+def strip_rows(width: int, mode: str, halo: int, memory_limit: int) -> int:
+    """عدد صفوف الشريحة بحيث تبقى ذاكرة العمل تحت السقف"""
+    row_bytes = width * _pixel_bytes(mode) * STRIP_WORKING_COPIES
+    return max(1, memory_limit // row_bytes - 2 * halo)
+
+
+def _iter_strips(img: Image.Image, rows: int, halo: int):
+    """(الشريحة مع هامشها، إزاحة بداية الصفوف الحقيقية، عدد الصفوف)"""
+    for top in range(0, img.height, rows):
+        bottom = min(img.height, top + rows)
+        source_top = max(0, top - halo)
+        source_bottom = min(img.height, bottom + halo)
+        yield img.crop((0, source_top, img.width, source_bottom)), top - source_top, bottom - top
+
+
+def _contrast_mean(img: Image.Image, rows: int) -> int:
+    """متوسط الإضاءة للصورة كلها كما يحسبه ImageEnhance.Contrast، بتمريرة على الشرائح"""
+    histogram = [0] * 256
+    for strip, _, _ in _iter_strips(img, rows, 0):
+        for value, count in enumerate(strip.convert('L').histogram()):
+            histogram[value] += count
+    total = sum(histogram)
+    return int(sum(value * count for value, count in enumerate(histogram)) / total + 0.5)
+
+
+def _contrast_strip(strip: Image.Image, factor: float, mean: int) -> Image.Image:
+    """نفس ImageEnhance.Contrast لكن بمتوسط الصورة كلها لا الشريحة"""
+    return _apply_luts(strip, _color_luts(strip, _blend_curve(mean, factor)))
+
+
+class PngStripWriter:
+    """كتابة PNG تدريجياً شريحة بعد شريحة (مرشح Up) بدون تجميع الصورة في الذاكرة"""
+    
+    def __init__(self, output_path: str, size: Tuple[int, int], mode: str, compress_level: int = 6):
+        self.size = size
+        self.mode = mode
+        self._compressor = zlib.compressobj(compress_level)
+        self._previous_row: Optional[Image.Image] = None
+        self._file = open(output_path, 'wb')
+        self._file.write(b'\x89PNG\r\n\x1a\n')
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', size[0], size[1], 8,
+                                         PNG_COLOR_TYPES[mode], 0, 0, 0))
+    
+    def _chunk(self, kind: bytes, data: bytes):
+        self._file.write(struct.pack('>I', len(data)) + kind + data)
+        self._file.write(struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+    
+    def write(self, strip: Image.Image):
+        """إضافة الصفوف التالية من الصورة"""
+        width, rows = strip.size
+        # مرشح Up: كل صف ناقص الصف السابق (الصف الأول في الصورة يُطرح منه صفر)
+        shifted = Image.new(self.mode, strip.size)
+        if self._previous_row is not None:
+            shifted.paste(self._previous_row, (0, 0))
+        if rows > 1:
+            shifted.paste(strip.crop((0, 0, width, rows - 1)), (0, 1))
+        filtered = ImageChops.subtract_modulo(strip, shifted).tobytes()
+        stride = len(filtered) // rows
+        data = b''.join(b'\x02' + filtered[row * stride:(row + 1) * stride] for row in range(rows))
+        compressed = self._compressor.compress(data)
+        if compressed:
+            self._chunk(b'IDAT', compressed)
+        self._previous_row = strip.crop((0, rows - 1, width, rows))
+    
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            self._chunk(b'IDAT', self._compressor.flush())
+            self._chunk(b'IEND', b'')
+        finally:
+            self._file.close()
+
+
+def write_tiled(img: Image.Image, output_path: str, name: str, params: Dict[str, Any],
+                memory_limit: int = TILE_MEMORY_LIMIT, output_format: Optional[str] = None,
+                cancel_check: Optional[Callable[[], bool]] = None,
+                progress_callback: Optional[Callable[[float], None]] = None) -> str:
+    """تطبيق عملية واحدة على شرائح متداخلة بهوامش وكتابة ناتج PNG تدريجياً
+    
+    الهامش من _crop_halo يجعل مرشحات الالتفاف (التمويه والحدة) مطابقة للمعالجة الكاملة.
+    Pillow لا يفك ترميز المصادر المضغوطة على أجزاء، فالمصدر يُفك مرة واحدة كاملاً
+    (أو يُربط بالذاكرة للصيغ غير المضغوطة)؛ السقف يحد ما يُضاف فوقه فقط. الصيغ الأخرى
+    لا تُدعم هنا لأن حفظها يحتاج صورة الناتج كاملة في الذاكرة.
+    """
+    if output_format is None:
+        output_format = Image.registered_extensions().get(os.path.splitext(output_path)[1].lower())
+    if output_format != 'PNG':
+        raise ValueError(f"المعالجة بالشرائح تكتب PNG فقط: {output_format}")
+    halo = 0 if name == 'contrast' else _crop_halo(name, params)
+    if halo is None:
+        raise ValueError(f"العملية لا تدعم المعالجة بالشرائح: {name}")
+    
+    rows = strip_rows(img.width, img.mode, halo, memory_limit)
+    mean = _contrast_mean(img, rows) if name == 'contrast' else None
+    
+    writer = PngStripWriter(output_path, img.size, img.mode)
+    try:
+        top = 0
+        for strip, offset, count in _iter_strips(img, rows, halo):
+            # الإلغاء والتقدم بين الشرائح: الملف الجزئي يُحذف عند الإلغاء
+            if cancel_check is not None and cancel_check():
+                raise OperationCancelled()
+            if name == 'contrast':
+                strip = _contrast_strip(strip, params['factor'], mean)
+            else:
+                strip = PIPELINE_OPERATIONS[name][0](strip, **params)
+            writer.write(strip.crop((0, offset, strip.width, offset + count)))
+            top += count
+            if progress_callback is not None:
+                progress_callback(top / img.height)
+    except Exception:
+        writer.close()
+        os.remove(output_path)
+        raise
+    
+    writer.close()
+    return output_path
+
+
+# ===== المعالجة الدفعية على كل الأنوية =====
+
+# حدث الإلغاء المشترك داخل كل عملية عاملة (يُمرر عند إنشاء العملية)
+_worker_cancel_event = None
+
+
+def _init_batch_worker(cancel_event):
+    global _worker_cancel_event
+    _worker_cancel_event = cancel_event
+
+
+def cancel_requested() -> bool:
+    """داخل عامل BatchProcessor: هل طُلب إلغاء الدفعة؟"""
+    return _worker_cancel_event is not None and _worker_cancel_event.is_set()
+
+
+def _batch_worker(images_path: str, filename: str, operations: List[Operation],
+                  in_place: bool, save_options: Dict[str, Any]) -> str:
+    """تنفيذ خط المعالجة لملف واحد داخل عملية عاملة"""
+    cancel_check = cancel_requested
+    if cancel_check():
+        raise OperationCancelled()
+    return ImageProcessor(images_path).process_pipeline(
+        filename, operations, filename if in_place else None, cancel_check=cancel_check, **save_options
+    )
+
+
+class BatchProcessor:
+    """تطبيق عملية أو خط معالجة على عدة صور بمجمع عمليات بحجم عدد الأنوية
+    
+    run() و map() يعيدان نتيجة كل ملف فور انتهائه:
+        {'filename', 'output', 'error', 'cancelled', 'done', 'total'}
+    cancel() يوقف إرسال ملفات جديدة ويُفحص داخل العمال بين العمليات.
+    """
+    
+    def __init__(self, images_path: str, max_workers: Optional[int] = None):
+        self.images_path = images_path
+        self.max_workers = max_workers or os.cpu_count() or 1
+        # spawn بدل fork: المدير يستدعي الدفعات من خيوط Qt، والعملية المنسوخة بـ fork
+        # قد تتجمد على أقفال كانت تمسكها خيوط أخرى لحظة النسخ
+        self._context = multiprocessing.get_context('spawn')
+        self._cancel_event = self._context.Event()
+    
+    def cancel(self):
+        """طلب إلغاء الدفعة الحالية"""
+        self._cancel_event.set()
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+    
+    def run(self, filenames: List[str], operations: List[Operation],
+            in_place: bool = False,
+            progress_callback: Optional[Callable[[int, int, Dict[str, Any]], None]] = None,
+            **save_options) -> Iterator[Dict[str, Any]]:
+        """معالجة الملفات وإرجاع النتائج تباعاً مع جمع أخطاء كل ملف بدل تجاهلها"""
+        operations = normalize_operations(operations)
+        return self.map(_batch_worker, filenames, (operations, in_place, save_options),
+                        progress_callback)
+    
+    def map(self, worker: Callable[..., Any], filenames: List[str], args: Tuple = (),
+            progress_callback: Optional[Callable[[int, int, Dict[str, Any]], None]] = None
+            ) -> Iterator[Dict[str, Any]]:
+        """تشغيل worker(images_path, filename, *args) لكل ملف في عملية عاملة
+        
+        worker دالة على مستوى الوحدة (قابلة للتسلسل) ويمكنها استدعاء cancel_requested().
+        """
+        filenames = list(filenames)
+        total = len(filenames)
+        done = 0
+        self._cancel_event.clear()
+        
+        def report(filename, output=None, error=None, cancelled=False):
+            nonlocal done
+            done += 1
+            result = {'filename': filename, 'output': output, 'error': error,
+                      'cancelled': cancelled, 'done': done, 'total': total}
+            if progress_callback is not None:
+                try:
+                    progress_callback(done, total, result)
+                except Exception:
+                    # خطأ في دالة المتابعة ليس خطأ في المهمة: لا يُعد الملف مرتين،
+                    # بل تتوقف الدفعة ويصل الخطأ إلى المستدعي
+                    self.cancel()
+                    raise
+            return result
+        
+        if not filenames:
+            return
+        
+        pending = iter(filenames)
+        in_flight = {}
+        with ProcessPoolExecutor(max_workers=min(self.max_workers, total), mp_context=self._context,
+                                 initializer=_init_batch_worker,
+                                 initargs=(self._cancel_event,)) as executor:
+            
+            def submit_next():
+                filename = next(pending, None)
+                if filename is None:
+                    return
+                future = executor.submit(worker, self.images_path, filename, *args)
+                in_flight[future] = filename
+            
+            # نافذة محدودة من المهام حتى يكون الإلغاء فورياً ولا تتراكم النتائج في الذاكرة
+            for _ in range(self.max_workers * 2):
+                submit_next()
+            
+            while in_flight:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    filename = in_flight.pop(future)
+                    try:
+                        outcome = {'output': future.result()}
+                    except OperationCancelled:
+                        outcome = {'error': "أُلغيت", 'cancelled': True}
+                    except Exception as e:
+                        outcome = {'error': str(e)}
+                    yield report(filename, **outcome)
+                    if not self.cancelled:
+                        submit_next()
+        
+        # الملفات التي لم تُرسل بسبب الإلغاء
+        for filename in pending:
+            yield report(filename, error="أُلغيت", cancelled=True)
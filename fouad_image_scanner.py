@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+فحص مجلدات الصور
+Scalable image folder scanning with os.scandir
+
+os.scandir يعيد نوع كل عنصر مع اسمه، فلا حاجة لـ stat لمعرفة الملفات
+والمجلدات، والنتائج تُعاد على دفعات حتى تبدأ الواجهة بعرضها قبل انتهاء
+الفحص. توقيع كل صورة (inode، وقت التعديل، الحجم) يكفي لكشف الإضافة
+والحذف والتعديل وإعادة التسمية بين فحصين.
+"""
+
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp'}
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# (inode، وقت التعديل بالنانوثانية، الحجم)
+Signature = Tuple[int, int, int]
+
+
+def iter_image_chunks(images_path: str, recursive: bool = False,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      directories: Optional[List[str]] = None) -> Iterator[List[Tuple[str, Signature]]]:
+    """دفعات من (الاسم النسبي، التوقيع) بترتيب القراءة من القرص
+
+    الأسماء في المجلدات الفرعية نسبية بفاصل '/'. المجلدات المخفية (مثل .fouad_cache)
+    والروابط الرمزية للمجلدات تُتخطى. directories تُملأ بالمجلدات الفرعية التي فُحصت.
+    """
+    pending = ['']
+    chunk = []
+    while pending:
+        relative = pending.pop()
+        try:
+            iterator = os.scandir(os.path.join(images_path, relative) if relative else images_path)
+        except OSError:
+            continue
+        with iterator:
+            for entry in iterator:
+                name = f"{relative}/{entry.name}" if relative else entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive and not entry.name.startswith('.'):
+                            pending.append(name)
+                            if directories is not None:
+                                directories.append(entry.path)
+                        continue
+                    if os.path.splitext(entry.name)[1].lower() not in IMAGE_EXTENSIONS \
+                            or not entry.is_file():
+                        continue
+                    # على Windows تأتي stat من بيانات القراءة نفسها، و inode على POSIX من dirent
+                    stat = entry.stat()
+                    chunk.append((name, (entry.inode(), stat.st_mtime_ns, stat.st_size)))
+                except OSError:
+                    # حُذف أثناء الفحص
+                    continue
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+    if chunk:
+        yield chunk
+
+
+def scan_images(images_path: str, recursive: bool = False,
+                directories: Optional[List[str]] = None) -> Dict[str, Signature]:
+    """كل صور المجلد مع توقيعاتها"""
+    entries = {}
+    for chunk in iter_image_chunks(images_path, recursive, directories=directories):
+        entries.update(chunk)
+    return entries
+
+
+def diff_scans(previous: Dict[str, Signature], current: Dict[str, Signature]):
+    """(مضاف، محذوف، متغير، [(القديم، الجديد)]) بين فحصين، قوائم مرتبة بالاسم
+
+    نفس inode باسم جديد إعادة تسمية لا حذف وإضافة؛ نفس الاسم بتوقيع مختلف ملف تغير.
+    """
+    added = current.keys() - previous.keys()
+    removed = previous.keys() - current.keys()
+    changed = [name for name in current if name in previous and previous[name] != current[name]]
+
+    # inode = 0 عندما لا يوفره نظام الملفات. إعادة التسمية تحفظ وقت التعديل والحجم،
+    # ومطابقتهما تمنع اعتبار ملف جديد أخذ inode ملف محذوف إعادة تسمية
+    added_signatures = {current[name]: name for name in added if current[name][0]}
+    renamed = []
+    if added_signatures:
+        for name in sorted(removed):
+            new_name = added_signatures.pop(previous[name], None)
+            if new_name is not None:
+                renamed.append((name, new_name))
+        # حذف من المجموعات بدلاً من list.remove حتى يبقى الحساب خطياً
+        removed -= {old for old, _ in renamed}
+        added -= {new for _, new in renamed}
+    return sorted(added), sorted(removed), sorted(changed), renamed
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ذاكرة الصور المصغرة الدائمة
+Persistent on-disk thumbnail cache for the image manager grid
+
+مفتاح كل مصغرة = المسار + وقت التعديل + الحجم + مقاس المصغرة، فلا يُقرأ
+محتوى الملف لحساب بصمة، والمصغرات تبقى بعد إعادة التشغيل. التخزين عبر
+DerivativeStore (ملفات محدودة الحجم مع إخراج الأقدم استخداماً وإنشاء
+مرة واحدة للطلبات المتزامنة) في .fouad_cache/thumbnails.
+"""
+
+import hashlib
+import os
+from typing import Optional
+
+from fouad_derivative_store import DerivativeStore
+from fouad_image_metadata import CACHE_DIR_NAME
+from fouad_image_processor import ImageProcessor
+
+THUMBNAILS_DIR_NAME = 'thumbnails'
+THUMBNAIL_SIZE = 160
+THUMBNAIL_MAX_BYTES = 128 * 1024 * 1024
+
+# JPEG للصور المعتمة و PNG للشفافة؛ الامتداد ثابت لأن الصيغة تُعرف بعد فك الترميز
+# و Qt يتعرف على الصيغة من المحتوى
+THUMBNAIL_EXTENSION = '.thumb'
+
+
+def render_thumbnail(source_path: str, output_path: str, size: int = THUMBNAIL_SIZE) -> str:
+    """مصغرة تتسع داخل مربع size×size بفك ترميز مخفض الدقة"""
+    img = ImageProcessor.open_downscaled(source_path, size, size)
+    if img.mode in ('RGBA', 'LA', 'P', 'PA'):
+        img = img.convert('RGBA')
+        # قناة شفافية معتمة بالكامل لا تستحق PNG
+        if img.getchannel('A').getextrema()[0] < 255:
+            img.save(output_path, format='PNG', compress_level=1)
+            return output_path
+    img.convert('RGB').save(output_path, format='JPEG', quality=85)
+    return output_path
+
+
+class ThumbnailCache:
+    """مصغرات الصور على القرص، آمنة للاستخدام من عدة خيوط"""
+
+    def __init__(self, cache_dir: str, size: int = THUMBNAIL_SIZE,
+                 max_bytes: int = THUMBNAIL_MAX_BYTES):
+        self.size = size
+        self.store = DerivativeStore(cache_dir, max_bytes)
+
+    @classmethod
+    def for_project(cls, project_path: str, size: int = THUMBNAIL_SIZE) -> 'ThumbnailCache':
+        """ذاكرة المشروع: .fouad_cache/thumbnails"""
+        return cls(os.path.join(project_path, CACHE_DIR_NAME, THUMBNAILS_DIR_NAME), size)
+
+    def name_for(self, filepath: str, stat_result: Optional[os.stat_result] = None) -> str:
+        stat_result = stat_result or os.stat(filepath)
+        key = f"{os.path.abspath(filepath)}|{stat_result.st_mtime_ns}|{stat_result.st_size}|{self.size}"
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32] + THUMBNAIL_EXTENSION
+
+    def lookup(self, filepath: str) -> Optional[str]:
+        """مسار المصغرة إن كانت محفوظة لنفس نسخة الملف، بدون فك ترميز"""
+        try:
+            return self.store.lookup(self.name_for(filepath))
+        except OSError:
+            return None
+
+    def get_or_create(self, filepath: str) -> str:
+        """مسار المصغرة، تُنشأ فقط إذا لم تكن محفوظة"""
+        return self.store.get_or_render(
+            self.name_for(filepath),
+            lambda output_path: render_thumbnail(filepath, output_path, self.size),
+        )
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""إعداد الاختبارات: الوحدات في جذر المستودع"""
+
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope='session')
+def server(tmp_path_factory):
+    """وحدة الخادم app.py.py (اسمها لا يصلح للاستيراد المباشر) بمخزن نسخ مؤقت"""
+    with pytest.MonkeyPatch.context() as patch:
+        # يُستعاد المتغير بعد الجلسة حتى لا يتسرب إلى بقية العملية
+        patch.setenv('VARIANT_CACHE_DIR', str(tmp_path_factory.mktemp('derivatives')))
+        spec = importlib.util.spec_from_file_location('fouad_server', os.path.join(ROOT, 'app.py.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.app.testing = True
+        yield module
+
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
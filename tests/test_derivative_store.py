@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""اختبارات مخزن النسخ المشتقة ونسخ /images المصغرة"""
+
+import io
+import os
+import threading
+
+from PIL import Image
+
+import fouad_derivative_store
+from fouad_derivative_store import DerivativeStore, derivative_name
+
+
+def writer(size, calls=None):
+    def render(path):
+        if calls is not None:
+            calls.append(path)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+    return render
+
+
+def test_render_once_for_concurrent_requests(tmp_path):
+    store = DerivativeStore(str(tmp_path))
+    calls = []
+    started = threading.Event()
+
+    def slow(path):
+        started.set()
+        calls.append(path)
+        threading.Event().wait(0.1)
+        writer(10)(path)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.get_or_render('a.png', slow)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len(set(results)) == 1 and os.path.isfile(results[0])
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    store = DerivativeStore(str(tmp_path), max_bytes=25)
+    store.get_or_render('a', writer(10))
+    store.get_or_render('b', writer(10))
+    store.lookup('a')
+    store.get_or_render('c', writer(10))
+    assert sorted(os.listdir(tmp_path)) == ['a', 'c']
+    assert store.stats()['evictions'] == 1
+
+
+def test_cap_is_shared_between_processes_on_disk(tmp_path, monkeypatch):
+    monkeypatch.setattr(fouad_derivative_store, 'DISK_SYNC_INTERVAL', 0)
+    first = DerivativeStore(str(tmp_path), max_bytes=25)
+    second = DerivativeStore(str(tmp_path), max_bytes=25)
+    first.get_or_render('a', writer(10))
+    first.get_or_render('b', writer(10))
+    # العملية الثانية لا تعرف a و b في ذاكرتها لكنها تراهما على القرص
+    second.get_or_render('c', writer(10))
+    assert sum(os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path)) <= 25
+
+
+def test_entry_removed_elsewhere_is_rendered_again(tmp_path):
+    store = DerivativeStore(str(tmp_path))
+    calls = []
+    path = store.get_or_render('a', writer(10, calls))
+    os.remove(path)
+    assert store.get_or_render('a', writer(10, calls)) == path
+    assert os.path.isfile(path) and len(calls) == 2
+
+
+def test_recipe_name_ignores_parameter_spelling():
+    first = derivative_name('abc', [('fit', {'width': 400.0})], 'jpeg', {'quality': 80})
+    second = derivative_name('abc', [('fit', {'width': 400})], 'JPEG', {'quality': 80})
+    assert first == second
+    assert derivative_name('abd', [('fit', {'width': 400})], 'JPEG', {'quality': 80}) != first
+
+
+def test_image_variant_route(server, client):
+    name = sorted(os.listdir(os.path.join(server.BASE_DIR, 'صور')))[0]
+    url = f"/images/{name}?w=160&fmt=webp"
+    response = client.get(url)
+    assert response.status_code == 200
+    with Image.open(io.BytesIO(response.data)) as img:
+        assert img.format == 'WEBP' and img.width <= 160
+
+    hits = server.variant_cache.stats()['hits']
+    again = client.get(url, headers={'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 304
+    assert server.variant_cache.stats()['hits'] == hits + 1
+    assert client.get(f"/images/{name}?fmt=tiff").status_code == 400
+
+
+def test_variant_evicted_before_serving_is_rendered_again(server, client, monkeypatch):
+    name = sorted(os.listdir(os.path.join(server.BASE_DIR, 'صور')))[0]
+    serve_file = server.serve_file
+    removed = []
+
+    def evict_first(directory, filename, policy):
+        if not removed:
+            removed.append(filename)
+            os.remove(os.path.join(directory, filename))
+        return serve_file(directory, filename, policy)
+
+    monkeypatch.setattr(server, 'serve_file', evict_first)
+    response = client.get(f"/images/{name}?w=320&fmt=jpeg")
+    assert response.status_code == 200 and removed
+
+
+def test_source_digest_matches_server_etag(server, tmp_path):
+    # الخادم يمرر ETag كبصمة المصدر، فالاثنان يجب أن يتطابقا
+    path = tmp_path / 'a.bin'
+    path.write_bytes(b'abc' * 1000)
+    stat_result = os.stat(path)
+    assert server.file_versions.get(str(path), stat_result) == \
+        DerivativeStore(str(tmp_path / 'store')).digests.get(str(path), stat_result)
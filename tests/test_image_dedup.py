@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""اختبارات كشف الصور المكررة"""
+
+import os
+import random
+
+import pytest
+from PIL import Image, ImageDraw, ImageEnhance
+
+from fouad_image_dedup import (BKTree, compute_hashes, ensure_hashes, find_clusters, hamming,
+                               merge_cluster)
+from fouad_image_metadata import ImageMetadataIndex
+
+
+def scene(seed, size=(128, 96)):
+    generator = random.Random(seed)
+    img = Image.new('RGB', size, (240, 240, 240))
+    draw = ImageDraw.Draw(img)
+    for _ in range(6):
+        x, y = generator.randrange(size[0]), generator.randrange(size[1])
+        draw.ellipse((x - 20, y - 15, x + 20, y + 15),
+                     fill=tuple(generator.randrange(256) for _ in range(3)))
+    return img
+
+
+@pytest.fixture
+def project(tmp_path):
+    images = tmp_path / 'images'
+    images.mkdir()
+    scene(1).save(images / 'photo.png')
+    scene(1).resize((64, 48)).save(images / 'photo_small.png')
+    ImageEnhance.Brightness(scene(1)).enhance(1.1).save(images / 'photo_bright.jpg', quality=90)
+    scene(2).save(images / 'other.png')
+    return tmp_path
+
+
+@pytest.fixture
+def index(project):
+    index = ImageMetadataIndex.for_project(str(project))
+    yield index
+    index.close()
+
+
+def test_near_duplicates_are_close_and_different_images_far(project):
+    images = project / 'images'
+    original = compute_hashes(str(images / 'photo.png'))
+    for name in ('photo_small.png', 'photo_bright.jpg'):
+        near = compute_hashes(str(images / name))
+        assert hamming(original['phash'], near['phash']) <= 8
+    other = compute_hashes(str(images / 'other.png'))
+    assert hamming(original['phash'], other['phash']) > 8
+
+
+def test_bktree_matches_brute_force():
+    generator = random.Random(7)
+    values = [f"{generator.getrandbits(64):016x}" for _ in range(200)]
+    tree = BKTree()
+    for position, value in enumerate(values):
+        tree.add(value, position)
+    query = values[0]
+    expected = {position for position, value in enumerate(values) if hamming(query, value) <= 20}
+    assert {position for _, position in tree.search(query, 20)} == expected
+
+
+def test_clusters_and_keeper(project, index):
+    names = sorted(os.listdir(project / 'images'))
+    rows = ensure_hashes(index, str(project / 'images'), names)
+    clusters = find_clusters(rows)
+    assert len(clusters) == 1
+    assert [row['filename'] for row in clusters[0]][0] == 'photo.png'
+    assert {row['filename'] for row in clusters[0]} == {'photo.png', 'photo_small.png', 'photo_bright.jpg'}
+    assert not any(row['identical'] for row in clusters[0][1:])
+
+    # الصورة المستخدمة في الموقع تُبقى حتى لو كانت أصغر
+    keeper = find_clusters(rows, referenced={'photo_small.png'})[0][0]
+    assert keeper['filename'] == 'photo_small.png'
+
+
+def test_ensure_hashes_uses_index_without_probing(project, index, monkeypatch):
+    images = str(project / 'images')
+    names = sorted(os.listdir(images))
+    monkeypatch.setattr(index, 'get', lambda filepath: pytest.fail("get() يفحص الملف في خيط واحد"))
+    first = ensure_hashes(index, images, names)
+    assert all(row['content_hash'] for row in first)
+
+    class NoBatch:
+        def map(self, *args, **kwargs):
+            pytest.fail("البصمات المخزنة يجب ألا يُعاد حسابها")
+
+    second = ensure_hashes(index, images, names, batch=NoBatch())
+    assert sorted(row['filename'] for row in second) == sorted(row['filename'] for row in first)
+
+
+def test_merge_moves_duplicates_and_rewrites_references(project, index):
+    (project / 'index.html').write_text('<img src="images/photo_small.png">', encoding='utf-8')
+    rows = ensure_hashes(index, str(project / 'images'), sorted(os.listdir(project / 'images')))
+    cluster = find_clusters(rows)[0]
+
+    result = merge_cluster(cluster, str(project / 'images'), str(project))
+
+    assert result['kept'] == 'photo.png'
+    assert sorted(os.listdir(project / 'images')) == ['other.png', 'photo.png']
+    assert sorted(os.listdir(result['moved_to'])) == ['photo_bright.jpg', 'photo_small.png']
+    assert (project / 'index.html').read_text(encoding='utf-8') == '<img src="images/photo.png">'
+
+
+def test_merge_rewrites_site_urls_when_folder_is_not_images(tmp_path):
+    # الصفحات تشير إلى /images/<الاسم> والخادم يربطها بمجلد صور
+    images = tmp_path / 'صور'
+    images.mkdir()
+    scene(3).save(images / 'logo.png')
+    scene(3).resize((64, 48)).save(images / 'logo copy.png')
+    (tmp_path / 'index.html').write_text(
+        '<img src="/images/logo copy.png"><img src="/images/logo%20copy.png">'
+        '<img src="/images/old logo copy.png">', encoding='utf-8')
+    (tmp_path / 'style.css').write_text("a { background: url('/images/logo copy.png'); }", encoding='utf-8')
+
+    index = ImageMetadataIndex.for_project(str(tmp_path))
+    try:
+        rows = ensure_hashes(index, str(images), sorted(os.listdir(images)))
+    finally:
+        index.close()
+    result = merge_cluster(find_clusters(rows)[0], str(images), str(tmp_path))
+
+    assert result['moved'] == ['logo copy.png']
+    assert sorted(result['rewritten']) == ['index.html', 'style.css']
+    assert (tmp_path / 'index.html').read_text(encoding='utf-8') == (
+        '<img src="/images/logo.png"><img src="/images/logo.png">'
+        '<img src="/images/old logo copy.png">')
+    assert "url('/images/logo.png')" in (tmp_path / 'style.css').read_text(encoding='utf-8')
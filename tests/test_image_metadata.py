@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""اختبارات فهرس بيانات الصور"""
+
+import os
+
+import pytest
+from PIL import Image
+
+import fouad_image_metadata
+from fouad_image_metadata import ImageMetadataIndex, content_hash
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = ImageMetadataIndex(str(tmp_path / 'cache' / 'metadata.sqlite3'), max_workers=2)
+    yield index
+    index.close()
+
+
+def make_image(path, size=(32, 24), color=(200, 10, 10)):
+    Image.new('RGB', size, color).save(path)
+    return str(path)
+
+
+def test_get_reads_header_without_hashing(index, tmp_path, monkeypatch):
+    path = make_image(tmp_path / 'a.png')
+    monkeypatch.setattr(fouad_image_metadata, 'content_hash',
+                        lambda filepath: pytest.fail("get() يجب ألا يقرأ الملف كاملاً"))
+    row = index.get(path)
+    assert (row['width'], row['height'], row['format']) == (32, 24, 'PNG')
+    assert row['content_hash'] is None
+
+
+def test_refresh_fills_content_hash_and_skips_unchanged(index, tmp_path):
+    path = make_image(tmp_path / 'a.png')
+    index.get(path)
+    assert index.refresh([path]) == 1
+    assert index.lookup(path)['content_hash'] == content_hash(path)
+    assert index.refresh([path]) == 0
+
+
+def test_changed_file_is_probed_again(index, tmp_path):
+    path = make_image(tmp_path / 'a.png')
+    index.refresh([path])
+    make_image(tmp_path / 'a.png', size=(64, 48))
+    os.utime(path, ns=(1, 1))
+    assert index.lookup(path) is None
+    assert index.get_image_info(path)['size'] == (64, 48)
+
+
+def test_refresh_queries_only_requested_paths(index, tmp_path):
+    paths = [make_image(tmp_path / f'{number}.png') for number in range(3)]
+    index.refresh(paths)
+    statements = []
+    index._conn.set_trace_callback(statements.append)
+    index.refresh(paths[:1])
+    index._conn.set_trace_callback(None)
+    assert not any(statement.strip().endswith('FROM images') for statement in statements)
+
+
+def test_prune_removes_deleted_files_inside_directory_only(index, tmp_path):
+    images = tmp_path / 'images'
+    images.mkdir()
+    kept = make_image(images / 'kept.png')
+    deleted = make_image(images / 'deleted.png')
+    outside = make_image(tmp_path / 'outside.png')
+    index.refresh([kept, deleted, outside])
+    os.remove(deleted)
+    os.remove(outside)
+
+    index.refresh([kept], prune_directory=str(images))
+    assert index._lookup(os.path.abspath(deleted)) is None
+    assert index._lookup(os.path.abspath(kept)) is not None
+    assert index._lookup(os.path.abspath(outside)) is not None
+
+
+def test_forget(index, tmp_path):
+    path = make_image(tmp_path / 'a.png')
+    index.get(path)
+    index.forget([path])
+    assert index._lookup(os.path.abspath(path)) is None
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""اختبارات محسن أحجام الصور"""
+
+import json
+import os
+
+from PIL import Image
+
+from fouad_image_optimizer import EncoderSearch, _optimize_worker, build_report, output_name_for
+
+SETTINGS = {'metric': 'psnr', 'threshold': 30.0, 'formats': ('JPEG',)}
+
+
+def gradient(size=(96, 64)):
+    img = Image.new('RGB', size)
+    img.putdata([(x * 2, y * 3, (x + y) % 256) for y in range(size[1]) for x in range(size[0])])
+    return img
+
+
+def test_output_name_keeps_source_extension():
+    assert output_name_for('progr.jpg', 'JPEG') == 'progr.jpg'
+    assert output_name_for('progr.jpeg', 'JPEG') == 'progr.jpeg'
+    assert output_name_for('progr.png', 'JPEG') == 'progr.png.jpg'
+    assert output_name_for('progr.png', 'PNG') == 'progr.png'
+    assert output_name_for('progr.png', 'WEBP') == 'progr.png.webp'
+
+
+def test_same_stem_sources_do_not_overwrite_each_other(tmp_path):
+    images, output = tmp_path / 'images', tmp_path / 'out'
+    images.mkdir()
+    gradient().save(images / 'pic.png', compress_level=0)
+    gradient().save(images / 'pic.bmp')
+
+    entries = [_optimize_worker(str(images), name, str(output), SETTINGS)
+               for name in ('pic.png', 'pic.bmp')]
+
+    outputs = [entry['output'] for entry in entries]
+    assert outputs == ['pic.png.jpg', 'pic.bmp.jpg']
+    for entry in entries:
+        assert os.path.getsize(output / entry['output']) == entry['optimized_bytes']
+        assert entry['saved_bytes'] == entry['original_bytes'] - entry['optimized_bytes']
+
+
+def test_original_kept_when_nothing_smaller(tmp_path):
+    # صورة بلون واحد: PNG الأصلي صغير جداً ولا يوجد JPEG أصغر منه
+    Image.new('RGB', (8, 8), (10, 20, 30)).save(tmp_path / 'flat.png', optimize=True)
+    entry = _optimize_worker(str(tmp_path), 'flat.png', str(tmp_path / 'out'), SETTINGS)
+    assert entry['choice'] == 'original'
+    assert entry['output'] is None
+    assert not (tmp_path / 'out').exists()
+
+
+def test_max_bytes_picks_best_quality_within_budget():
+    search = EncoderSearch(metric='psnr', max_bytes=1500, formats=('JPEG',))
+    candidates = search.candidates(gradient(), {})
+    best = search.choose(candidates)
+    assert best['bytes'] <= 1500
+    assert all(best['score'] >= c['score'] for c in candidates if c['bytes'] <= 1500)
+
+
+def test_report_totals(tmp_path):
+    gradient().save(tmp_path / 'a.png', compress_level=0)
+    entry = _optimize_worker(str(tmp_path), 'a.png', str(tmp_path / 'out'), SETTINGS)
+    report = build_report([{'filename': 'a.png', 'error': None, 'output': entry}], SETTINGS)
+    assert report['saved_bytes'] == entry['saved_bytes']
+    json.dumps(report)
+
+
+def test_names_in_subfolders(tmp_path):
+    images, output = tmp_path / 'images', tmp_path / 'out'
+    (images / 'sub').mkdir(parents=True)
+    gradient().save(images / 'sub' / 'pic.png', compress_level=0)
+    entry = _optimize_worker(str(images), 'sub/pic.png', str(output), SETTINGS)
+    assert entry['output'] == 'sub/pic.png.jpg'
+    assert (output / 'sub' / 'pic.png.jpg').is_file()
+    assert not [name for name in os.listdir(output / 'sub') if name.endswith('.tmp')]
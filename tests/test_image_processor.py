@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""اختبارات المعالجة بالشرائح"""
+
+import pytest
+from PIL import Image, ImageChops
+
+from fouad_image_processor import (BatchProcessor, ImageProcessor, OperationCancelled, optimize_operations,
+                                   write_tiled)
+
+OPERATIONS = [('blur', {'radius': 2}), ('contrast', {'factor': 1.5}), ('brightness', {'factor': 1.3})]
+
+
+@pytest.fixture
+def source(tmp_path):
+    img = Image.new('RGB', (240, 180))
+    img.putdata([(x % 256, y % 256, (x * y) % 256) for y in range(180) for x in range(240)])
+    img.save(tmp_path / 'a.png')
+    return tmp_path / 'a.png'
+
+
+@pytest.mark.parametrize('operation', OPERATIONS, ids=[name for name, _ in OPERATIONS])
+def test_tiled_png_matches_untiled(tmp_path, source, operation):
+    tiled = ImageProcessor(str(tmp_path), memory_limit=100_000)
+    with Image.open(source) as img:
+        assert tiled.needs_tiling(img)
+    tiled.render(str(source), str(tmp_path / 'tiled.png'), [operation])
+    ImageProcessor(str(tmp_path), memory_limit=0).render(str(source), str(tmp_path / 'full.png'), [operation])
+
+    with Image.open(tmp_path / 'tiled.png') as first, Image.open(tmp_path / 'full.png') as second:
+        assert ImageChops.difference(first.convert('RGB'), second.convert('RGB')).getbbox() is None
+
+
+def test_tiled_writer_is_png_only(tmp_path, source):
+    with Image.open(source) as img:
+        with pytest.raises(ValueError):
+            write_tiled(img, str(tmp_path / 'out.jpg'), 'blur', {'radius': 2}, 100_000)
+
+
+def test_cancel_removes_partial_file(tmp_path, source):
+    with Image.open(source) as img:
+        with pytest.raises(OperationCancelled):
+            write_tiled(img, str(tmp_path / 'out.png'), 'blur', {'radius': 2}, 100_000,
+                        cancel_check=lambda: True)
+    assert not (tmp_path / 'out.png').exists()
+
+
+def test_pipeline_converts_for_target_format_and_passes_save_options(tmp_path):
+    Image.new('RGBA', (50, 40), (255, 0, 0, 128)).save(tmp_path / 'a.png')
+    processor = ImageProcessor(str(tmp_path))
+    output = processor.process_pipeline('a.png', [('brightness', {'factor': 1.2})], 'a.jpg',
+                                        optimize=True, quality=80)
+    with Image.open(tmp_path / output) as img:
+        assert (img.format, img.mode) == ('JPEG', 'RGB')
+
+
+# ===== إعادة ترتيب العمليات =====
+
+CROP = ('crop', {'left': 50, 'top': 40, 'right': 150, 'bottom': 120})
+
+
+def test_crop_hoisted_before_local_filters_with_halo():
+    optimized = optimize_operations([('brightness', {'factor': 1.2}), ('blur', {'radius': 2}), CROP])
+    # هامش التمويه ceil(3 * 2) + 4 = 10 والإضاءة لا تحتاج هامشاً
+    assert optimized == [
+        ('crop', {'left': 40, 'top': 30, 'right': 160, 'bottom': 130, 'clamp': True}),
+        ('brightness', {'factor': 1.2}),
+        ('blur', {'radius': 2}),
+        ('crop', {'left': 10, 'top': 10, 'right': 110, 'bottom': 90, 'clamp': False}),
+    ]
+
+
+def test_crop_not_hoisted_past_contrast():
+    operations = [('contrast', {'factor': 1.5}), CROP]
+    assert optimize_operations(operations) == operations
+
+
+@pytest.mark.parametrize('operations, expected', [
+    ([('rotate', {'angle': 90}), ('rotate', {'angle': 90})], [('rotate', {'angle': 180})]),
+    ([('rotate', {'angle': 90}), ('rotate', {'angle': 270})], []),
+    ([('rotate', {'angle': 90}), ('rotate', {'angle': 45})],
+     [('rotate', {'angle': 90}), ('rotate', {'angle': 45})]),
+    ([('flip', {'direction': 'horizontal'})] * 2, []),
+    ([('flip', {'direction': 'horizontal'}), ('flip', {'direction': 'vertical'})],
+     [('flip', {'direction': 'horizontal'}), ('flip', {'direction': 'vertical'})]),
+], ids=['rotate-sum', 'rotate-cancel', 'rotate-free-angle', 'flip-cancel', 'flip-different'])
+def test_rotations_and_flips_merged(operations, expected):
+    assert optimize_operations(operations) == expected
+
+
+FUSED_CHAINS = {
+    'blur-crop': [('brightness', {'factor': 1.2}), ('blur', {'radius': 2}), CROP],
+    'sharpen-edge-crop': [('sharpen', {}), ('gamma', {'gamma': 0.8}),
+                          ('crop', {'left': 0, 'top': 0, 'right': 60, 'bottom': 50})],
+    'blur-far-edge-crop': [('blur', {'radius': 3}),
+                           ('crop', {'left': 200, 'top': 150, 'right': 240, 'bottom': 180})],
+    'rotate-flip': [('rotate', {'angle': 90}), ('rotate', {'angle': 180}),
+                    ('flip', {'direction': 'vertical'}), ('flip', {'direction': 'vertical'}),
+                    ('invert', {}), CROP],
+}
+
+
+@pytest.mark.parametrize('operations', FUSED_CHAINS.values(), ids=FUSED_CHAINS.keys())
+def test_optimized_matches_unfused(source, operations):
+    assert optimize_operations(operations) != operations
+    with Image.open(source) as img:
+        img.load()
+        fused = ImageProcessor.apply_operations(img, operations, optimize=True)
+        plain = ImageProcessor.apply_operations(img, operations, optimize=False)
+    assert fused.size == plain.size
+    assert ImageChops.difference(fused, plain).getbbox() is None
+
+
+# ===== الدفعات =====
+
+@pytest.fixture
+def batch_images(tmp_path):
+    for name in ('a.png', 'b.png'):
+        Image.new('RGB', (20, 20), (10, 20, 30)).save(tmp_path / name)
+    return tmp_path
+
+
+def test_batch_counts_each_file_once(batch_images):
+    calls = []
+    results = list(BatchProcessor(str(batch_images), max_workers=1).run(
+        ['a.png', 'missing.png', 'b.png'], [('invert', {})],
+        progress_callback=lambda done, total, result: calls.append((done, total))))
+    assert [result['done'] for result in results] == [1, 2, 3]
+    assert calls == [(1, 3), (2, 3), (3, 3)]
+    assert [result['filename'] for result in results if result['error']] == ['missing.png']
+
+
+def test_batch_progress_callback_error_is_not_a_task_error(batch_images):
+    calls = []
+
+    def progress(done, total, result):
+        calls.append(done)
+        raise RuntimeError('واجهة مغلقة')
+
+    batch = BatchProcessor(str(batch_images), max_workers=1)
+    with pytest.raises(RuntimeError):
+        list(batch.run(['a.png', 'b.png'], [('invert', {})], progress_callback=progress))
+    assert calls == [1]
+    assert batch.cancelled
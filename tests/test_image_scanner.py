@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""اختبارات فحص مجلدات الصور"""
+
+from fouad_image_scanner import diff_scans
+
+
+def test_diff_scans_detects_every_kind_of_change():
+    previous = {'a.png': (1, 10, 100), 'b.png': (2, 10, 200), 'c.png': (3, 10, 300),
+                'd.png': (4, 10, 400)}
+    current = {'a.png': (1, 10, 100), 'b.png': (2, 20, 250), 'renamed.png': (3, 10, 300),
+               'new.png': (5, 10, 500)}
+    assert diff_scans(previous, current) == (
+        ['new.png'], ['d.png'], ['b.png'], [('c.png', 'renamed.png')])
+
+
+def test_diff_scans_requires_full_signature_for_rename():
+    # inode مُعاد استخدامه لملف جديد، و inode = 0 غير متوفر: ليسا إعادة تسمية
+    previous = {'old.png': (7, 10, 100), 'x.png': (0, 10, 100)}
+    current = {'other.png': (7, 99, 100), 'y.png': (0, 10, 100)}
+    assert diff_scans(previous, current) == (['other.png', 'y.png'], ['old.png', 'x.png'], [], [])
+
+
+def test_diff_scans_returns_sorted_lists():
+    previous = {'z.png': (1, 1, 1), 'm.png': (2, 2, 2), 'a.png': (3, 3, 3)}
+    current = {'y.png': (9, 9, 9), 'b.png': (8, 8, 8), 'c/m.png': (2, 2, 2)}
+    added, removed, changed, renamed = diff_scans(previous, current)
+    assert added == ['b.png', 'y.png']
+    assert removed == ['a.png', 'z.png']
+    assert renamed == [('m.png', 'c/m.png')]
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""اختبارات طبقة التخزين المؤقت في الخادم"""
+
+import gzip
+import http.client
+import os
+import socket
+import threading
+import time
+import types
+
+import pytest
+
+
+def test_etag_and_not_modified(client):
+    response = client.get('/style.css')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert response.headers['Last-Modified']
+
+    again = client.get('/style.css', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+
+
+def test_version_must_match_full_fingerprint(server, client):
+    etag = client.get('/style.css').headers['ETag'].strip('"')
+    immutable = server.app.config['CACHE_CONTROL']['immutable']
+
+    assert client.get(f'/style.css?v={etag[:8]}').headers['Cache-Control'] == immutable
+    assert client.get(f'/style.css?v={etag[:1]}').headers['Cache-Control'] != immutable
+    assert client.get('/style.css?v=ffffffff').headers['Cache-Control'] != immutable
+
+
+# ===== النسخ المضغوطة مسبقاً =====
+
+CSS = b"body { color: #123456; }\n" * 200
+
+
+@pytest.fixture
+def assets(tmp_path):
+    (tmp_path / 'site.css').write_bytes(CSS)
+    return tmp_path
+
+
+def fetch(server, directory, filename, headers=None):
+    with server.app.test_request_context('/', headers=headers or {}):
+        response = server.serve_file(str(directory), filename, 'css')
+        data = b''.join(response.response)
+        response.close()
+        return response, data
+
+
+def test_precompress_writes_variants_once(server, assets):
+    written = server.precompress_assets(str(assets))
+    assert written == (2 if server.brotli is not None else 1)
+    source_mtime = os.stat(assets / 'site.css').st_mtime_ns
+    assert os.stat(assets / 'site.css.gz').st_mtime_ns == source_mtime
+    assert gzip.decompress((assets / 'site.css.gz').read_bytes()) == CSS
+    assert server.precompress_assets(str(assets)) == 0
+
+
+def test_gzip_variant_served_when_accepted(server, assets):
+    server.precompress_assets(str(assets))
+    response, data = fetch(server, assets, 'site.css', {'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(data) == CSS
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert response.headers['ETag'].strip('"').endswith('-gzip')
+
+    plain, plain_data = fetch(server, assets, 'site.css')
+    assert 'Content-Encoding' not in plain.headers
+    assert plain_data == CSS
+    assert plain.headers['ETag'] != response.headers['ETag']
+
+
+def test_stale_variant_is_ignored(server, assets):
+    server.precompress_assets(str(assets))
+    (assets / 'site.css').write_bytes(CSS + b"a { }\n")
+    response, data = fetch(server, assets, 'site.css', {'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert data == CSS + b"a { }\n"
+
+
+# ===== طلبات Range =====
+
+BLOB = bytes(range(256)) * 64
+
+
+@pytest.fixture
+def blob(tmp_path):
+    (tmp_path / 'blob.bin').write_bytes(BLOB)
+    return tmp_path
+
+
+def test_single_and_suffix_ranges(server, blob):
+    response, data = fetch(server, blob, 'blob.bin', {'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert data == BLOB[100:200]
+    assert response.headers['Content-Range'] == f"bytes 100-199/{len(BLOB)}"
+
+    response, data = fetch(server, blob, 'blob.bin', {'Range': 'bytes=-10'})
+    assert response.status_code == 206 and data == BLOB[-10:]
+
+
+def test_multiple_ranges_are_multipart(server, blob):
+    response, data = fetch(server, blob, 'blob.bin', {'Range': 'bytes=0-9,50-59'})
+    assert response.status_code == 206
+    assert response.headers['Content-Type'].startswith('multipart/byteranges')
+    assert int(response.headers['Content-Length']) == len(data)
+    assert BLOB[0:10] in data and BLOB[50:60] in data
+
+
+def test_unsatisfiable_range(server, blob):
+    response, _ = fetch(server, blob, 'blob.bin', {'Range': f'bytes={len(BLOB) + 10}-'})
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == f"bytes */{len(BLOB)}"
+
+
+def test_if_range_with_old_etag_sends_whole_file(server, blob):
+    response, data = fetch(server, blob, 'blob.bin', {'Range': 'bytes=0-9', 'If-Range': '"old"'})
+    assert response.status_code == 200 and data == BLOB
+
+
+# ===== خادم الإنتاج: الاتصالات الخاملة والطابور المحدود =====
+
+@pytest.fixture
+def pooled(server):
+    servers = []
+
+    def start(threads, max_pending):
+        pooled_server = server.PooledWSGIServer('127.0.0.1', 0, server.app, threads, fd=None,
+                                                max_pending=max_pending)
+        threading.Thread(target=pooled_server.serve_forever, daemon=True).start()
+        servers.append(pooled_server)
+        return pooled_server.server_address[1]
+
+    yield start
+    for pooled_server in servers:
+        pooled_server.shutdown()
+        pooled_server.server_close()
+        pooled_server.executor.shutdown(wait=True)
+
+
+def get(port, path='/style.css'):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def test_idle_connections_do_not_starve_requests(pooled):
+    port = pooled(threads=1, max_pending=8)
+    idle = [socket.create_connection(('127.0.0.1', port)) for _ in range(3)]
+    try:
+        started = time.monotonic()
+        assert get(port) == 200
+        assert time.monotonic() - started < 3
+    finally:
+        for sock in idle:
+            sock.close()
+
+
+def test_full_queue_is_refused_with_503(pooled):
+    port = pooled(threads=1, max_pending=0)
+    assert get(port) == 503
+
+
+# ===== فهرس الصور =====
+
+@pytest.fixture
+def image_dirs(tmp_path):
+    for directory in ('صور', 'images'):
+        (tmp_path / directory).mkdir()
+    (tmp_path / 'صور' / 'logo.png').write_bytes(b'first')
+    (tmp_path / 'images' / 'logo.png').write_bytes(b'second')
+    (tmp_path / 'images' / 'banner.jpg').write_bytes(b'banner')
+    return tmp_path
+
+
+def touch_dir(path):
+    # تغيير مضمون لتاريخ التعديل حتى على أنظمة الملفات ذات الدقة المنخفضة
+    mtime = os.stat(path).st_mtime_ns + 10 ** 9
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_index_lookup_prefers_first_directory(server, image_dirs):
+    index = server.ImageIndex(str(image_dirs), ['صور', 'images', 'Images'])
+    assert index.lookup('logo.png') == 'صور'
+    assert index.lookup('banner.jpg') == 'images'
+    assert index.lookup('missing.png') is None
+
+
+def test_index_remembers_missing_files(server, image_dirs):
+    index = server.ImageIndex(str(image_dirs), ['صور', 'images'], check_interval=3600)
+    assert index.lookup('late.png') is None
+    (image_dirs / 'images' / 'late.png').write_bytes(b'late')
+    # النتيجة السلبية محفوظة حتى الفحص التالي للمجلدات
+    assert index.lookup('late.png') is None
+
+    index.rebuild()
+    assert index.lookup('late.png') == 'images'
+
+
+def test_index_negative_cache_is_bounded(server, image_dirs):
+    index = server.ImageIndex(str(image_dirs), ['صور', 'images'], check_interval=3600,
+                              negative_cache_size=2)
+    for name in ('a.png', 'b.png', 'c.png'):
+        assert index.lookup(name) is None
+    assert list(index._missing) == ['b.png', 'c.png']
+
+
+def test_index_refreshes_when_directory_changes(server, image_dirs):
+    index = server.ImageIndex(str(image_dirs), ['صور', 'images'], check_interval=0)
+    assert index.lookup('late.png') is None
+    (image_dirs / 'images' / 'late.png').write_bytes(b'late')
+    touch_dir(image_dirs / 'images')
+    assert index.lookup('late.png') == 'images'
+
+    os.remove(image_dirs / 'صور' / 'logo.png')
+    touch_dir(image_dirs / 'صور')
+    assert index.lookup('logo.png') == 'images'
+
+
+# ===== الذاكرة الساخنة =====
+
+def fake_stat(size, mtime_ns=1):
+    return types.SimpleNamespace(st_size=size, st_mtime_ns=mtime_ns)
+
+
+def test_hot_cache_evicts_least_recent_within_budget(server):
+    cache = server.HotAssetCache(max_bytes=10, max_file_bytes=10)
+    for path in ('a', 'b'):
+        cache.put(path, fake_stat(4), b'x' * 4, {})
+    assert cache.get('a', fake_stat(4)) is not None
+
+    cache.put('c', fake_stat(4), b'y' * 4, {})
+    assert cache.get('b', fake_stat(4)) is None
+    assert cache.get('a', fake_stat(4)) is not None
+    stats = cache.stats()
+    assert stats['evictions'] == 1 and stats['bytes'] == 8 and stats['entries'] == 2
+
+
+def test_hot_cache_per_file_limit(server):
+    cache = server.HotAssetCache(max_bytes=100, max_file_bytes=10)
+    assert cache.accepts(fake_stat(10))
+    assert not cache.accepts(fake_stat(11))
+    # ملف أكبر من الميزانية كلها لا يُقبل حتى لو سمح حد الملف به
+    assert not server.HotAssetCache(max_bytes=5, max_file_bytes=10).accepts(fake_stat(8))
+    assert not server.HotAssetCache(max_bytes=0, max_file_bytes=10).accepts(fake_stat(1))
+
+
+def test_hot_cache_invalidated_by_file_change(server):
+    cache = server.HotAssetCache(max_bytes=100, max_file_bytes=100)
+    cache.put('a', fake_stat(4, mtime_ns=1), b'old!', {})
+    assert cache.get('a', fake_stat(4, mtime_ns=2)) is None
+    assert cache.get('a', fake_stat(5, mtime_ns=1)) is None
+
+    cache.put('a', fake_stat(5, mtime_ns=2), b'new!!', {})
+    assert cache.get('a', fake_stat(5, mtime_ns=2))[0] == b'new!!'
+    assert cache.stats()['bytes'] == 5
+
+
+def test_served_content_follows_file_change(server, assets):
+    _, data = fetch(server, assets, 'site.css')
+    assert data == CSS
+    (assets / 'site.css').write_bytes(b'p { }\n')
+    _, data = fetch(server, assets, 'site.css')
+    assert data == b'p { }\n'
+
+
+# ===== المقاييس ومسار التشخيص =====
+
+def metric(text, name):
+    for line in text.splitlines():
+        if line.startswith(name + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    raise KeyError(name)
+
+
+def test_metrics_render_histogram_statuses_and_bytes(server, monkeypatch):
+    hot = server.HotAssetCache(max_bytes=100, max_file_bytes=100)
+    hot.put('a', fake_stat(1), b'a', {})
+    hot.get('a', fake_stat(1))
+    hot.get('b', fake_stat(1))
+    hot.get('a', fake_stat(1))
+    monkeypatch.setattr(server, 'hot_cache', hot)
+
+    metrics = server.RequestMetrics()
+    for status, duration, sent in ((200, 0.003, 100), (200, 0.2, 50), (404, 20.0, 10)):
+        metrics.started()
+        metrics.finished('style', status, duration, sent)
+    text = metrics.render()
+
+    bucket = 'http_request_duration_seconds_bucket{route="style",le="%s"}'
+    # الفئات تراكمية، و+Inf تشمل ما تجاوز آخر حد
+    assert metric(text, bucket % '0.001') == 0
+    assert metric(text, bucket % '0.005') == 1
+    assert metric(text, bucket % '0.25') == 2
+    assert metric(text, bucket % '10.0') == 2
+    assert metric(text, bucket % '+Inf') == 3
+    assert metric(text, 'http_request_duration_seconds_count{route="style"}') == 3
+    assert metric(text, 'http_request_duration_seconds_sum{route="style"}') == pytest.approx(20.203)
+
+    assert metric(text, 'http_requests_total{route="style",status="200"}') == 2
+    assert metric(text, 'http_requests_total{route="style",status="404"}') == 1
+    assert metric(text, 'http_response_bytes_total{route="style"}') == 160
+    assert metric(text, 'http_requests_in_flight') == 0
+
+    assert metric(text, 'cache_hot_assets_hits_total') == 2
+    assert metric(text, 'cache_hot_assets_misses_total') == 1
+    assert metric(text, 'cache_hot_assets_hit_ratio') == pytest.approx(0.6667)
+
+
+def test_metrics_endpoint_counts_requests(client):
+    # المقاييس تسجل عند إغلاق الاستجابة (بعد إرسال آخر بايت)
+    client.get('/style.css').close()
+    client.head('/style.css').close()
+    text = client.get('/metrics').get_data(as_text=True)
+    assert metric(text, 'http_requests_total{route="style",status="200"}') >= 2
+    assert metric(text, 'http_response_bytes_total{route="style"}') >= os.path.getsize(
+        os.path.join(os.path.dirname(os.path.dirname(__file__)), 'style.css'))
+
+
+def test_debug_hidden_unless_debug_mode(server, client, monkeypatch):
+    assert client.get('/debug').status_code == 404
+    monkeypatch.setattr(server.app, 'debug', True)
+    assert client.get('/debug').status_code == 200